@@ -0,0 +1,283 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+import argparse
+import csv
+import json
+import sys
+from contextlib import closing
+
+from odoo import sql_db
+from odoo.cli import Command
+from odoo.tools import config
+
+from odoo.addons.openupgrade_framework.tools import (
+    benchmark,
+    delta,
+    estimate,
+    staged,
+    tables,
+    views,
+)
+
+
+def _get_dbname(parser):
+    dbname = (config["db_name"] or "").split(",")[0]
+    if not dbname:
+        parser.error("a database is required, use the option -d")
+    return dbname
+
+
+def pending(prog, args):
+    """Upgrade the modules of which the upgrade was deferred"""
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description=pending.__doc__,
+        epilog="The other options are the ones of the Odoo server.",
+    )
+    parser.add_argument(
+        "--modules",
+        help="Comma separated list of the pending modules to upgrade, "
+        "with their pending dependencies. By default, all of them.",
+    )
+    args, odoo_args = parser.parse_known_args(args)
+    config.parse_config(odoo_args)
+    staged.run_pending(
+        _get_dbname(parser),
+        [name.strip() for name in (args.modules or "").split(",") if name.strip()],
+    )
+
+
+def replay_delta(prog, args):
+    """Copy the changes of the production database since the full migration
+    of its copy, and replay the migration scripts on them"""
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description=replay_delta.__doc__,
+        epilog="The other options are the ones of the Odoo server.",
+    )
+    parser.add_argument(
+        "--source",
+        required=True,
+        help="Name of the production database, that was copied for the full "
+        "migration.",
+    )
+    args, odoo_args = parser.parse_known_args(args)
+    config.parse_config(odoo_args)
+    delta.replay(_get_dbname(parser), args.source)
+
+
+def estimate_duration(prog, args):
+    """Estimate the duration of the migration of each module of a database,
+    from the numbers of rows of its tables"""
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description=estimate_duration.__doc__,
+        epilog="The other options are the ones of the Odoo server.",
+    )
+    parser.add_argument(
+        "--report",
+        action="append",
+        default=[],
+        help="JSON report of an earlier profiled migration, with the costs per "
+        "row of the modules. Can be repeated.",
+    )
+    args, odoo_args = parser.parse_known_args(args)
+    config.parse_config(odoo_args)
+    with closing(sql_db.db_connect(_get_dbname(parser)).cursor()) as cr:
+        lines = estimate.estimate(cr, args.report)
+    output = ["%-40s %15s %12s" % ("Module", "Rows", "Seconds")]
+    for module, rows, duration in lines:
+        output.append(
+            "%-40s %15d %12s"
+            % (module, rows, "?" if duration is None else "%.1f" % duration)
+        )
+    if args.report:
+        output.append(
+            "%-40s %15d %12.1f"
+            % (
+                "Total",
+                sum(line[1] for line in lines),
+                sum(line[2] or 0 for line in lines),
+            )
+        )
+    sys.stdout.write("\n".join(output) + "\n")
+
+
+def audit_views(prog, args):
+    """Validate the active views of a migrated database, and deactivate the
+    invalid ones"""
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description=audit_views.__doc__,
+        epilog="The other options are the ones of the Odoo server.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Number of processes validating the views, by default the number "
+        "of CPUs.",
+    )
+    parser.add_argument(
+        "--report",
+        help="CSV file in which to write the deactivated views.",
+    )
+    args, odoo_args = parser.parse_known_args(args)
+    config.parse_config(odoo_args)
+    report = views.audit(_get_dbname(parser), args.workers)
+    if args.report:
+        with open(args.report, "w", newline="") as report_file:
+            writer = csv.DictWriter(
+                report_file,
+                ["id", "xml_id", "name", "model", "type", "custom", "error"],
+            )
+            writer.writeheader()
+            writer.writerows(report)
+    output = ["%-8s %-60s %s" % ("Id", "View", "Custom")]
+    for line in report:
+        output.append(
+            "%-8d %-60s %s"
+            % (line["id"], line["xml_id"] or line["name"], line["custom"])
+        )
+    output.append("%s views deactivated" % len(report))
+    sys.stdout.write("\n".join(output) + "\n")
+
+
+def run_benchmark(prog, args):
+    """Migrate a copy of a 13.0 database scaled to the given numbers of rows,
+    and compare the durations of the modules with the ones of a baseline"""
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description=run_benchmark.__doc__,
+        epilog="The database given with -d is the template, it is not modified. "
+        "The other options are the ones of the Odoo server.",
+    )
+    parser.add_argument(
+        "--scale",
+        action="append",
+        default=[],
+        metavar="TABLE=ROWS",
+        help="Number of rows to reach in a table, among %s. Can be repeated."
+        % ", ".join(sorted(benchmark.DATASETS)),
+    )
+    parser.add_argument(
+        "--modules",
+        help="Comma separated list of the modules of which to report the "
+        "durations. By default, all of them.",
+    )
+    parser.add_argument("--results", help="JSON file in which to write the results.")
+    parser.add_argument(
+        "--baseline", help="JSON results of an earlier run, to compare with."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=benchmark.DEFAULT_TOLERANCE,
+        help="Relative increase of the duration of a module that is a "
+        "regression, by default %(default)s.",
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="Keep the migrated database."
+    )
+    args, odoo_args = parser.parse_known_args(args)
+    config.parse_config(odoo_args)
+    scales = {}
+    for spec in args.scale:
+        table, _sep, rows = spec.partition("=")
+        if table not in benchmark.DATASETS or not rows.isdigit():
+            parser.error("invalid scale %s" % spec)
+        scales[table] = int(rows)
+    modules = [name.strip() for name in (args.modules or "").split(",") if name.strip()]
+    results = benchmark.run(_get_dbname(parser), scales, modules, args.keep)
+    if args.results:
+        benchmark.write_results(args.results, results)
+    baseline = benchmark.read_results(args.baseline) if args.baseline else {}
+    lines = benchmark.compare(results, baseline, args.tolerance)
+    output = ["%-40s %12s %12s" % ("Module", "Baseline", "Seconds")]
+    for module, previous, duration, regression in lines:
+        output.append(
+            "%-40s %12s %12.1f%s"
+            % (
+                module,
+                "?" if previous is None else "%.1f" % previous,
+                duration,
+                " REGRESSION" if regression else "",
+            )
+        )
+    output.append("%-40s %12s %12.1f" % ("Total", "", results["total"]))
+    sys.stdout.write("\n".join(output) + "\n")
+    if any(line[3] for line in lines):
+        sys.exit(1)
+
+
+def analyse_tables(prog, args):
+    """Report the tables read and written by the migration scripts, and the
+    scripts of different modules that touch the same tables"""
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description=analyse_tables.__doc__,
+        epilog="The scripts are found in the upgrade path of the Odoo options. "
+        "No database is needed.",
+    )
+    parser.add_argument(
+        "--modules",
+        help="Comma separated list of the modules of which to analyse the "
+        "scripts. By default, all of them.",
+    )
+    parser.add_argument(
+        "--json", help="JSON file in which to write the tables and conflicts."
+    )
+    args, odoo_args = parser.parse_known_args(args)
+    config.parse_config(odoo_args)
+    modules = [name.strip() for name in (args.modules or "").split(",") if name.strip()]
+    accesses = tables.get_script_access(estimate.get_scripts_path(), modules)
+    conflicts = tables.get_conflicts(accesses)
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(
+                {
+                    "scripts": accesses,
+                    "conflicts": [
+                        {"scripts": list(pair), "tables": names}
+                        for pair, names in sorted(conflicts.items())
+                    ],
+                },
+                json_file,
+                indent=1,
+                sort_keys=True,
+            )
+    output = []
+    for name, access in sorted(accesses.items()):
+        output.append(name)
+        output.append("    writes: %s" % ", ".join(access["writes"]))
+        output.append("    reads: %s" % ", ".join(access["reads"]))
+        if access["unresolved"]:
+            output.append("    unresolved: %s" % ", ".join(access["unresolved"]))
+    output.append("")
+    output.append("%-50s %-50s %s" % ("Script", "Script", "Tables"))
+    for (first, second), names in sorted(conflicts.items()):
+        output.append("%-50s %-50s %s" % (first, second, ", ".join(names)))
+    output.append("%s scripts, %s conflicts" % (len(accesses), len(conflicts)))
+    sys.stdout.write("\n".join(output) + "\n")
+
+
+TOOLS = {
+    "audit_views": audit_views,
+    "benchmark": run_benchmark,
+    "delta": replay_delta,
+    "estimate": estimate_duration,
+    "pending": pending,
+    "tables": analyse_tables,
+}
+
+
+class Openupgrade(Command):
+    """Run a tool of OpenUpgrade on a database"""
+
+    def run(self, cmdargs):
+        parser = argparse.ArgumentParser(
+            prog="%s openupgrade" % sys.argv[0].split("/")[-1],
+            description=self.__doc__,
+        )
+        parser.add_argument("tool", choices=sorted(TOOLS))
+        args, tool_args = parser.parse_known_args(cmdargs)
+        TOOLS[args.tool]("%s %s" % (parser.prog, args.tool), tool_args)
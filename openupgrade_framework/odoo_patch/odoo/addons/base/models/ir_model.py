@@ -1,5 +1,8 @@
 # Copyright Odoo Community Association (OCA)
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+import logging
+import threading
+
 from openupgradelib import openupgrade
 
 from odoo import api, models
@@ -12,6 +15,13 @@ from odoo.addons.base.models.ir_model import (
     IrModelRelation,
     IrModelSelection,
 )
+from odoo.addons.openupgrade_framework.odoo_patch.odoo.api import missing_models
+
+_logger = logging.getLogger(__name__)
+
+# Obsolete records to unlink at the end of _process_end, as (empty recordset,
+# ids) by model and module
+_obsolete = threading.local()
 
 
 def _drop_table(self):
@@ -53,11 +63,12 @@ IrModelFields._drop_column = _drop_column
 
 @api.model
 def _module_data_uninstall(self, modules_to_remove):
-    """To pass context, that the patch in __getitem__ of api.Environment uses"""
-    patched_self = self.with_context(**{"missing_model": True})
-    return IrModelData._module_data_uninstall._original_method(
-        patched_self, modules_to_remove
-    )
+    """Bypass the models that are not in the registry anymore, see
+    missing_models in the patch of api"""
+    with missing_models(self.env):
+        return IrModelData._module_data_uninstall._original_method(
+            self, modules_to_remove
+        )
 
 
 _module_data_uninstall._original_method = IrModelData._module_data_uninstall
@@ -68,15 +79,90 @@ IrModelData._module_data_uninstall = _module_data_uninstall
 def _process_end(self, modules):
     """Don't warn about upgrade conventions from Odoo
     ('fields should be explicitly removed by an upgrade script')
+
+    Unlink the obsolete records per model, instead of one by one.
     """
-    with mute_logger("odoo.addons.base.models.ir_model"):
-        return IrModelData._process_end._original_method(self, modules)
+    _obsolete.records = {}
+    try:
+        with mute_logger("odoo.addons.base.models.ir_model"):
+            res = IrModelData._process_end._original_method(self, modules)
+            _unlink_obsolete_records(self, _obsolete.records)
+    finally:
+        _obsolete.records = None
+    return res
 
 
 _process_end._original_method = IrModelData._process_end
 IrModelData._process_end = _process_end
 
 
+@api.model
+def _process_end_unlink_record(self, record):
+    """Collect the obsolete record, see _process_end"""
+    records = getattr(_obsolete, "records", None)
+    if records is None:
+        return IrModelData._process_end_unlink_record._original_method(self, record)
+    key = (record._name, record.env.context.get("module"))
+    records.setdefault(key, (record.browse(), []))[1].extend(record.ids)
+
+
+_process_end_unlink_record._original_method = IrModelData._process_end_unlink_record
+IrModelData._process_end_unlink_record = _process_end_unlink_record
+
+
+def _unlink_in_bulk(records, warn=True):
+    """Unlink the records at once. When that fails, bisect them into smaller
+    groups, so that only the records that can't be unlinked are left.
+    Return these records.
+    """
+    try:
+        with records.env.cr.savepoint():
+            records.with_context(openupgrade_bulk_unlink=True).unlink()
+        return records.browse()
+    except Exception as e:
+        if len(records) == 1:
+            if warn:
+                _logger.warning(
+                    "Could not delete obsolete record with ids %s of model %s: %s",
+                    records.ids,
+                    records._name,
+                    e,
+                )
+            return records
+    half = len(records) // 2
+    return _unlink_in_bulk(records[:half], warn) | _unlink_in_bulk(records[half:], warn)
+
+
+def _unlink_obsolete_records(self, records_by_key):
+    """Unlink the obsolete records of each model in bulk, in the order in
+    which the models came. The records that failed are tried again once at
+    the end, as unlinking the records of other models may have solved the
+    problem.
+    """
+    failed = []
+    for model, ids in records_by_key.values():
+        records = model.browse(ids)
+        existing = records.exists()
+        if existing != records:
+            # Deleted in cascade, only their xmlids are left
+            self.search(
+                [
+                    ("model", "=", records._name),
+                    ("res_id", "in", (records - existing).ids),
+                ]
+            ).unlink()
+        if existing:
+            _logger.info(
+                "Deleting %s obsolete records of model %s",
+                len(existing),
+                existing._name,
+            )
+            failed.append(_unlink_in_bulk(existing, warn=False))
+    for records in failed:
+        if records.exists():
+            _unlink_in_bulk(records.exists())
+
+
 def _module_data_uninstall(self):
     """Don't delete many2many relation tables. Only unlink the
     ir.model.relation record itself.
@@ -89,13 +175,23 @@ IrModelRelation._module_data_uninstall = _module_data_uninstall
 
 def _process_ondelete(self):
     """Don't break on missing models when deleting their selection fields"""
-    to_process = self.browse([])
-    for selection in self:
-        try:
-            self.env[selection.field_id.model]  # pylint: disable=pointless-statement
-            to_process += selection
-        except KeyError:
-            continue
+    if not self:
+        return IrModelSelection._process_ondelete._original_method(self)
+    self.flush(["field_id"])
+    self.env.cr.execute(
+        """
+        SELECT sel.id, imf.model
+        FROM ir_model_fields_selection sel
+        JOIN ir_model_fields imf ON imf.id = sel.field_id
+        WHERE sel.id IN %s""",
+        (tuple(self.ids),),
+    )
+    existing_ids = {
+        selection_id
+        for selection_id, model in self.env.cr.fetchall()
+        if model in self.env.registry.models
+    }
+    to_process = self.filtered(lambda selection: selection.id in existing_ids)
     return IrModelSelection._process_ondelete._original_method(to_process)
 
 
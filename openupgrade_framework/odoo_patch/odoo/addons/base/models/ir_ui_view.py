@@ -6,6 +6,7 @@ from odoo import api
 from odoo.tools import mute_logger
 
 from odoo.addons.base.models.ir_ui_view import View
+from odoo.addons.openupgrade_framework.tools.views import AUDIT_CONTEXT
 
 _logger = logging.getLogger(__name__)
 
@@ -13,6 +14,8 @@ _logger = logging.getLogger(__name__)
 @api.constrains("arch_db")
 def _check_xml(self):
     """ Mute warnings about views which are common during migration """
+    if self.env.context.get(AUDIT_CONTEXT):
+        return View._check_xml._original_method(self)
     with mute_logger("odoo.addons.base.models.ir_ui_view"):
         return View._check_xml._original_method(self)
 
@@ -23,6 +26,15 @@ def handle_view_error(
     """Don't raise or log exceptions in view validation unless explicitely
     requested
     """
+    if self.env.context.get(AUDIT_CONTEXT):
+        return View.handle_view_error._original_method(
+            self,
+            message,
+            *args,
+            raise_exception=raise_exception,
+            from_exception=from_exception,
+            from_traceback=from_traceback
+        )
     raise_exception = self.env.context.get("raise_view_error")
     to_mute = "odoo.addons.base.models.ir_ui_view" if raise_exception else "not_muted"
     with mute_logger(to_mute):
@@ -49,8 +61,10 @@ def handle_view_error(
 
 def _postprocess_view(self, node, model, validate=True, editable=True):
     """ Don't validate views, handle_view_error is mutted"""
+    if not self.env.context.get(AUDIT_CONTEXT):
+        validate = False
     return View._postprocess_view._original_method(
-        self, node, model, validate=False, editable=editable
+        self, node, model, validate=validate, editable=editable
     )
 
 
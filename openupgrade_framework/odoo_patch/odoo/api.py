@@ -1,6 +1,7 @@
 # Copyright Odoo Community Association (OCA)
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
 import logging
+from contextlib import contextmanager
 
 from odoo.api import Environment
 
@@ -22,22 +23,36 @@ class FakeRecord:
         return None
 
 
-def __getitem__(self, model_name):
+def _fake_model():
+    new_env = lambda: None  # noqa: E731
+    new_env._fields = {}
+    new_env.browse = lambda i: FakeRecord()
+    return new_env
+
+
+@contextmanager
+def missing_models(env):
     """This is used to bypass the call self.env[model]
     (and other posterior calls) from _module_data_uninstall method of ir.model.data
+
+    Within this context, Environment.__getitem__ returns a fake model for the
+    models that have data in the database but are not in the registry anymore.
+    These are computed once, and Environment.__getitem__ is only patched for
+    the duration of the context.
     """
-    if (
-        hasattr(self, "context")
-        and isinstance(model_name, str)
-        and self.context.get("missing_model", False)
-    ):
-        if not self.registry.models.get(model_name, False):
-            new_env = lambda: None  # noqa: E731
-            new_env._fields = {}
-            new_env.browse = lambda i: FakeRecord()
-            return new_env
-    return Environment.__getitem__._original_method(self, model_name)
-
-
-__getitem__._original_method = Environment.__getitem__
-Environment.__getitem__ = __getitem__
+    env.cr.execute("SELECT model FROM ir_model UNION SELECT model FROM ir_model_data")
+    vanished = frozenset(
+        name for name, in env.cr.fetchall() if name not in env.registry.models
+    )
+    original_method = Environment.__getitem__
+
+    def __getitem__(self, model_name):
+        if model_name in vanished:
+            return _fake_model()
+        return original_method(self, model_name)
+
+    Environment.__getitem__ = __getitem__
+    try:
+        yield
+    finally:
+        Environment.__getitem__ = original_method
@@ -16,8 +16,13 @@ def unlink(self):
 
     This only adapts the base unlink method. If overrides of this method
     on individual models give problems, add patches for those as well.
+
+    The obsolete records that _process_end unlinks in bulk are protected by
+    a savepoint of the caller, so errors are raised for it to bisect.
     """
-    if not self.env.context.get(MODULE_UNINSTALL_FLAG):
+    if not self.env.context.get(MODULE_UNINSTALL_FLAG) or self.env.context.get(
+        "openupgrade_bulk_unlink"
+    ):
         return BaseModel.unlink._original_method(self)
     savepoint = str(uuid4)
     try:
@@ -3,6 +3,8 @@
 import odoo
 from odoo.modules.graph import Graph
 
+from odoo.addons.openupgrade_framework.tools import staged
+
 
 def update_from_db(self, cr):
     """ Prevent reloading of demo data from the new version on major upgrade """
@@ -17,5 +19,16 @@ def update_from_db(self, cr):
             package.dbdemo = False
 
 
+def add_modules(self, cr, module_list, force=None):
+    """Leave out the modules of which the upgrade is deferred, see
+    tools/staged.py"""
+    excluded = staged.get_excluded(cr)
+    if excluded:
+        module_list = [name for name in module_list if name not in excluded]
+    return Graph.add_modules._original_method(self, cr, module_list, force=force)
+
+
 update_from_db._original_method = Graph.update_from_db
 Graph.update_from_db = update_from_db
+add_modules._original_method = Graph.add_modules
+Graph.add_modules = add_modules
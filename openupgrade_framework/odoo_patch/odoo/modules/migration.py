@@ -1,6 +1,27 @@
 # Copyright Odoo Community Association (OCA)
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+import logging
+import os
+import threading
+
+from odoo.modules import migration
 from odoo.modules.migration import MigrationManager
+from odoo.tools import mute_logger
+
+from odoo.addons.openupgrade_framework.tools import (
+    checkpoint,
+    delta,
+    empty,
+    parallel,
+    profiler,
+    tables,
+    xmlids,
+)
+
+_logger = logging.getLogger(__name__)
+
+# Package and stage of the migration being run, for load_script
+_running = threading.local()
 
 
 def migrate_module(self, pkg, stage):
@@ -10,14 +31,172 @@ def migrate_module(self, pkg, stage):
     to decide if we want to do something if a new module is installed
     during the migration.
     We trick Odoo into running the scripts by setting the update attribute if necessary.
+
+    Once the end stage of a module is done, its checkpoints are removed.
+    The stages are profiled when the profiler is enabled. Before the first
+    pre stage of the graph, the empty tables are recorded, the state of the
+    tables is recorded for the delta migration when it is enabled, and the
+    parallel safe pre-migration scripts of all its modules are run when the
+    parallel execution is enabled. The savepoints of the scripts are tracked,
+    for the commits of the checkpointed chunks to keep them open, and the
+    xmlids resolved by the scripts are cached.
     """
+    with checkpoint.track_savepoints(), xmlids.caching():
+        _migrate_module(self, pkg, stage)
+
+
+def _migrate_module(self, pkg, stage):
+    profiler.record_tables(self.cr)
+    if stage == "pre" and not hasattr(self, "empty_probed"):
+        self.empty_probed = True
+        empty.probe(self.cr)
+    if stage == "pre" and delta.gap() and not hasattr(self, "delta_marked"):
+        self.delta_marked = True
+        delta.mark(self.cr)
+    if stage == "pre" and parallel.workers() and not hasattr(self, "parallel_done"):
+        self.parallel_done = True
+        _run_parallel_scripts(self)
     has_update = hasattr(pkg, "update")
     if not has_update:
         pkg.update = True
-    MigrationManager.migrate_module._original_method(self, pkg, stage)
+    if stage == "post":
+        profiler.stop_loading(pkg.name)
+    _running.pkg, _running.stage = pkg, stage
+    try:
+        with profiler.profile(pkg.name, stage):
+            MigrationManager.migrate_module._original_method(self, pkg, stage)
+    finally:
+        _running.pkg = _running.stage = None
     if not has_update:
         delattr(pkg, "update")
+    if stage == "pre":
+        profiler.start_loading(pkg.name)
+    if stage == "end":
+        checkpoint.clear(self.cr, pkg.name)
+
+
+def _get_script_name(pyfile):
+    """Return the name of a migration script, like 14.0.1.1/post-migration.py"""
+    return "/".join(pyfile.split(os.sep)[-2:])
+
+
+def _checkpointed_migrate(migrate, pyfile):
+    """Skip a migration script that was completed in a previous, interrupted
+    run of which the chunks were committed (see tools/checkpoint.py).
+    """
+
+    def checkpointed_migrate(cr, version):
+        # The migrate decorator of openupgradelib inspects the local variables
+        # pkg, stage and pyfile of its caller
+        pkg, stage = _running.pkg, _running.stage
+        step = _get_script_name(pyfile)
+        if checkpoint.is_done(cr, pkg.name, step):
+            _logger.info(
+                "module %s: skipping %s-migration %s, completed in a previous run",
+                pkg.name,
+                stage,
+                step,
+            )
+            return
+        migrate(cr, version)
+        checkpoint.mark_done(cr, pkg.name, step)
+
+    return checkpointed_migrate
+
+
+def _get_scripts(self, pkg, stage):
+    """Return the migration scripts that Odoo would run for the stage of the
+    package, as (pyfile, module, migrate, version) tuples, without running
+    them.
+    """
+    has_update = hasattr(pkg, "update")
+    if not has_update:
+        pkg.update = True
+    _running.collected = []
+    try:
+        with mute_logger(migration.__name__):
+            MigrationManager.migrate_module._original_method(self, pkg, stage)
+        return _running.collected
+    finally:
+        _running.collected = None
+        if not has_update:
+            delattr(pkg, "update")
+
+
+def _parallel_job(pkg, scripts):
+    def run_scripts(cr):
+        # The migrate decorator of openupgradelib inspects the local variables
+        # pkg, stage and pyfile of its caller
+        stage = "pre"
+        for pyfile, mod, migrate, version in scripts:
+            step = _get_script_name(pyfile)
+            if checkpoint.is_done(cr, pkg.name, step):
+                continue
+            _logger.info("module %s: running pre-migration %s", pkg.name, step)
+            profiler.instrument(mod, pkg.name, stage, step)
+            with profiler.profile(pkg.name, stage, step):
+                migrate(cr, version)
+            # Committed with the work of the script, whether the chunks are
+            # committed or not, for the loader to skip the script
+            checkpoint.mark_done(cr, pkg.name, step, force=True)
+
+    return run_scripts
+
+
+def _run_parallel_scripts(self):
+    """Run the pre-migration scripts of the modules of the graph of which all
+    the scripts are parallel safe, see tools/parallel.py. The migration
+    transaction is committed first, for the scripts to see its work. The
+    modules of which the scripts touch the same tables are run one after the
+    other.
+    """
+    jobs = {}
+    accesses = {}
+    for pkg in self.graph:
+        scripts = _get_scripts(self, pkg, "pre")
+        if scripts and all(parallel.is_safe(script[2]) for script in scripts):
+            jobs[pkg.name] = _parallel_job(pkg, scripts)
+            for pyfile, _mod, _migrate, _version in scripts:
+                name = "%s/%s" % (pkg.name, _get_script_name(pyfile))
+                accesses[name] = tables.get_file_access(pyfile)
+    if len(jobs) < 2:
+        return
+    _logger.info(
+        "Running the pre-migration scripts of %s modules in parallel: %s",
+        len(jobs),
+        ", ".join(sorted(jobs)),
+    )
+    self.cr.commit()
+    parallel.run(
+        self.cr.dbname,
+        jobs,
+        parallel.add_conflicts(
+            parallel.get_dependencies(self.graph),
+            tables.get_conflicts(accesses),
+            [pkg.name for pkg in self.graph],
+        ),
+        parallel.workers(),
+    )
+
+
+def load_script(path, module_name):
+    mod = load_script._original_method(path, module_name)
+    collected = getattr(_running, "collected", None)
+    if collected is not None and hasattr(mod, "migrate"):
+        migrate = mod.migrate
+        mod.migrate = lambda cr, version: collected.append(
+            (path, mod, migrate, version)
+        )
+        return mod
+    if getattr(_running, "pkg", None) and hasattr(mod, "migrate"):
+        profiler.instrument(
+            mod, _running.pkg.name, _running.stage, _get_script_name(path)
+        )
+        mod.migrate = _checkpointed_migrate(mod.migrate, path)
+    return mod
 
 
 migrate_module._original_method = MigrationManager.migrate_module
 MigrationManager.migrate_module = migrate_module
+load_script._original_method = migration.load_script
+migration.load_script = load_script
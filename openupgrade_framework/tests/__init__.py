@@ -0,0 +1,13 @@
+from . import (
+    test_benchmark,
+    test_bulk,
+    test_checkpoint,
+    test_delta,
+    test_mail_migration,
+    test_parallel,
+    test_renames,
+    test_side,
+    test_staged,
+    test_tables,
+    test_views,
+)
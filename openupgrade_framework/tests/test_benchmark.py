@@ -0,0 +1,67 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from unittest.mock import patch
+
+from odoo.tests import common
+
+from odoo.addons.openupgrade_framework.tools import benchmark
+
+
+class TestBenchmark(common.TransactionCase):
+    def test_scale(self):
+        """The children follow the copies of their parent, and the unique
+        columns of the copies get a suffix"""
+        self.cr.execute(
+            """
+            CREATE TABLE openupgrade_test_parent (id serial PRIMARY KEY, name varchar);
+            CREATE TABLE openupgrade_test_child (
+                id serial PRIMARY KEY,
+                parent_id int,
+                code varchar UNIQUE,
+                name varchar,
+                UNIQUE (parent_id, name)
+            );
+            INSERT INTO openupgrade_test_parent (name) VALUES ('a'), ('b');
+            INSERT INTO openupgrade_test_child (parent_id, code, name)
+            VALUES (1, 'x', 'x'), (1, 'y', 'y'), (2, 'z', 'z')"""
+        )
+        dataset = [
+            ("openupgrade_test_parent", None),
+            ("openupgrade_test_child", "parent_id"),
+        ]
+        with patch.dict(benchmark.DATASETS, {"openupgrade_test_child": dataset}):
+            copies = benchmark.scale(self.cr, "openupgrade_test_child", 10)
+        self.assertEqual(copies, 3)
+        self.cr.execute("SELECT count(*) FROM openupgrade_test_parent")
+        self.assertEqual(self.cr.fetchone()[0], 8)
+        self.cr.execute(
+            """
+            SELECT id, parent_id, code, name FROM openupgrade_test_child
+            WHERE id IN (3, 6) ORDER BY id"""
+        )
+        self.assertEqual(self.cr.fetchall(), [(3, 2, "z", "z"), (6, 4, "z-1", "z")])
+
+    def test_get_durations(self):
+        entries = [
+            {"module": "account", "function": "", "wall_time": 2.0},
+            {"module": "account", "function": "migrate_moves", "wall_time": 1.5},
+            {"module": "account", "function": "", "wall_time": 1.0},
+            {"module": "mail", "function": "", "wall_time": 0.5},
+        ]
+        self.assertEqual(
+            benchmark.get_durations(entries), {"account": 3.0, "mail": 0.5}
+        )
+        self.assertEqual(benchmark.get_durations(entries, ["mail"]), {"mail": 0.5})
+
+    def test_compare(self):
+        results = {"modules": {"account": 12.0, "mail": 10.5, "project": 1.0}}
+        baseline = {"modules": {"account": 10.0, "mail": 10.0}}
+        self.assertEqual(
+            benchmark.compare(results, baseline),
+            [
+                ("account", 10.0, 12.0, True),
+                ("mail", 10.0, 10.5, False),
+                ("project", None, 1.0, False),
+            ],
+        )
+        self.assertFalse(benchmark.compare(results, baseline, 0.5)[0][3])
@@ -0,0 +1,61 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from odoo.tests import common
+
+from odoo.addons.openupgrade_framework.tools import bulk
+
+
+class TestBulk(common.TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.cr.execute(
+            """
+            CREATE TABLE openupgrade_test_bulk (
+                id serial PRIMARY KEY,
+                name varchar,
+                note text,
+                data jsonb,
+                active boolean,
+                amount numeric
+            )"""
+        )
+
+    def test_insert_escaping(self):
+        rows = [
+            ('a "quoted", name', "line 1\nline 2\r\n", {"key": 'a "b",\n'}, True, 1.5),
+            (None, "", None, False, None),
+            ("\\N", "NULL", {}, None, 0),
+        ]
+        count = bulk.insert(
+            self.cr,
+            "openupgrade_test_bulk",
+            ["name", "note", "data", "active", "amount"],
+            iter(rows),
+        )
+        self.assertEqual(count, 3)
+        self.cr.execute(
+            """
+            SELECT name, note, data, active, amount::float
+            FROM openupgrade_test_bulk ORDER BY id"""
+        )
+        self.assertEqual(self.cr.fetchall(), rows)
+
+    def test_insert_returning_ids(self):
+        ids = bulk.insert(
+            self.cr,
+            "openupgrade_test_bulk",
+            ["name"],
+            (("record %s" % index,) for index in range(5)),
+            returning_ids=True,
+        )
+        self.assertEqual(len(ids), 5)
+        self.cr.execute("SELECT id, name FROM openupgrade_test_bulk ORDER BY id")
+        self.assertEqual(
+            self.cr.fetchall(),
+            [(record_id, "record %s" % index) for index, record_id in enumerate(ids)],
+        )
+        # The sequence goes on after the reserved ids
+        self.cr.execute(
+            "INSERT INTO openupgrade_test_bulk (name) VALUES ('next') RETURNING id"
+        )
+        self.assertGreater(self.cr.fetchone()[0], max(ids))
@@ -0,0 +1,55 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from unittest.mock import MagicMock, patch
+
+from odoo.tests import common
+from odoo.tools import config
+
+from odoo.addons.openupgrade_framework.tools import checkpoint
+
+
+class TestCheckpoint(common.TransactionCase):
+    def test_ranges_resume(self):
+        """The ranges completed before an interruption are skipped"""
+        with patch.dict(config.options, {"openupgrade_commit_chunks": True}):
+            with patch.object(checkpoint, "commit") as commit:
+                done = []
+                for chunk in checkpoint.ranges(self.cr, "base", "test", 1, 45, 10):
+                    if len(done) == 2:
+                        # Interrupted while processing the third range
+                        break
+                    done.append(chunk)
+                self.assertEqual(done, [(1, 10), (11, 20)])
+                self.assertEqual(commit.call_count, 2)
+                resumed = list(checkpoint.ranges(self.cr, "base", "test", 1, 45, 10))
+            self.assertEqual(resumed, [(21, 30), (31, 40), (41, 45)])
+            checkpoint.clear(self.cr, "base")
+        self.assertFalse(checkpoint._has_tables(self.cr))
+
+    def test_no_tables_without_commits(self):
+        with patch.dict(config.options, {"openupgrade_commit_chunks": False}):
+            chunks = list(checkpoint.ranges(self.cr, "base", "test", 1, 15, 10))
+            checkpoint.mark_done(self.cr, "base", "test")
+            self.assertEqual(chunks, [(1, 10), (11, 15)])
+            self.assertFalse(checkpoint.is_done(self.cr, "base", "test"))
+            self.assertFalse(checkpoint._has_tables(self.cr))
+
+    def test_commit_reopens_savepoints(self):
+        cr = MagicMock()
+        for query in (
+            'SAVEPOINT "a"',
+            'SAVEPOINT "b"',
+            'ROLLBACK TO SAVEPOINT "b"',
+            'SAVEPOINT "c"',
+            'RELEASE SAVEPOINT "c"',
+            'SAVEPOINT "d"',
+            'SAVEPOINT "e"',
+            'RELEASE SAVEPOINT "d"',
+        ):
+            checkpoint._track_savepoint(cr, query)
+        checkpoint.commit(cr)
+        cr.commit.assert_called_once_with()
+        self.assertEqual(
+            [call.args[0] for call in cr.execute.call_args_list],
+            ['SAVEPOINT "a"', 'SAVEPOINT "b"'],
+        )
@@ -0,0 +1,84 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+
+from openupgradelib import openupgrade
+
+from odoo.tests import common
+
+from odoo.addons.openupgrade_framework.tools import delta
+
+SCRIPT = """
+from openupgradelib import openupgrade
+
+from odoo.addons.openupgrade_framework.tools import delta
+
+
+{decorator}
+@openupgrade.migrate()
+def migrate(env, version):
+    openupgrade.logged_query(
+        env.cr,
+        "UPDATE res_partner SET comment = 'replayed' WHERE {{}}".format(
+            delta.where("res_partner")
+        ),
+    )
+"""
+
+
+class TestDelta(common.TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.copied, self.other = self.env["res.partner"].create(
+            [{"name": "Copied"}, {"name": "Other"}]
+        )
+        self.env["base"].flush()
+        # The rows copied from production
+        self.cr.execute(
+            """
+            CREATE TEMP TABLE openupgrade_delta_row (
+                table_name varchar, res_id integer);
+            INSERT INTO openupgrade_delta_row VALUES ('res_partner', %s)""",
+            (self.copied.id,),
+        )
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def _replay(self, decorator):
+        pyfile = os.path.join(self.directory, "post-migration.py")
+        with open(pyfile, "w") as script:
+            script.write(SCRIPT.format(decorator=decorator))
+        pkg = SimpleNamespace(name="openupgrade_test")
+        delta._replay.active = True
+        try:
+            delta._run_script(self.cr, pkg, "post", pyfile, "13.0.1.0")
+        finally:
+            delta._replay.active = False
+        self.env["res.partner"].invalidate_cache(["comment"])
+
+    def test_replay(self):
+        """A replayable script only transforms the copied rows"""
+        with self.assertLogs("OpenUpgrade", "INFO") as logs:
+            self._replay("@delta.replayable")
+        self.assertIn(
+            "openupgrade_test: post-migration script called with version 13.0.1.0",
+            "\n".join(logs.output),
+        )
+        self.assertNotIn("failed to inspect", "\n".join(logs.output))
+        self.assertEqual(self.copied.comment, "replayed")
+        self.assertFalse(self.other.comment)
+
+    def test_not_replayable(self):
+        self._replay("")
+        self.assertFalse(self.copied.comment)
+
+    def test_column_map(self):
+        """The legacy columns get the value of their original column"""
+        legacy = openupgrade.get_legacy_name("date")
+        self.assertEqual(
+            delta._get_column_map({"id", "date", "name"}, {"id", legacy, "new"}),
+            {"id": "id", legacy: "date"},
+        )
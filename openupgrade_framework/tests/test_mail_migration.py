@@ -0,0 +1,49 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+import os
+
+from openupgradelib import openupgrade
+
+from odoo.modules import get_module_path
+from odoo.modules.migration import load_script
+from odoo.tests import common
+
+
+class TestMailMigration(common.TransactionCase):
+    def setUp(self):
+        super().setUp()
+        path = os.path.join(
+            get_module_path("openupgrade_scripts"),
+            "scripts",
+            "mail",
+            "14.0.1.0",
+            "pre-migration.py",
+        )
+        self.script = load_script(path, "mail_pre_migration")
+        # The temporary tables shadow the tables of the database, if any
+        self.cr.execute(  # pylint: disable=sql-injection
+            """
+            CREATE TEMP TABLE mail_message (id int, model varchar);
+            CREATE TEMP TABLE mail_tracking_value (
+                id int, mail_message_id int, {} varchar, field int4
+            );
+            INSERT INTO mail_message VALUES (1, 'res.partner');
+            INSERT INTO mail_tracking_value VALUES
+                (1, 1, 'name', NULL), (2, 1, 'openupgrade_removed_field', NULL)
+            """.format(
+                openupgrade.get_legacy_name("field")
+            )
+        )
+
+    def test_orphan_tracking_values(self):
+        """The values of removed fields are moved, and the count is logged"""
+        with self.assertLogs(self.script.__name__, "WARNING") as logs:
+            self.script.fill_mail_tracking_value_field(self.env)
+        self.assertIn("1 tracking values", logs.output[0])
+        self.cr.execute("SELECT id FROM mail_tracking_value")
+        self.assertEqual(self.cr.fetchall(), [(1,)])
+        self.cr.execute("SELECT id FROM openupgrade_orphan_mail_tracking_value")
+        self.assertEqual(self.cr.fetchall(), [(2,)])
+        self.cr.execute("SELECT field FROM mail_tracking_value")
+        field = self.env["ir.model.fields"]._get("res.partner", "name")
+        self.assertEqual(self.cr.fetchone()[0], field.id)
@@ -0,0 +1,35 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from odoo.tests import common
+from odoo.tools import config
+
+from odoo.addons.openupgrade_framework.odoo_patch.odoo.modules import migration
+from odoo.addons.openupgrade_framework.tools import checkpoint
+
+
+class TestParallelScripts(common.TransactionCase):
+    def test_safe_script_runs_once(self):
+        """A script run in parallel is skipped by the loader afterwards, even
+        when the chunks are not committed"""
+        calls = []
+
+        def migrate(cr, version):
+            calls.append(version)
+
+        pkg = SimpleNamespace(name="openupgrade_test")
+        pyfile = "/scripts/openupgrade_test/14.0.1.0/pre-migration.py"
+        mod = SimpleNamespace(migrate=migrate)
+        with patch.dict(config.options, {"openupgrade_commit_chunks": False}):
+            job = migration._parallel_job(pkg, [(pyfile, mod, migrate, "14.0.1.0")])
+            job(self.cr)
+            migration._running.pkg, migration._running.stage = pkg, "pre"
+            try:
+                migration._checkpointed_migrate(migrate, pyfile)(self.cr, "14.0.1.0")
+            finally:
+                migration._running.pkg = migration._running.stage = None
+            self.assertEqual(calls, ["14.0.1.0"])
+            checkpoint.clear(self.cr, pkg.name)
+        self.assertFalse(checkpoint._has_tables(self.cr))
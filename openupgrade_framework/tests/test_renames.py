@@ -0,0 +1,52 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from odoo.tests import common
+
+from odoo.addons.openupgrade_framework.tools import renames
+from odoo.addons.openupgrade_scripts.apriori import RenameMap
+
+
+class TestRenameMap(common.BaseCase):
+    def test_chains(self):
+        names = RenameMap("modules", {"a": "b"}, {"d": "a", "e": "b"})
+        self.assertEqual(names.closure, {"a": "b", "d": "b", "e": "b"})
+        self.assertEqual(names.renames(), {"a": "b"})
+        self.assertEqual(names.merges(), {"d": "b", "e": "b"})
+        self.assertEqual(names.origins("b"), ["a", "d", "e"])
+        self.assertEqual(names.get("d"), "b")
+        self.assertEqual(names.get("f"), "f")
+
+    def test_invalid(self):
+        with self.assertRaisesRegex(ValueError, "both renamed and merged"):
+            RenameMap("modules", {"a": "b"}, {"a": "c"})
+        with self.assertRaisesRegex(ValueError, "Cycle"):
+            RenameMap("modules", {"a": "b", "b": "a"}, {})
+        with self.assertRaisesRegex(ValueError, "declare all but one as merged"):
+            RenameMap("modules", {"a": "c", "b": "c"}, {})
+
+
+class TestRenames(common.TransactionCase):
+    def test_merge_state(self):
+        """The new module gets the state of a merged module that is not
+        uninstalled, rather than of the first one"""
+        Module = self.env["ir.module.module"]
+        for name, state in (
+            ("openupgrade_test_a", "uninstalled"),
+            ("openupgrade_test_b", "installed"),
+            ("openupgrade_test_new", "uninstalled"),
+        ):
+            Module.create({"name": name, "state": state})
+        Module.flush()
+        renames.update_module_names(
+            self.cr,
+            {},
+            {
+                "openupgrade_test_a": "openupgrade_test_new",
+                "openupgrade_test_b": "openupgrade_test_new",
+            },
+        )
+        self.cr.execute(
+            "SELECT name, state FROM ir_module_module WHERE name LIKE %s",
+            ("openupgrade_test_%",),
+        )
+        self.assertEqual(self.cr.fetchall(), [("openupgrade_test_new", "installed")])
@@ -0,0 +1,37 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from unittest.mock import patch
+
+from odoo.tests import common
+
+from odoo.addons.openupgrade_framework.tools import side
+
+
+class TestSide(common.TransactionCase):
+    def test_submit_pending_table(self):
+        """The queries on the tables changed by the transaction run on its
+        cursor, and see its changes"""
+        self.cr.execute(
+            """
+            CREATE TABLE openupgrade_test_side (id serial PRIMARY KEY, name varchar);
+            INSERT INTO openupgrade_test_side (name) VALUES ('a'), ('b')"""
+        )
+        self.assertIn("openupgrade_test_side", side.get_pending_tables(self.cr))
+        with patch.object(side, "_fetch") as fetch:
+            future = side.submit(
+                self.cr,
+                "SELECT name FROM openupgrade_test_side ORDER BY id",
+                tables=["openupgrade_test_side"],
+            )
+            self.assertTrue(future.done())
+            self.assertEqual(future.result(), [("a",), ("b",)])
+            fetch.assert_not_called()
+
+    def test_submit_side_connection(self):
+        """The queries on the other tables run on a side connection"""
+        self.cr.execute("SELECT count(*) FROM res_lang")
+        count = self.cr.fetchone()[0]
+        future = side.submit(
+            self.cr, "SELECT count(*) FROM res_lang", tables=["res_lang"]
+        )
+        self.assertEqual(future.result(timeout=60), [(count,)])
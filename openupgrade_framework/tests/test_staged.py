@@ -0,0 +1,70 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from contextlib import nullcontext
+from unittest.mock import MagicMock, patch
+
+from odoo import sql_db
+from odoo.modules.registry import Registry
+from odoo.tests import common, tagged
+from odoo.tools import config
+
+from odoo.addons.openupgrade_framework.tools import staged
+
+
+# After the installation, for no other module to be deferred
+@tagged("post_install", "-at_install")
+class TestStaged(common.TransactionCase):
+    def setUp(self):
+        super().setUp()
+        self.module = self.env["ir.module.module"].create(
+            {"name": "openupgrade_test_pending", "state": "to upgrade"}
+        )
+        self.menu = self.env["ir.ui.menu"].create({"name": "Pending"})
+        self.env["ir.model.data"].create(
+            {
+                "module": "openupgrade_test_pending",
+                "name": "menu_pending",
+                "model": "ir.ui.menu",
+                "res_id": self.menu.id,
+            }
+        )
+        self.env["base"].flush()
+
+    def test_not_migrating(self):
+        """The modules are only deferred by the migration"""
+        with patch.dict(config.options, {"openupgrade_core_modules": "base"}):
+            with patch.object(staged, "_migrating", set()):
+                self.assertFalse(staged.get_excluded(self.cr))
+        self.assertFalse(staged.get_pending(self.cr))
+
+    def test_run_pending(self):
+        """The records deactivated when the module is deferred are activated
+        again once it is upgraded"""
+        with patch.dict(config.options, {"openupgrade_core_modules": "base"}):
+            staged.defer_modules(self.cr)
+        self.assertEqual(staged.get_pending(self.cr), {"openupgrade_test_pending"})
+        self.menu.invalidate_cache()
+        self.assertFalse(self.menu.active)
+
+        def upgrade(dbname, update_module=False):
+            self.cr.execute(
+                "UPDATE ir_module_module SET state = 'installed' WHERE id = %s",
+                (self.module.id,),
+            )
+            return registry
+
+        registry = MagicMock()
+        registry.cursor.return_value = nullcontext(self.cr)
+        # The cursor of the test, which must not be closed
+        side_cr = MagicMock(wraps=self.cr)
+        side_cr.close = MagicMock()
+        with patch.object(sql_db, "db_connect") as db_connect:
+            db_connect.return_value.cursor.return_value = side_cr
+            with patch.object(Registry, "new", side_effect=upgrade):
+                staged.run_pending(self.cr.dbname)
+        self.menu.invalidate_cache()
+        self.assertTrue(self.menu.active)
+        self.assertFalse(staged.get_pending(self.cr))
+        self.cr.execute("SELECT to_regclass('openupgrade_pending_record')")
+        self.assertIsNone(self.cr.fetchone()[0])
+        registry.signal_changes.assert_called_once_with()
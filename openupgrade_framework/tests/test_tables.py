@@ -0,0 +1,99 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from odoo.tests import common
+
+from odoo.addons.openupgrade_framework.tools import parallel, tables
+
+SCRIPT = '''
+COLUMNS = {"sale_order": [("note", "old_note")]}
+
+
+def migrate(env, version):
+    openupgrade.rename_columns(env.cr, COLUMNS)
+    openupgrade.logged_query(
+        env.cr,
+        """
+        WITH lines AS (SELECT order_id FROM sale_order_line)
+        UPDATE sale_order so SET note = old_note
+        FROM lines JOIN res_partner rp ON rp.id = 1
+        WHERE EXTRACT(year FROM so.date_order) > 2000
+        """,
+    )
+    bulk.insert(env.cr, "sale_order_tag", ["name"], [])
+    env["crm.team"].search([])
+    openupgrade.rename_tables(env.cr, TABLES)
+'''
+
+
+class TestTables(common.BaseCase):
+    def test_sql_tables(self):
+        reads, writes = tables.get_sql_tables(
+            "INSERT INTO a (x) SELECT x FROM b JOIN c USING (id) WHERE x IN "
+            "(SELECT x FROM a)"
+        )
+        self.assertEqual(reads, {"b", "c"})
+        self.assertEqual(writes, {"a"})
+
+    def test_access(self):
+        access = tables.get_access(SCRIPT)
+        self.assertEqual(access["reads"], ["res_partner", "sale_order_line"])
+        self.assertEqual(access["writes"], ["crm_team", "sale_order", "sale_order_tag"])
+        self.assertEqual(access["unresolved"], ["rename_tables (line 18)"])
+
+    def test_conflicts(self):
+        accesses = {
+            "sale/14.0.1.1/pre-migration.py": {
+                "reads": ["res_partner"],
+                "writes": ["ir_model_data", "sale_order"],
+            },
+            "sale/14.0.1.1/post-migration.py": {
+                "reads": [],
+                "writes": ["sale_order"],
+            },
+            "crm/14.0.1.0/pre-migration.py": {
+                "reads": ["sale_order"],
+                "writes": ["ir_model_data", "crm_lead"],
+            },
+            "contacts/14.0.1.0/pre-migration.py": {
+                "reads": ["crm_lead"],
+                "writes": ["res_partner"],
+            },
+        }
+        self.assertEqual(
+            tables.get_conflicts(accesses),
+            {
+                (
+                    "crm/14.0.1.0/pre-migration.py",
+                    "sale/14.0.1.1/pre-migration.py",
+                ): ["sale_order"],
+                (
+                    "crm/14.0.1.0/pre-migration.py",
+                    "sale/14.0.1.1/post-migration.py",
+                ): ["sale_order"],
+                (
+                    "contacts/14.0.1.0/pre-migration.py",
+                    "crm/14.0.1.0/pre-migration.py",
+                ): ["crm_lead"],
+                (
+                    "contacts/14.0.1.0/pre-migration.py",
+                    "sale/14.0.1.1/pre-migration.py",
+                ): ["res_partner"],
+            },
+        )
+
+
+class TestParallel(common.BaseCase):
+    def test_add_conflicts(self):
+        """The later module of a conflict in the order depends on the earlier
+        one, unless it already does"""
+        dependencies = {"base": set(), "crm": {"base"}, "sale": {"base"}}
+        conflicts = {
+            ("crm/14.0.1.0/pre-migration.py", "sale/14.0.1.1/pre-migration.py"),
+            ("base/14.0.1.3/pre-migration.py", "crm/14.0.1.0/pre-migration.py"),
+        }
+        result = parallel.add_conflicts(
+            dependencies, conflicts, ["base", "sale", "crm"]
+        )
+        self.assertEqual(
+            result, {"base": set(), "crm": {"base", "sale"}, "sale": {"base"}}
+        )
@@ -0,0 +1,62 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+from odoo.tests import common
+
+from odoo.addons.openupgrade_framework.tools import views
+
+
+class TestViews(common.TransactionCase):
+    def setUp(self):
+        super().setUp()
+        View = self.env["ir.ui.view"]
+        self.root = View.create(
+            {
+                "name": "openupgrade_test_root",
+                "model": "res.partner",
+                "type": "form",
+                "arch": '<form><field name="name"/></form>',
+            }
+        )
+        # Not validated out of an audit
+        self.broken = View.create(
+            {
+                "name": "openupgrade_test_broken",
+                "model": "res.partner",
+                "inherit_id": self.root.id,
+                "arch": '<field name="name" position="after">'
+                '<field name="openupgrade_test_missing"/></field>',
+            }
+        )
+        self.valid = View.create(
+            {
+                "name": "openupgrade_test_valid",
+                "model": "res.partner",
+                "inherit_id": self.root.id,
+                "arch": '<field name="name" position="after">'
+                '<field name="email"/></field>',
+            }
+        )
+
+    def test_hash_by_view(self):
+        """The extensions of the same root view share the combined arch, but
+        not their key in the audit table"""
+        self.assertNotEqual(
+            views._hash_view(self.broken, "base:14.0.1.3"),
+            views._hash_view(self.valid, "base:14.0.1.3"),
+        )
+        self.assertEqual(
+            views._hash_view(self.valid, "base:14.0.1.3"),
+            views._hash_view(self.valid, "base:14.0.1.3"),
+        )
+
+    def test_own_error(self):
+        """Only the extension that introduces the error is reported"""
+        env = self.env(context={views.AUDIT_CONTEXT: True})
+        broken, valid = self.broken.with_env(env), self.valid.with_env(env)
+        self.assertTrue(views._check_view(valid))
+        alone_errors = {}
+        self.assertIsNone(views._get_own_error(valid, alone_errors))
+        self.assertIn(
+            "openupgrade_test_missing", views._get_own_error(broken, alone_errors)
+        )
+        self.assertTrue(valid.active)
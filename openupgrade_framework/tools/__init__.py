@@ -0,0 +1,19 @@
+from . import (
+    batch,
+    benchmark,
+    bulk,
+    checkpoint,
+    delta,
+    empty,
+    estimate,
+    indexes,
+    noupdate,
+    parallel,
+    profiler,
+    renames,
+    side,
+    staged,
+    tables,
+    views,
+    xmlids,
+)
@@ -0,0 +1,96 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Queries that rewrite large tables, run in ranges of ids.
+
+A single UPDATE of tens of millions of rows writes as much WAL and dead
+tuples, holds its locks until the end of the migration and may run out of
+disk. ``batch.logged_query`` runs such a query for one range of ids of the
+table at a time, instead of ``openupgrade.logged_query``. The query restricts
+the rows of the table to the range with the parameters ``%(first_id)s`` and
+``%(last_id)s``::
+
+    batch.logged_query(
+        env.cr,
+        \"\"\"
+        UPDATE account_move_line aml
+        SET date = am.date
+        FROM account_move am
+        WHERE aml.move_id = am.id AND aml.date IS NULL
+            AND aml.id BETWEEN %(first_id)s AND %(last_id)s\"\"\",
+        "account_move_line",
+    )
+
+The ranges are checkpoints (see checkpoint.py): when the option
+``openupgrade_commit_chunks`` is set, each range is committed, the completed
+ranges are skipped when resuming the migration, and the table is vacuumed
+regularly, on a separate connection, to reuse the space of the dead tuples.
+"""
+import hashlib
+import inspect
+import logging
+import os
+import time
+from contextlib import closing
+
+from odoo import sql_db
+
+from . import checkpoint
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_SIZE = 100000
+# Number of committed ranges after which the table is vacuumed
+VACUUM_INTERVAL = 10
+
+
+def vacuum(dbname, table):
+    """Vacuum and analyze the table on a separate connection, as VACUUM cannot
+    run inside a transaction. Only the dead tuples of committed transactions
+    are reclaimed.
+    """
+    start = time.time()
+    with closing(sql_db.db_connect(dbname).cursor()) as cr:
+        cr.autocommit(True)
+        cr.execute("VACUUM ANALYZE {}".format(table))  # pylint: disable=sql-injection
+    _logger.info("Vacuumed %s in %.1fs", table, time.time() - start)
+
+
+def logged_query(cr, query, table, params=None, size=DEFAULT_SIZE, module=None):
+    """Run the query for each range of ids of the table, and return the total
+    number of affected rows.
+
+    :param params: dict of the other parameters of the query.
+    :param module: module of which the checkpoints keep the completed ranges,
+        by default the one of the calling migration script.
+    """
+    cr.execute(  # pylint: disable=sql-injection
+        "SELECT min(id), max(id) FROM {}".format(table)
+    )
+    first_id, last_id = cr.fetchone()
+    if first_id is None:
+        return 0
+    if not module:
+        caller = inspect.currentframe().f_back.f_code.co_filename
+        module = os.path.basename(os.path.dirname(os.path.dirname(caller)))
+    step = "query:%s" % hashlib.md5(query.encode()).hexdigest()
+    count = (last_id - first_id) // size + 1
+    rowcount = 0
+    start = time.time()
+    _logger.debug("Running in %s ranges of ids of %s: %s", count, table, query)
+    for chunk in checkpoint.ranges(cr, module, step, first_id, last_id, size):
+        index = (chunk[0] - first_id) // size
+        if checkpoint.commit_enabled() and index and not index % VACUUM_INTERVAL:
+            vacuum(cr.dbname, table)
+        cr.execute(query, dict(params or {}, first_id=chunk[0], last_id=chunk[1]))
+        rowcount += max(cr.rowcount, 0)
+        _logger.info(
+            "%s: range %s/%s of ids done, %s rows affected, %.0f rows/s",
+            table,
+            index + 1,
+            count,
+            rowcount,
+            rowcount / max(time.time() - start, 0.001),
+        )
+    if checkpoint.commit_enabled():
+        vacuum(cr.dbname, table)
+    return rowcount
@@ -0,0 +1,233 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Benchmark of the migration on scaled databases.
+
+The benchmark copies a 13.0 database, scales its data up to the requested
+number of rows, migrates the copy with the profiler enabled (see
+profiler.py), and writes the durations of the modules to a JSON results file.
+The results can be compared with the ones of an earlier run, to catch the
+changes of the migration scripts that make them slower.
+
+The data is scaled by copying the existing records of sets of tables, with
+their children, as many times as needed: the copies of a record get the ids
+``id + n * span``, where span is the greatest id of the table, and the
+references of the children to their parent follow. The other references are
+kept, so the copies share their partners, accounts, users... with the
+originals. The columns of the unique indexes of the tables get a suffix in the
+copies, or NULL when they are not strings, except for the indexes including
+the id or the parent. The template database must contain some records of each
+set.
+"""
+import json
+import logging
+import math
+import time
+from contextlib import closing
+
+from odoo import sql_db
+from odoo.modules.registry import Registry
+from odoo.service import db
+from odoo.tools import config
+
+from . import batch, profiler
+
+_logger = logging.getLogger(__name__)
+
+# Sets of tables scaled together, by the table of which the rows are counted,
+# as (table, column referring to the parent) tuples, the first table being the
+# parent
+DATASETS = {
+    "account_move_line": [
+        ("account_move", None),
+        ("account_move_line", "move_id"),
+    ],
+    "account_bank_statement_line": [
+        ("account_bank_statement", None),
+        ("account_bank_statement_line", "statement_id"),
+    ],
+    "calendar_event": [
+        ("calendar_event", None),
+        ("calendar_attendee", "event_id"),
+    ],
+    "mail_tracking_value": [
+        ("mail_message", None),
+        ("mail_tracking_value", "mail_message_id"),
+    ],
+    "project_task": [
+        ("project_project", None),
+        ("project_task", "project_id"),
+    ],
+}
+
+# Relative increase of the duration of a module that is a regression
+DEFAULT_TOLERANCE = 0.1
+
+
+def _count(cr, table):
+    cr.execute(  # pylint: disable=sql-injection
+        "SELECT count(*), max(id) FROM {}".format(table)
+    )
+    count, max_id = cr.fetchone()
+    return count, max_id or 0
+
+
+def _get_columns(cr, table):
+    cr.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s
+        ORDER BY ordinal_position""",
+        (table,),
+    )
+    return [row[0] for row in cr.fetchall()]
+
+
+def _get_unique_values(cr, table, parent_column):
+    """Return the values of the copies of the columns of the unique indexes of
+    the table, by column"""
+    cr.execute(
+        """
+        SELECT i.indexrelid, a.attname, t.typcategory = 'S'
+        FROM pg_index i
+        JOIN pg_attribute a
+            ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+        JOIN pg_type t ON t.oid = a.atttypid
+        WHERE i.indrelid = %s::regclass AND i.indisunique AND NOT i.indisprimary""",
+        (table,),
+    )
+    indexes = {}
+    for index, column, is_string in cr.fetchall():
+        indexes.setdefault(index, {})[column] = is_string
+    values = {}
+    for columns in indexes.values():
+        if "id" in columns or parent_column in columns:
+            continue
+        strings = [column for column, is_string in columns.items() if is_string]
+        for column in strings or columns:
+            values[column] = (
+                "t.{} || '-' || n".format(column) if columns[column] else "NULL"
+            )
+    return values
+
+
+def scale(cr, dataset, rows):
+    """Copy the records of the dataset until the counted table has at least
+    the given number of rows, and return the number of copies made of each record
+    """
+    count = _count(cr, dataset)[0]
+    if not count:
+        raise ValueError("The template database has no record in %s" % dataset)
+    copies = math.ceil(rows / count) - 1
+    if copies < 1:
+        return 0
+    spans = {}
+    parent = None
+    for table, parent_column in DATASETS[dataset]:
+        spans[table] = _count(cr, table)[1]
+        columns = _get_columns(cr, table)
+        unique_values = _get_unique_values(cr, table, parent_column)
+        values = []
+        for column in columns:
+            if column == "id":
+                values.append("t.id + n * {}".format(spans[table]))
+            elif column == parent_column:
+                values.append("t.{} + n * {}".format(column, spans[parent]))
+            elif column in unique_values:
+                values.append(unique_values[column])
+            else:
+                values.append("t.{}".format(column))
+        start = time.time()
+        cr.execute(  # pylint: disable=sql-injection
+            """
+            INSERT INTO {table} ({columns})
+            SELECT {values} FROM {table} t, generate_series(1, %s) n""".format(
+                table=table, columns=", ".join(columns), values=", ".join(values)
+            ),
+            (copies,),
+        )
+        _logger.info(
+            "%s: %s rows added in %.1fs", table, cr.rowcount, time.time() - start
+        )
+        cr.execute(
+            """
+            SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)
+            WHERE pg_get_serial_sequence(%s, 'id') IS NOT NULL""",
+            (table, spans[table] * (copies + 1), table),
+        )
+        parent = table
+    return copies
+
+
+def get_durations(entries, modules=None):
+    """Return the total duration of each module, from the entries of the
+    profiler"""
+    durations = {}
+    for entry in entries:
+        if entry["function"] or (modules and entry["module"] not in modules):
+            continue
+        durations.setdefault(entry["module"], 0.0)
+        durations[entry["module"]] += entry["wall_time"]
+    return durations
+
+
+def run(template, scales, modules=None, keep=False):
+    """Migrate a copy of the template database scaled to the given numbers of
+    rows per dataset, and return the results, with the durations of the
+    modules.
+
+    :param scales: dict of the number of rows of the datasets to reach
+    :param modules: the modules of which to return the durations, by default
+        all of them
+    """
+    dbname = "%s_benchmark_%s" % (template, int(time.time()))
+    _logger.info("Copying %s to %s", template, dbname)
+    db.exp_duplicate_database(template, dbname)
+    try:
+        with closing(sql_db.db_connect(dbname).cursor()) as cr:
+            for dataset, rows in sorted(scales.items()):
+                scale(cr, dataset, rows)
+            cr.commit()
+        for dataset in sorted(scales):
+            for table, _column in DATASETS[dataset]:
+                batch.vacuum(dbname, table)
+        # Enabled explicitly, as the option was not set when it was imported
+        profiler.enable(
+            config.get("openupgrade_profile_report") or "/tmp/%s.json" % dbname
+        )
+        config["update"]["all"] = 1
+        start = time.time()
+        Registry.new(dbname, update_module=True)
+        total = time.time() - start
+        profiler.write_report()
+    finally:
+        sql_db.close_db(dbname)
+        if not keep:
+            db.exp_drop(dbname)
+    return {
+        "template": template,
+        "scales": scales,
+        "total": total,
+        "modules": get_durations(profiler.get_entries(), modules),
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return (module, baseline duration, duration, regression) for the
+    modules of the results, regression being whether the module got slower
+    than the baseline by more than the tolerance"""
+    lines = []
+    for module, duration in sorted(results["modules"].items()):
+        previous = baseline.get("modules", {}).get(module)
+        regression = bool(previous) and duration > previous * (1 + tolerance)
+        lines.append((module, previous, duration, regression))
+    return lines
+
+
+def write_results(path, results):
+    with open(path, "w") as results_file:
+        json.dump(results, results_file, indent=1, sort_keys=True)
+
+
+def read_results(path):
+    with open(path) as results_file:
+        return json.load(results_file)
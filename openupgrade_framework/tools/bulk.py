@@ -0,0 +1,106 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Insertion of rows built in Python with COPY.
+
+Inserting the rows built by a script with one INSERT per row costs a round
+trip and the parsing of a query per row. ``bulk.insert`` streams the rows into
+the table with ``COPY FROM STDIN``, in CSV format, from any iterable of tuples
+of which the values are in the order of the columns::
+
+    bulk.insert(
+        env.cr,
+        "account_group",
+        ["parent_id", "name", "company_id"],
+        ((parent_id, name, company_id) for ... in ...),
+    )
+
+The rows of a generator are not loaded in memory at once, except when the ids
+of the inserted rows are returned: they are then reserved from the sequence of
+the table beforehand, like ``reserve_ids`` does, and inserted with the rows.
+
+The values can be None for NULL, booleans, numbers, strings, dates and dicts,
+which are written as JSON. COPY does not run the defaults of the ORM, only the
+ones of the columns in the database, nor the ON CONFLICT clauses.
+"""
+import json
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+
+def reserve_ids(cr, table, count):
+    """Return count new ids from the sequence of the id of the table"""
+    cr.execute(
+        """
+        SELECT nextval(pg_get_serial_sequence(%s, 'id'))
+        FROM generate_series(1, %s)""",
+        (table, count),
+    )
+    return [row[0] for row in cr.fetchall()]
+
+
+def _format(value):
+    """Return the value as a field of a CSV line for COPY"""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, dict):
+        value = json.dumps(value)
+    return '"{}"'.format(str(value).replace('"', '""'))
+
+
+class _RowStream:
+    """File-like object of the CSV lines of the rows, read by COPY"""
+
+    def __init__(self, rows):
+        self.lines = (",".join(map(_format, row)) + "\n" for row in rows)
+        self.buffer = ""
+        self.count = 0
+
+    def read(self, size=-1):
+        chunks = [self.buffer]
+        length = len(self.buffer)
+        while size < 0 or length < size:
+            line = next(self.lines, None)
+            if line is None:
+                break
+            chunks.append(line)
+            length += len(line)
+            self.count += 1
+        data = "".join(chunks)
+        if size < 0:
+            self.buffer = ""
+            return data
+        self.buffer = data[size:]
+        return data[:size]
+
+
+def insert(cr, table, columns, rows, returning_ids=False):
+    """Insert the rows in the table with COPY, and return the number of
+    inserted rows, or their ids in the order of the rows.
+
+    :param columns: the names of the columns of the values of the rows
+    :param rows: iterable of tuples of values
+    :param returning_ids: whether to reserve and return the ids of the rows,
+        which must not be among the columns
+    """
+    ids = None
+    if returning_ids:
+        rows = list(rows)
+        ids = reserve_ids(cr, table, len(rows))
+        rows = ((ids[index],) + tuple(row) for index, row in enumerate(rows))
+        columns = ["id"] + list(columns)
+    stream = _RowStream(rows)
+    start = time.time()
+    cr.copy_expert(
+        "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(table, ", ".join(columns)),
+        stream,
+    )
+    _logger.debug(
+        "%s rows copied into %s in %.1fs", stream.count, table, time.time() - start
+    )
+    return ids if returning_ids else stream.count
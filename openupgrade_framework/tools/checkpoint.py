@@ -0,0 +1,337 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Resumable checkpoints for long running migration steps.
+
+Migration functions can opt in to record their progress in the bookkeeping
+tables ``openupgrade_checkpoint`` and ``openupgrade_checkpoint_chunk``. The
+records are only written when the option ``openupgrade_commit_chunks`` is
+set, in which case each completed chunk is committed, so that they survive a
+failure. A rerun then skips the steps and chunks that were completed before,
+instead of starting again from zero.
+
+The chunks are committed within the savepoint that the migrate decorator of
+openupgradelib opens around each script. While the savepoints are tracked
+(see ``track_savepoints``), the savepoints that are open on the cursor are
+opened again after each commit, for their code to release them.
+
+The pre-migration scripts run in parallel (see parallel.py) are committed in
+any case, and are always recorded as completed, so that the loader of Odoo
+does not run them again.
+
+Checkpoints of a module are removed once all its migration stages are done,
+and the tables are dropped once they are empty.
+"""
+import inspect
+import json
+import logging
+import os
+import re
+import weakref
+from contextlib import contextmanager
+from functools import wraps
+
+from odoo.sql_db import Cursor
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+SAVEPOINT_RE = re.compile(
+    r'^\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT)\s+"?([^"\s;]+)"?',
+    re.IGNORECASE,
+)
+
+# Names of the savepoints open on the cursors, while they are tracked
+_savepoints = weakref.WeakKeyDictionary()
+
+
+def _track_savepoint(cr, query):
+    match = SAVEPOINT_RE.match(query)
+    if not match:
+        return
+    command, name = match.group(1).upper(), match.group(2)
+    names = _savepoints.setdefault(cr, [])
+    if command == "SAVEPOINT":
+        names.append(name)
+    elif name in names:
+        # A release also releases the inner savepoints, a rollback keeps the
+        # savepoint itself
+        del names[names.index(name) + (command != "RELEASE SAVEPOINT") :]
+
+
+@contextmanager
+def track_savepoints():
+    """Track the savepoints opened on the cursors within the context, when
+    the chunks are committed"""
+    if not commit_enabled():
+        yield
+        return
+    original_method = Cursor.execute
+
+    def execute(self, query, *args, **kwargs):
+        res = original_method(self, query, *args, **kwargs)
+        if isinstance(query, str):
+            _track_savepoint(self, query)
+        return res
+
+    Cursor.execute = execute
+    try:
+        yield
+    finally:
+        Cursor.execute = original_method
+        _savepoints.clear()
+
+
+def commit(cr):
+    """Commit the transaction of the cursor, and open again the tracked
+    savepoints that were open on it"""
+    names = _savepoints.pop(cr, [])
+    cr.commit()
+    for name in names:
+        cr.execute('SAVEPOINT "%s"' % name)
+
+
+def _has_tables(cr):
+    cr.execute("SELECT to_regclass('openupgrade_checkpoint') IS NOT NULL")
+    return cr.fetchone()[0]
+
+
+def _ensure_tables(cr):
+    cr.execute(
+        """
+        CREATE TABLE IF NOT EXISTS openupgrade_checkpoint (
+            module varchar NOT NULL,
+            step varchar NOT NULL,
+            done boolean NOT NULL DEFAULT FALSE,
+            state text,
+            write_date timestamp DEFAULT (now() at time zone 'UTC'),
+            PRIMARY KEY (module, step)
+        );
+        CREATE TABLE IF NOT EXISTS openupgrade_checkpoint_chunk (
+            module varchar NOT NULL,
+            step varchar NOT NULL,
+            first_id integer NOT NULL,
+            last_id integer NOT NULL,
+            create_date timestamp DEFAULT (now() at time zone 'UTC')
+        )"""
+    )
+
+
+def commit_enabled():
+    """Return whether completed chunks are committed"""
+    return bool(config.get("openupgrade_commit_chunks"))
+
+
+def _upsert(cr, module, step, column, value, force=False):
+    if not (force or commit_enabled()):
+        return
+    _ensure_tables(cr)
+    cr.execute(  # pylint: disable=sql-injection
+        """
+        INSERT INTO openupgrade_checkpoint (module, step, {0})
+        VALUES (%s, %s, %s)
+        ON CONFLICT (module, step) DO UPDATE
+        SET {0} = EXCLUDED.{0}, write_date = now() at time zone 'UTC'
+        """.format(
+            column
+        ),
+        (module, step, value),
+    )
+
+
+def is_done(cr, module, step):
+    """Return whether the step of the module was completed before"""
+    if not _has_tables(cr):
+        return False
+    cr.execute(
+        """SELECT done FROM openupgrade_checkpoint
+        WHERE module = %s AND step = %s""",
+        (module, step),
+    )
+    row = cr.fetchone()
+    return bool(row and row[0])
+
+
+def mark_done(cr, module, step, force=False):
+    """Record the step of the module as completed, when commit_enabled().
+
+    :param force: record it in any case, for the steps of which the work is
+        committed anyway, like the parallel pre-migration scripts
+    """
+    _upsert(cr, module, step, "done", True, force=force)
+
+
+def get_state(cr, module, step):
+    """Return the state that was stored for the step with set_state, or None.
+    Use it to keep the data that is needed to finish an interrupted step,
+    such as original values that are temporarily overwritten.
+    """
+    if not _has_tables(cr):
+        return None
+    cr.execute(
+        """SELECT state FROM openupgrade_checkpoint
+        WHERE module = %s AND step = %s""",
+        (module, step),
+    )
+    row = cr.fetchone()
+    return json.loads(row[0]) if row and row[0] else None
+
+
+def set_state(cr, module, step, state):
+    """Store a json serializable state for the step"""
+    _upsert(cr, module, step, "state", json.dumps(state, default=str))
+
+
+def _get_chunks(cr, module, step):
+    """Return the sorted (first_id, last_id) of the completed chunks"""
+    if not _has_tables(cr):
+        return []
+    cr.execute(
+        """SELECT first_id, last_id FROM openupgrade_checkpoint_chunk
+        WHERE module = %s AND step = %s""",
+        (module, step),
+    )
+    return sorted(cr.fetchall())
+
+
+def _done_chunk(cr, module, step, first_id, last_id):
+    """Record the chunk as completed and commit, when commit_enabled()"""
+    if not commit_enabled():
+        return
+    _ensure_tables(cr)
+    cr.execute(
+        """INSERT INTO openupgrade_checkpoint_chunk
+        (module, step, first_id, last_id) VALUES (%s, %s, %s, %s)""",
+        (module, step, first_id, last_id),
+    )
+    commit(cr)
+
+
+def chunks(cr, module, step, items, size=1000, key=None):
+    """Yield the items in chunks of the given size, skipping the items that
+    belong to chunks completed in a previous run.
+
+    A chunk is recorded as completed when the caller asks for the next one,
+    so the loop body must process the whole chunk. When commit_enabled(), the
+    transaction is committed at that moment, see commit.
+
+    :param items: record ids, or tuples of which key returns the record id.
+        They are processed in ascending order of their id.
+    :param key: function returning the record id of an item.
+    """
+    key = key or (lambda item: item)
+    ranges = _get_chunks(cr, module, step)
+    items = sorted(items, key=key)
+    if ranges:
+        # Both lists are sorted, so walk through them at the same time
+        todo = []
+        index = 0
+        for item in items:
+            item_id = key(item)
+            while index < len(ranges) and ranges[index][1] < item_id:
+                index += 1
+            if index < len(ranges) and ranges[index][0] <= item_id:
+                continue
+            todo.append(item)
+        if len(todo) < len(items):
+            _logger.info(
+                "%s: skipping %s records of step %s completed in a previous run",
+                module,
+                len(items) - len(todo),
+                step,
+            )
+        items = todo
+    for i in range(0, len(items), size):
+        chunk = items[i : i + size]
+        yield chunk
+        _done_chunk(cr, module, step, key(chunk[0]), key(chunk[-1]))
+
+
+def ranges(cr, module, step, first_id, last_id, size=100000):
+    """Yield (first, last) ranges of ids of the given size, from first_id to
+    last_id, skipping the ranges completed in a previous run. Like chunks,
+    for the tables of which the ids are too many to be listed.
+    """
+    done = _get_chunks(cr, module, step)
+    index = 0
+    for start in range(first_id, last_id + 1, size):
+        chunk = (start, min(start + size - 1, last_id))
+        # Both are sorted, so walk through them at the same time
+        while index < len(done) and done[index][1] < chunk[1]:
+            index += 1
+        if index < len(done) and done[index][0] <= chunk[0]:
+            continue
+        yield chunk
+        _done_chunk(cr, module, step, *chunk)
+
+
+def clear(cr, module):
+    """Remove all the checkpoints of the module, and the tables when no
+    checkpoints are left"""
+    if not _has_tables(cr):
+        return
+    cr.execute("DELETE FROM openupgrade_checkpoint WHERE module = %s", (module,))
+    cr.execute("DELETE FROM openupgrade_checkpoint_chunk WHERE module = %s", (module,))
+    cr.execute(
+        """
+        SELECT EXISTS (SELECT 1 FROM openupgrade_checkpoint)
+            OR EXISTS (SELECT 1 FROM openupgrade_checkpoint_chunk)"""
+    )
+    if not cr.fetchone()[0]:
+        cr.execute("DROP TABLE openupgrade_checkpoint, openupgrade_checkpoint_chunk")
+
+
+def _get_step_key(func):
+    """Derive the module and step from the path of a migration script,
+    like ``scripts/account/14.0.1.1/post-migration.py``
+    """
+    path = inspect.unwrap(func).__code__.co_filename
+    version_dir = os.path.dirname(path)
+    return (
+        os.path.basename(os.path.dirname(version_dir)),
+        "%s/%s:%s"
+        % (os.path.basename(version_dir), os.path.basename(path), func.__name__),
+    )
+
+
+def is_step_done(cr, func, module=None):
+    """Return whether the function decorated with step was completed in a
+    previous run, for the callers that prepare its arguments beforehand"""
+    default_module, step_key = _get_step_key(func)
+    return is_done(cr, module or default_module, step_key)
+
+
+def step(module=None):
+    """Decorator for the functions of a migration script that must not run
+    again when resuming the migration of the module. It is needed for all the
+    functions of a script that are not idempotent and run before a step that
+    commits its chunks.
+
+    The function receives an environment or a cursor as first argument.
+
+    Typical use::
+
+        @checkpoint.step()
+        def fill_some_field(env):
+            # some custom code
+    """
+
+    def wrap(func):
+        default_module, step_key = _get_step_key(func)
+
+        @wraps(func)
+        def wrapped_function(env_or_cr, *args, **kwargs):
+            cr = getattr(env_or_cr, "cr", env_or_cr)
+            if is_done(cr, module or default_module, step_key):
+                _logger.info(
+                    "%s: skipping %s, completed in a previous run",
+                    module or default_module,
+                    step_key,
+                )
+                return None
+            res = func(env_or_cr, *args, **kwargs)
+            mark_done(cr, module or default_module, step_key)
+            return res
+
+        return wrapped_function
+
+    return wrap
@@ -0,0 +1,470 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Delta migration, for a short downtime at cutover.
+
+The migration runs in two phases:
+
+1. The full migration runs on a copy of the production database, while the
+   production stays in use. With the option ``openupgrade_delta_gap`` set,
+   the migration records, before running any script, the greatest id and
+   write date of each table, and moves the sequences of the tables that
+   number forward by the gap, so that the records created by the migration
+   do not take the ids of the records created meanwhile in production.
+2. At cutover, the production is stopped and the command
+   ``odoo-bin openupgrade delta --source=<production database>`` is run on
+   the migrated database. It copies the rows of production created or
+   written since the copy, removes the rows deleted since, and runs again
+   the migration scripts declared replayable, restricted to the copied rows.
+
+The rows are copied with the columns of the same name, and the columns
+renamed with ``openupgrade.get_legacy_name`` get the value of their original
+column, for the replayed scripts to transform it again. Tables without id,
+like the relation tables of many2many fields, are copied for the rows that
+refer to a copied row. Tables renamed by the migration and the metadata of
+the modules are not copied.
+
+A migrate function is replayable when it is idempotent and restricts the rows
+that it updates with ``delta.where``, which is always true during the full
+migration::
+
+    @delta.replayable
+    @openupgrade.migrate()
+    def migrate(env, version):
+        openupgrade.logged_query(
+            env.cr,
+            "UPDATE project_project SET allow_billable = TRUE "
+            "WHERE pricing_type IS NOT NULL AND {}".format(
+                delta.where("project_project")
+            ),
+        )
+
+The rows copied without being transformed would be wrong in the tables
+written by the migration scripts that are not replayable, so the delta
+migration is refused when rows of such tables were created or written in
+production since the copy. The tables written by the scripts are found with
+the static analysis of tables.py.
+
+Only the migration scripts are replayed, not the work of the ORM when the
+modules are loaded: the new columns of the copied rows, like the ones of new
+stored computed fields or of new fields with a default value, keep the value
+of the migrated row for the written rows, and are empty for the created rows,
+unless a replayed script fills them. The columns without source column are
+logged for each table of which rows are copied.
+
+The copy disables the triggers of the foreign keys, which requires a
+superuser connection, as the rows are not copied in the order of their
+references.
+"""
+import glob
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import closing
+
+from openupgradelib import openupgrade
+
+import odoo
+from odoo import sql_db
+from odoo.modules.graph import Graph
+from odoo.modules.migration import load_script
+from odoo.tools import config
+
+from .estimate import get_scripts_path
+from .tables import get_file_access
+
+_logger = logging.getLogger(__name__)
+
+# Tables of the metadata of the modules, that the migration rebuilds
+EXCLUDED_TABLES = {
+    "ir_act_client",
+    "ir_act_report_xml",
+    "ir_act_server",
+    "ir_act_url",
+    "ir_act_window",
+    "ir_act_window_view",
+    "ir_actions",
+    "ir_model",
+    "ir_model_access",
+    "ir_model_constraint",
+    "ir_model_data",
+    "ir_model_fields",
+    "ir_model_fields_selection",
+    "ir_model_relation",
+    "ir_module_category",
+    "ir_module_module",
+    "ir_module_module_dependency",
+    "ir_translation",
+    "ir_ui_menu",
+    "ir_ui_view",
+}
+
+_replay = threading.local()
+
+
+def gap():
+    """Return the gap between the ids of production and the ids of the
+    migration, or 0 when the delta migration is disabled"""
+    return int(config.get("openupgrade_delta_gap") or 0)
+
+
+def replayable(func):
+    """Declare a migrate function replayable, above the migrate decorator of
+    openupgradelib"""
+    func.openupgrade_delta_replayable = True
+    return func
+
+
+def is_replayable(func):
+    return getattr(func, "openupgrade_delta_replayable", False)
+
+
+def where(table, alias=None):
+    """Return the SQL condition that restricts the rows of the table to the
+    copied ones during a replay, or TRUE"""
+    if not getattr(_replay, "active", False):
+        return "TRUE"
+    return (
+        "{}.id IN (SELECT res_id FROM openupgrade_delta_row "
+        "WHERE table_name = '{}')".format(alias or table, table)
+    )
+
+
+def _get_tables(cr):
+    """Return the tables of the database, with the names of their columns"""
+    cr.execute(
+        """
+        SELECT c.table_name, array_agg(c.column_name::varchar)
+        FROM information_schema.columns c
+        JOIN information_schema.tables t
+            ON t.table_schema = c.table_schema AND t.table_name = c.table_name
+        WHERE c.table_schema = 'public' AND t.table_type = 'BASE TABLE'
+            AND c.table_name NOT LIKE 'openupgrade%'
+        GROUP BY c.table_name"""
+    )
+    return {table: set(columns) for table, columns in cr.fetchall()}
+
+
+def mark(cr):
+    """Record the greatest id and write date of each table, and move the
+    sequences forward. Done once, before the first migration script.
+    """
+    cr.execute(
+        """
+        CREATE TABLE IF NOT EXISTS openupgrade_delta_mark (
+            table_name varchar PRIMARY KEY,
+            max_id integer,
+            max_write_date timestamp
+        )"""
+    )
+    cr.execute("SELECT 1 FROM openupgrade_delta_mark LIMIT 1")
+    if cr.fetchone():
+        return
+    start = time.time()
+    tables = _get_tables(cr)
+    for table, columns in sorted(tables.items()):
+        if "id" not in columns or table in EXCLUDED_TABLES:
+            continue
+        cr.execute(  # pylint: disable=sql-injection
+            "SELECT max(id), {} FROM {}".format(
+                "max(write_date)" if "write_date" in columns else "NULL", table
+            )
+        )
+        max_id, max_write_date = cr.fetchone()
+        cr.execute(
+            "INSERT INTO openupgrade_delta_mark VALUES (%s, %s, %s)",
+            (table, max_id or 0, max_write_date),
+        )
+        cr.execute(
+            """
+            SELECT setval(pg_get_serial_sequence(%s, 'id'), %s)
+            WHERE pg_get_serial_sequence(%s, 'id') IS NOT NULL""",
+            (table, (max_id or 0) + gap(), table),
+        )
+    _logger.info(
+        "Recorded the state of %s tables for the delta migration in %.1fs",
+        len(tables),
+        time.time() - start,
+    )
+
+
+def _get_column_map(source_columns, columns):
+    """Return the columns of the migrated table, with the source column of
+    their values"""
+    legacy = openupgrade.get_legacy_name("")
+    column_map = {}
+    for column in sorted(columns):
+        if column in source_columns:
+            column_map[column] = column
+        elif column.startswith(legacy) and column[len(legacy) :] in source_columns:
+            column_map[column] = column[len(legacy) :]
+    return column_map
+
+
+def _copy_rows(source_cr, cr, table, column_map, condition, params):
+    """Copy the rows of the source table matching the condition into a
+    temporary table openupgrade_delta_copy, and return their number"""
+    query = source_cr.mogrify(  # pylint: disable=sql-injection
+        "SELECT {} FROM {} WHERE {}".format(
+            ", ".join('"%s"' % source for source in column_map.values()),
+            table,
+            condition,
+        ),
+        params,
+    ).decode()
+    cr.execute(  # pylint: disable=sql-injection
+        "CREATE TEMP TABLE openupgrade_delta_copy AS SELECT {} FROM {} "
+        "WITH NO DATA".format(", ".join('"%s"' % c for c in column_map), table)
+    )
+    with tempfile.TemporaryFile() as rows:
+        source_cr.copy_expert("COPY ({}) TO STDOUT".format(query), rows)
+        rows.seek(0)
+        cr.copy_expert("COPY openupgrade_delta_copy FROM STDIN", rows)
+    cr.execute("SELECT count(*) FROM openupgrade_delta_copy")
+    return cr.fetchone()[0]
+
+
+def _upsert_rows(cr, table, columns):
+    cr.execute(  # pylint: disable=sql-injection
+        """
+        INSERT INTO {table} ({columns})
+        SELECT {columns} FROM openupgrade_delta_copy
+        ON CONFLICT (id) DO UPDATE SET ({columns}) = ROW({excluded})""".format(
+            table=table,
+            columns=", ".join('"%s"' % column for column in columns),
+            excluded=", ".join('EXCLUDED."%s"' % column for column in columns),
+        )
+    )
+    cr.execute(
+        """
+        INSERT INTO openupgrade_delta_row (table_name, res_id)
+        SELECT %s, id FROM openupgrade_delta_copy""",
+        (table,),
+    )
+
+
+def _get_condition(columns, max_write_date):
+    """Return the condition of the rows created or written since the mark"""
+    condition = "id > %(max_id)s"
+    if max_write_date and "write_date" in columns:
+        condition += " OR write_date > %(max_write_date)s"
+    return condition
+
+
+def _copy_table(source_cr, cr, table, column_map, max_id, max_write_date):
+    """Copy the rows of the table created or written since the mark, and
+    remove the rows deleted since. Return the number of copied rows."""
+    source_cr.execute(  # pylint: disable=sql-injection
+        "SELECT max(id) FROM {}".format(table)
+    )
+    if (source_cr.fetchone()[0] or 0) > max_id + gap():
+        raise ValueError(
+            "%s: more rows were created in production than the gap of the ids, "
+            "the full migration must be run again with a larger gap" % table
+        )
+    condition = _get_condition(column_map, max_write_date)
+    params = {"max_id": max_id, "max_write_date": max_write_date}
+    count = _copy_rows(source_cr, cr, table, column_map, condition, params)
+    if count:
+        _upsert_rows(cr, table, list(column_map))
+    cr.execute("DROP TABLE openupgrade_delta_copy")
+    _copy_rows(source_cr, cr, table, {"id": "id"}, "id <= %(max_id)s", params)
+    cr.execute(  # pylint: disable=sql-injection
+        """
+        DELETE FROM {} t WHERE t.id <= %s AND NOT EXISTS (
+            SELECT 1 FROM openupgrade_delta_copy c WHERE c.id = t.id)""".format(
+            table
+        ),
+        (max_id,),
+    )
+    deleted = cr.rowcount
+    cr.execute("DROP TABLE openupgrade_delta_copy")
+    _logger.info("%s: %s rows copied, %s rows deleted", table, count, deleted)
+    return count
+
+
+def _get_references(cr, table):
+    """Return the columns of the table with a foreign key, and the tables
+    that they refer to"""
+    cr.execute(
+        """
+        SELECT a.attname, c.confrelid::regclass::varchar
+        FROM pg_constraint c
+        JOIN pg_attribute a
+            ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+        WHERE c.contype = 'f' AND c.conrelid = %s::regclass""",
+        (table,),
+    )
+    return cr.fetchall()
+
+
+def _copy_relation(source_cr, cr, table, column_map):
+    """Copy the rows of a table without id that refer to a copied row"""
+    for column, target in _get_references(cr, table):
+        if column not in column_map:
+            continue
+        cr.execute(
+            "SELECT res_id FROM openupgrade_delta_row WHERE table_name = %s",
+            (target,),
+        )
+        ids = [row[0] for row in cr.fetchall()]
+        if not ids:
+            continue
+        condition = '"{}" = ANY(%(ids)s)'.format(column_map[column])
+        count = _copy_rows(source_cr, cr, table, column_map, condition, {"ids": ids})
+        cr.execute(  # pylint: disable=sql-injection
+            'DELETE FROM {} WHERE "{}" = ANY(%s)'.format(table, column), (ids,)
+        )
+        cr.execute(  # pylint: disable=sql-injection
+            "INSERT INTO {table} ({columns}) SELECT {columns} "
+            "FROM openupgrade_delta_copy ON CONFLICT DO NOTHING".format(
+                table=table, columns=", ".join('"%s"' % c for c in column_map)
+            )
+        )
+        cr.execute("DROP TABLE openupgrade_delta_copy")
+        _logger.info("%s: %s rows copied for %s", table, count, column)
+
+
+def copy_changes(source_cr, cr):
+    """Copy the changes of the source database since the mark"""
+    cr.execute(
+        """
+        DROP TABLE IF EXISTS openupgrade_delta_row;
+        CREATE TABLE openupgrade_delta_row (
+            table_name varchar NOT NULL,
+            res_id integer NOT NULL
+        );
+        SET LOCAL session_replication_role = replica"""
+    )
+    cr.execute("SELECT table_name, max_id, max_write_date FROM openupgrade_delta_mark")
+    marks = {row[0]: row[1:] for row in cr.fetchall()}
+    source_tables = _get_tables(source_cr)
+    tables = _get_tables(cr)
+    for table in sorted(marks):
+        if table not in tables or table not in source_tables:
+            _logger.warning("%s: table renamed or removed, not copied", table)
+            continue
+        column_map = _get_column_map(source_tables[table], tables[table])
+        count = _copy_table(source_cr, cr, table, column_map, *marks[table])
+        missing = sorted(tables[table] - set(column_map))
+        if count and missing:
+            _logger.warning(
+                "%s: the columns %s have no source column, and are not filled "
+                "for the %s copied rows unless a replayed script does it",
+                table,
+                ", ".join(missing),
+                count,
+            )
+    cr.execute("CREATE INDEX ON openupgrade_delta_row (table_name, res_id)")
+    for table in sorted(set(tables) & set(source_tables) - EXCLUDED_TABLES):
+        if "id" not in tables[table]:
+            column_map = _get_column_map(source_tables[table], tables[table])
+            _copy_relation(source_cr, cr, table, column_map)
+    cr.execute("SET LOCAL session_replication_role = DEFAULT")
+
+
+def _get_unreplayable_writes(versions):
+    """Return the migration scripts of the modules that are not replayable,
+    by table that they write"""
+    path = get_scripts_path()
+    writers = {}
+    for module in sorted(versions):
+        for pyfile in sorted(
+            glob.glob(os.path.join(path, module, "14.0.*", "*-migration.py"))
+        ):
+            mod = load_script(pyfile, module)
+            if is_replayable(getattr(mod, "migrate", None)):
+                continue
+            name = "/".join(pyfile.split(os.sep)[-3:])
+            for table in get_file_access(pyfile)["writes"]:
+                writers.setdefault(table, []).append(name)
+    return writers
+
+
+def check_changes(source_cr, cr, versions):
+    """Raise when rows of the tables written by migration scripts that are not
+    replayable were created or written in the source database since the mark,
+    as they would be copied without being transformed by these scripts
+
+    :param versions: the versions of the modules in the source database
+    """
+    cr.execute("SELECT table_name, max_id, max_write_date FROM openupgrade_delta_mark")
+    marks = {row[0]: row[1:] for row in cr.fetchall()}
+    source_tables = _get_tables(source_cr)
+    writers = _get_unreplayable_writes(versions)
+    changed = []
+    for table in sorted(set(writers) & set(marks) & set(source_tables)):
+        max_id, max_write_date = marks[table]
+        source_cr.execute(  # pylint: disable=sql-injection
+            "SELECT EXISTS (SELECT 1 FROM {} WHERE {})".format(
+                table, _get_condition(source_tables[table], max_write_date)
+            ),
+            {"max_id": max_id, "max_write_date": max_write_date},
+        )
+        if source_cr.fetchone()[0]:
+            _logger.error(
+                "%s: rows changed since the copy, written by the scripts that "
+                "are not replayable %s",
+                table,
+                ", ".join(writers[table]),
+            )
+            changed.append(table)
+    if changed:
+        raise ValueError(
+            "The changes of %s cannot be migrated by replaying the scripts, the "
+            "full migration must be run again" % ", ".join(changed)
+        )
+
+
+def _run_script(cr, pkg, stage, pyfile, version):
+    # The migrate decorator of openupgradelib inspects the local variables
+    # pkg, stage and pyfile of its caller, like the ones of the loader
+    mod = load_script(pyfile, pkg.name)
+    if not is_replayable(getattr(mod, "migrate", None)):
+        return
+    _logger.info("module %s: replaying %s", pkg.name, pyfile)
+    mod.migrate(cr, version)
+
+
+def replay_scripts(cr, versions):
+    """Run the replayable migration scripts of the installed modules, in the
+    order of their dependencies
+
+    :param versions: the versions of the modules in the source database
+    """
+    cr.execute("SELECT name FROM ir_module_module WHERE state = 'installed'")
+    graph = Graph()
+    graph.add_modules(cr, [row[0] for row in cr.fetchall()])
+    path = get_scripts_path()
+    _replay.active = True
+    try:
+        for pkg in graph:
+            if not versions.get(pkg.name):
+                continue
+            for stage in ("pre", "post", "end"):
+                for pyfile in sorted(
+                    glob.glob(os.path.join(path, pkg.name, "14.0.*", "%s-*.py" % stage))
+                ):
+                    _run_script(cr, pkg, stage, pyfile, versions[pkg.name])
+    finally:
+        _replay.active = False
+
+
+def replay(dbname, source):
+    """Copy the changes of the source database since the full migration of
+    the database, and replay the migration scripts on them"""
+    start = time.time()
+    registry = odoo.registry(dbname)
+    with closing(sql_db.db_connect(source).cursor()) as source_cr:
+        source_cr.execute(
+            "SELECT name, latest_version FROM ir_module_module "
+            "WHERE state = 'installed'"
+        )
+        versions = dict(source_cr.fetchall())
+        with registry.cursor() as cr:
+            check_changes(source_cr, cr, versions)
+            copy_changes(source_cr, cr)
+            replay_scripts(cr, versions)
+        source_cr.rollback()
+    _logger.info("Delta migration done in %.1fs", time.time() - start)
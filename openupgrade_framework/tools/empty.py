@@ -0,0 +1,83 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Skipping of the data migration steps of empty tables.
+
+Many installed modules have no data in their tables, but their migration
+scripts still run their queries on them, or fill new columns before Odoo
+would. At the start of the migration, the empty tables of the database are
+found with a single query: the tables of which PostgreSQL estimates that they
+have no rows are checked for the existence of a row.
+
+A step of a migration script that only transforms the rows of some tables can
+be declared skippable when these tables are empty::
+
+    @empty.skip("lunch_supplier")
+    def fast_fill_lunch_supplier_company_id(env):
+        # ALTER TABLE lunch_supplier ADD COLUMN ... UPDATE lunch_supplier ...
+
+The step is skipped when all its tables were empty at the start of the
+migration, and still are, as the previous steps or the loading of modules may
+have filled them. The other steps of the scripts, like the renames of xmlids
+or the loading of the noupdate changes, are not affected. The steps that
+rename columns or tables must not be skipped, as Odoo would not do it.
+"""
+import logging
+from functools import wraps
+
+_logger = logging.getLogger(__name__)
+
+# Tables empty at the start of the migration, by database
+_empty = {}
+
+
+def probe(cr):
+    """Record the empty tables of the database"""
+    cr.execute(
+        """
+        SELECT c.relname FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'p') AND n.nspname = current_schema()
+            AND c.reltuples <= 0
+            AND (xpath('/row/empty/text()', query_to_xml(
+                format('SELECT NOT EXISTS (SELECT 1 FROM %I.%I) AS empty',
+                    n.nspname, c.relname),
+                false, true, '')))[1]::text = 'true'"""
+    )
+    _empty[cr.dbname] = {row[0] for row in cr.fetchall()}
+    _logger.info("%s empty tables found", len(_empty[cr.dbname]))
+
+
+def is_empty(cr, *tables):
+    """Return whether the tables were empty at the start of the migration and
+    still are. False when the empty tables were not probed."""
+    if not set(tables) <= _empty.get(cr.dbname, set()):
+        return False
+    cr.execute(  # pylint: disable=sql-injection
+        "SELECT {}".format(
+            " AND ".join(
+                "NOT EXISTS (SELECT 1 FROM {})".format(table) for table in tables
+            )
+        )
+    )
+    return cr.fetchone()[0]
+
+
+def skip(*tables):
+    """Decorator for the steps of a migration script that only transform the
+    rows of the given tables, which are skipped when the tables are empty.
+    The function receives an environment or a cursor as first argument.
+    """
+
+    def wrap(func):
+        @wraps(func)
+        def wrapped_function(env_or_cr, *args, **kwargs):
+            if is_empty(getattr(env_or_cr, "cr", env_or_cr), *tables):
+                _logger.info(
+                    "Skipping %s, as %s is empty", func.__name__, ", ".join(tables)
+                )
+                return None
+            return func(env_or_cr, *args, **kwargs)
+
+        return wrapped_function
+
+    return wrap
@@ -0,0 +1,128 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Estimation of the duration of the migration of a database, before running
+it.
+
+The tables of a module are the ones that its migration scripts name, in SQL
+queries or as models, and the ones of the models of which fields change
+according to its ``upgrade_analysis.txt``. Their numbers of rows are the
+estimates of PostgreSQL in ``pg_class``, which are as recent as the last
+ANALYZE of the tables.
+
+The costs per row come from the JSON reports of earlier profiled migrations
+(see profiler.py), which contain the numbers of rows of the tables at the
+start of the migration. The duration of a module is assumed to be
+proportional to the number of rows of its tables. For the modules that were
+not profiled, the average cost per row of the profiled modules is used.
+"""
+import glob
+import json
+import os
+import re
+
+from odoo.modules import get_module_path
+from odoo.tools import config
+
+# Table names following SQL keywords, and quoted table or model names
+SQL_TABLE_RE = re.compile(
+    r"\b(?:FROM|JOIN|UPDATE|INTO|TABLE)\s+(?:ONLY\s+)?\"?([a-z_][a-z0-9_]*)",
+    re.IGNORECASE,
+)
+QUOTED_NAME_RE = re.compile(r"[\"']([a-z_][a-z0-9_.]*)[\"']")
+# Lines of upgrade_analysis.txt like: module / model / field (type) : change
+ANALYSIS_FIELD_RE = re.compile(r"^\S+\s*/\s*(\S+)\s*/", re.MULTILINE)
+
+
+def get_scripts_path():
+    for path in (config.get("upgrade_path") or "").split(","):
+        if path.strip() and os.path.isdir(path.strip()):
+            return path.strip()
+    module_path = get_module_path("openupgrade_scripts", display_warning=False)
+    return os.path.join(module_path or "", "scripts")
+
+
+def get_module_tables(path, module):
+    """Return the names of the tables that the migration of the module may
+    touch. Names that are not tables are filtered out by the caller.
+    """
+    names = set()
+    for version_path in glob.glob(os.path.join(path, module, "14.0.*")):
+        for pyfile in glob.glob(os.path.join(version_path, "*.py")):
+            with open(pyfile) as script:
+                source = script.read()
+            names.update(name.lower() for name in SQL_TABLE_RE.findall(source))
+            names.update(QUOTED_NAME_RE.findall(source))
+        analysis = os.path.join(version_path, "upgrade_analysis.txt")
+        if os.path.exists(analysis):
+            with open(analysis) as analysis_file:
+                names.update(ANALYSIS_FIELD_RE.findall(analysis_file.read()))
+    return {name.replace(".", "_") for name in names}
+
+
+def get_table_rows(cr):
+    """Return the estimated number of rows of each table of the database"""
+    cr.execute(
+        """
+        SELECT c.relname, c.reltuples
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'p') AND n.nspname = current_schema()"""
+    )
+    return {name: max(int(rows), 0) for name, rows in cr.fetchall()}
+
+
+def load_costs(reports):
+    """Return the total profiled duration, number of rows and number of runs
+    of the modules, by module, from JSON reports of the profiler. The rows are
+    counted with the table lists of get_module_tables.
+    """
+    path = get_scripts_path()
+    costs = {}
+    module_tables = {}
+    for report_path in reports:
+        with open(report_path) as report_file:
+            report = json.load(report_file)
+        tables = report.get("tables") or {}
+        durations = {}
+        for entry in report["entries"]:
+            # Entries of functions are included in the ones of the stages
+            if not entry["function"]:
+                durations.setdefault(entry["module"], 0.0)
+                durations[entry["module"]] += entry["wall_time"]
+        for module, duration in durations.items():
+            if module not in module_tables:
+                module_tables[module] = get_module_tables(path, module)
+            rows = sum(tables.get(name, 0) for name in module_tables[module])
+            total = costs.setdefault(module, [0.0, 0, 0])
+            total[0] += duration
+            total[1] += rows
+            total[2] += 1
+    return costs
+
+
+def estimate(cr, reports=()):
+    """Return (module, rows, seconds) for each module to migrate, sorted by
+    decreasing duration. The duration is None when no report was given.
+    """
+    path = get_scripts_path()
+    table_rows = get_table_rows(cr)
+    costs = load_costs(reports)
+    total_duration = sum(duration for duration, rows, runs in costs.values())
+    total_rows = sum(rows for duration, rows, runs in costs.values())
+    cr.execute(
+        """SELECT name FROM ir_module_module
+        WHERE state IN ('installed', 'to upgrade')"""
+    )
+    result = []
+    for (module,) in cr.fetchall():
+        rows = sum(table_rows.get(name, 0) for name in get_module_tables(path, module))
+        duration, profiled_rows, runs = costs.get(module, (None, 0, 0))
+        if duration is None:
+            if total_rows:
+                duration = total_duration * rows / total_rows
+        elif profiled_rows:
+            duration = duration * rows / profiled_rows
+        else:
+            duration = duration / runs
+        result.append((module, rows, duration))
+    return sorted(result, key=lambda line: (-(line[2] or 0), -line[1], line[0]))
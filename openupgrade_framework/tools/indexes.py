@@ -0,0 +1,124 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Temporary helper indexes for the joins of migration steps.
+
+Migration steps often join on columns that have no index, like legacy
+references or names. A step can declare the indexes it needs, which are
+created before it runs and dropped after it succeeded. Indexes are specified
+as ``(table, columns)`` or ``(table, columns, where)`` tuples, in which
+columns is the SQL expression of the indexed columns and where an optional
+condition for a partial index. No index is created for a single column without
+condition that is already the first column of an index.
+
+The indexes are created in the migration transaction, so that they can cover
+columns added by previous steps: ``CREATE INDEX CONCURRENTLY`` is not possible
+within a transaction, and would not make sense while the migration holds
+locks on the tables anyway. The tables are analyzed after the creation of the
+indexes, for the planner to know about the added columns. The indexes are
+dropped when the step fails too, unless the transaction is aborted, as its
+rollback removes them.
+"""
+import hashlib
+import logging
+import re
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from psycopg2.extensions import TRANSACTION_STATUS_INERROR
+
+_logger = logging.getLogger(__name__)
+
+COLUMN_RE = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+def _index_name(table, columns, where):
+    digest = hashlib.md5(
+        "{} ({}) {}".format(table, columns, where or "").encode()
+    ).hexdigest()
+    return "openupgrade_tmp_{}_{}".format(table[:30], digest[:10])
+
+
+def _has_index(cr, table, columns):
+    """Return whether the table has an index starting with the single column"""
+    if not COLUMN_RE.match(columns):
+        return False
+    cr.execute(
+        """
+        SELECT 1 FROM pg_index i
+        JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0]
+        WHERE i.indrelid = %s::regclass AND a.attname = %s AND i.indpred IS NULL""",
+        (table, columns),
+    )
+    return bool(cr.fetchone())
+
+
+@contextmanager
+def temporary(cr, *specs):
+    """Create the given indexes for the duration of the enclosed code::
+
+        with indexes.temporary(cr, ("account_move", "ref, company_id")):
+            openupgrade.logged_query(cr, "UPDATE ... FROM account_move ...")
+
+    The indexes are dropped when the enclosed code fails too, unless the
+    transaction is aborted, in which case they are removed by its rollback.
+    """
+    created = []
+    tables = set()
+    for spec in specs:
+        table, columns, where = (tuple(spec) + (None,))[:3]
+        if not where and _has_index(cr, table, columns):
+            continue
+        name = _index_name(table, columns, where)
+        start = time.time()
+        cr.execute(  # pylint: disable=sql-injection
+            "CREATE INDEX IF NOT EXISTS {} ON {} ({}){}".format(
+                name, table, columns, " WHERE {}".format(where) if where else ""
+            )
+        )
+        _logger.info(
+            "Created temporary index %s on %s (%s) in %.1fs",
+            name,
+            table,
+            columns,
+            time.time() - start,
+        )
+        created.append(name)
+        tables.add(table)
+    for table in sorted(tables):
+        cr.execute("ANALYZE {}".format(table))  # pylint: disable=sql-injection
+    try:
+        yield
+    except Exception:
+        if cr._cnx.get_transaction_status() != TRANSACTION_STATUS_INERROR:
+            _drop_indexes(cr, created)
+        raise
+    _drop_indexes(cr, created)
+
+
+def _drop_indexes(cr, names):
+    for name in names:
+        cr.execute("DROP INDEX IF EXISTS {}".format(name))
+
+
+def require(*specs):
+    """Decorator for the functions of a migration script that need the given
+    indexes. The function receives an environment or a cursor as first
+    argument.
+
+    Typical use::
+
+        @indexes.require(("account_move", "ref"), ("account_payment", "communication"))
+        def match_statement_lines(env):
+            # UPDATE ... FROM account_move ... FROM account_payment ...
+    """
+
+    def wrap(func):
+        @wraps(func)
+        def wrapped_function(env_or_cr, *args, **kwargs):
+            with temporary(getattr(env_or_cr, "cr", env_or_cr), *specs):
+                return func(env_or_cr, *args, **kwargs)
+
+        return wrapped_function
+
+    return wrap
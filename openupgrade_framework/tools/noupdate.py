@@ -0,0 +1,199 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Loading of the noupdate changes of the modules.
+
+``openupgrade.load_data`` writes every record of ``noupdate_changes.xml``
+through the ORM, while many of them already have the values of the file,
+because they were changed by hand or by an earlier migration. Each write
+triggers the recomputations and the tracking of the written fields.
+
+``noupdate.load_changes`` evaluates the fields of the records of the file
+like the XML importer, reads the current values of the records of each model
+at once, and removes from the file the records that would not change, before
+loading the rest of it with the XML importer::
+
+    noupdate.load_changes(env, "uom", "14.0.1.0/noupdate_changes.xml")
+
+Records are always loaded when one of their values cannot be evaluated in
+advance, like one2many or many2many values, references to records of the file
+itself or searches.
+"""
+import logging
+import os
+from io import StringIO
+
+from lxml import etree
+
+from odoo import tools
+from odoo.tools.convert import _eval_xml, xml_import
+
+from .estimate import get_scripts_path
+
+_logger = logging.getLogger(__name__)
+
+# Types of fields of which the value of the file is compared
+COMPARED_TYPES = {
+    "boolean",
+    "char",
+    "date",
+    "datetime",
+    "float",
+    "html",
+    "integer",
+    "many2one",
+    "monetary",
+    "selection",
+    "text",
+}
+
+
+def _get_path(module, filename):
+    paths = (tools.config.get("upgrade_path") or "").split(",")
+    for path in [path.strip() for path in paths if path.strip()] + [get_scripts_path()]:
+        pathname = os.path.join(path, module, filename)
+        if os.path.exists(pathname):
+            return pathname
+    raise OSError("File %s of module %s not found" % (filename, module))
+
+
+def _eval_values(importer, env, record_node):
+    """Return the values of the fields of the record node, as the XML importer
+    would write them, or None when they cannot be evaluated in advance
+    """
+    model = env[record_node.get("model")]
+    values = {}
+    for node in record_node:
+        if node.tag != "field":
+            return None
+        field = model._fields.get(node.get("name"))
+        if (
+            field is None
+            or field.type not in COMPARED_TYPES
+            or node.get("search")
+            or node.get("model")
+        ):
+            return None
+        if node.get("ref"):
+            if field.type != "many2one":
+                return None
+            value = importer.id_get(node.get("ref"))
+        else:
+            value = _eval_xml(importer, node, env)
+            if field.type == "many2one":
+                value = int(value) if value else False
+            elif field.type == "integer":
+                value = int(value)
+            elif field.type in ("float", "monetary"):
+                value = float(value)
+            elif field.type == "boolean" and isinstance(value, str):
+                value = tools.str2bool(value)
+        values[field.name] = value
+    return values
+
+
+def _is_unchanged(record, values):
+    for name, value in values.items():
+        field = record._fields[name]
+        expected = field.convert_to_write(
+            field.convert_to_record(field.convert_to_cache(value, record), record),
+            record,
+        )
+        if field.convert_to_write(record[name], record) != expected:
+            return False
+    return True
+
+
+def _get_candidates(env, module, root):
+    """Return the record nodes of the tree of which the values can be compared,
+    with their model, id and values
+    """
+    importer = xml_import(env.cr, module, {}, "init")
+    nodes = []
+    for node in root.iter("record"):
+        if node.getparent().tag not in ("odoo", "openerp", "data"):
+            continue
+        if not node.get("id") or node.get("context") or node.get("forcecreate"):
+            continue
+        xmlid = node.get("id")
+        nodes.append(
+            (node, tuple(xmlid.split(".", 1)) if "." in xmlid else (module, xmlid))
+        )
+    if not nodes:
+        return []
+    env.cr.execute(
+        """
+        SELECT module, name, model, res_id FROM ir_model_data
+        WHERE (module, name) IN %s""",
+        (tuple(xmlid for _node, xmlid in nodes),),
+    )
+    existing = {row[:2]: row[2:] for row in env.cr.fetchall()}
+    candidates = []
+    for node, xmlid in nodes:
+        model, res_id = existing.get(xmlid, (None, None))
+        if model != node.get("model") or model not in env:
+            continue
+        try:
+            values = _eval_values(importer, env, node)
+        except Exception as e:
+            _logger.debug("Values of %s can not be compared: %s", node.get("id"), e)
+            values = None
+        if values is not None:
+            candidates.append((node, model, res_id, values))
+    return candidates
+
+
+def _remove_unchanged(env, module, root):
+    """Remove the records of the tree that would not be changed, and return
+    the number of removed records
+    """
+    env = env(context={})
+    candidates = _get_candidates(env, module, root)
+    # Records by model, for reading the current values of each model at once
+    ids_by_model = {}
+    for _node, model, res_id, _values in candidates:
+        ids_by_model.setdefault(model, []).append(res_id)
+    records = {}
+    for model, ids in ids_by_model.items():
+        # Records iterated from the same recordset share their prefetching
+        for record in env[model].with_context(active_test=False).browse(ids).exists():
+            records[(model, record.id)] = record
+    removed = 0
+    for node, model, res_id, values in candidates:
+        record = records.get((model, res_id))
+        if not record:
+            continue
+        try:
+            unchanged = _is_unchanged(record, values)
+        except Exception as e:
+            _logger.debug("Values of %s can not be compared: %s", node.get("id"), e)
+            unchanged = False
+        if unchanged:
+            node.getparent().remove(node)
+            removed += 1
+    return removed
+
+
+def load_changes(env, module, filename):
+    """Load the noupdate changes of the module from the XML file, skipping the
+    records that already have the values of the file.
+
+    :param filename: path of the file, relative to the migration scripts of
+        the module, like ``14.0.1.0/noupdate_changes.xml``.
+    """
+    with open(_get_path(module, filename), "rb") as xml_file:
+        doc = etree.parse(xml_file)
+    root = doc.getroot()
+    total = sum(1 for _node in root.iter("record"))
+    removed = _remove_unchanged(env, module, root)
+    _logger.info(
+        "%s: loading %s, %s of %s records are unchanged",
+        module,
+        filename,
+        removed,
+        total,
+    )
+    if removed == total and not root.xpath("//function|//delete"):
+        return
+    result = StringIO(etree.tostring(doc, encoding="unicode"))
+    result.name = None
+    tools.convert_xml_import(env.cr, module, result, {}, mode="init")
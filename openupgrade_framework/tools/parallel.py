@@ -0,0 +1,152 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Parallel execution of the pre-migration scripts of independent modules.
+
+When the option ``openupgrade_parallel_workers`` is set to a number greater
+than 1, the pre-migration scripts that are declared parallel safe are run
+before the loading of the modules, by that number of threads, each one with
+its own database connection. The scripts of a module are started once the
+parallel safe scripts of all the modules that it depends on are done, so only
+modules without dependency path between them run at the same time. The work
+is done by PostgreSQL, which is why threads are used rather than processes.
+
+A migrate function can be declared parallel safe with the ``safe`` decorator
+when it:
+
+* only runs SQL queries, and does not use the ORM;
+* only touches the tables and the data of its own module;
+* does not depend on the migration of other modules, as it may run before the
+  pre-migration scripts of the modules that it depends on that are not
+  parallel safe.
+
+The tables read and written by the scripts are found by the static analysis of
+tables.py, and the modules of which the scripts write the tables of each
+other are not run at the same time either.
+
+The scripts of each module are committed separately, after which the loader
+of Odoo skips them as completed (see checkpoint.py).
+"""
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from odoo import sql_db
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+
+def safe(func):
+    """Declare a migrate function parallel safe. Apply it above the migrate
+    decorator of openupgradelib::
+
+        @parallel.safe
+        @openupgrade.migrate()
+        def migrate(env, version):
+            # SQL queries on the tables of the module
+    """
+    func.openupgrade_parallel_safe = True
+    return func
+
+
+def is_safe(func):
+    return getattr(func, "openupgrade_parallel_safe", False)
+
+
+def workers():
+    """Return the number of threads running the scripts, or 0 when the
+    parallel execution is disabled"""
+    workers = int(config.get("openupgrade_parallel_workers") or 0)
+    return workers if workers > 1 else 0
+
+
+def get_dependencies(graph):
+    """Return the names of the modules of the graph that each module depends
+    on, directly or not"""
+    parents = {name: set() for name in graph}
+    for node in graph.values():
+        for child in node.children:
+            parents.setdefault(child.name, set()).add(node.name)
+    dependencies = {}
+
+    def get_ancestors(name):
+        if name not in dependencies:
+            dependencies[name] = set()
+            for parent in parents.get(name, ()):
+                dependencies[name] |= {parent} | get_ancestors(parent)
+        return dependencies[name]
+
+    for name in parents:
+        get_ancestors(name)
+    return dependencies
+
+
+def add_conflicts(dependencies, conflicts, order):
+    """Make the modules of which the scripts conflict depend on each other,
+    the later one in the given order depending on the earlier one, so that
+    they do not run at the same time.
+
+    :param conflicts: pairs of conflicting ``module/...`` script names, see
+        tables.get_conflicts
+    :param order: the names of the modules, in the order of the graph
+    """
+    rank = {name: index for index, name in enumerate(order)}
+    for pair in conflicts:
+        first, second = sorted(
+            (name.split("/")[0] for name in pair), key=lambda name: rank[name]
+        )
+        if first not in dependencies.get(second, set()):
+            _logger.info(
+                "module %s: tables shared with module %s, not run in parallel",
+                second,
+                first,
+            )
+            dependencies.setdefault(second, set()).add(first)
+    return dependencies
+
+
+def _run_job(dbname, module, job):
+    threading.current_thread().dbname = dbname
+    with sql_db.db_connect(dbname).cursor() as cr:
+        # The cursor is committed when the job succeeds
+        job(cr)
+    _logger.info("module %s: parallel pre-migration done", module)
+
+
+def run(dbname, jobs, dependencies, max_workers):
+    """Run the jobs of the modules in threads. A job is started when the jobs
+    of the modules that its module depends on are done. When a job fails, no
+    new jobs are started and the error is raised once the running ones are
+    done.
+
+    :param jobs: functions taking a cursor, by module name. The cursor is
+        committed when the function succeeds.
+    :param dependencies: sets of the modules that each module depends on.
+    """
+    pending = dict(jobs)
+    running = {}
+    errors = []
+    with ThreadPoolExecutor(max_workers, "openupgrade") as executor:
+        while pending or running:
+            if errors:
+                pending.clear()
+            busy = set(pending) | set(running.values())
+            for module in list(pending):
+                if not dependencies.get(module, set()) & busy:
+                    future = executor.submit(_run_job, dbname, module, pending[module])
+                    running[future] = module
+                    del pending[module]
+            if not running:
+                break
+            finished, _pending = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                module = running.pop(future)
+                try:
+                    future.result()
+                except Exception as error:
+                    _logger.error(
+                        "module %s: parallel pre-migration failed: %s", module, error
+                    )
+                    errors.append(error)
+    if errors:
+        raise errors[0]
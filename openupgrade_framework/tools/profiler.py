@@ -0,0 +1,237 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Profiling of the migration, per module, stage and function of the
+migration scripts.
+
+When the option ``openupgrade_profile_report`` is set to a file path, the
+following is recorded for each stage (pre, load, post, end) of each module,
+and for each function of the migration scripts:
+
+* wall time
+* number of SQL queries and the time spent running them
+* rows affected by INSERT, UPDATE and DELETE queries
+* resident memory of the process at the end, and its growth over the call
+
+The ``load`` stage covers the loading of the module by Odoo itself, between
+its pre and post-migration scripts. The report is written when the process
+exits, in CSV format if the path ends with ``.csv`` and in JSON format
+otherwise. The JSON format also contains the numbers of rows of the tables at
+the start of the migration, for the estimation of later migrations.
+"""
+import atexit
+import csv
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+from odoo.sql_db import Cursor
+from odoo.tools import config
+
+from . import estimate
+
+_logger = logging.getLogger(__name__)
+
+FIELDS = [
+    "module",
+    "stage",
+    "script",
+    "function",
+    "calls",
+    "wall_time",
+    "sql_time",
+    "queries",
+    "rows",
+    "rss_kb",
+    "rss_growth_kb",
+]
+
+# Entries of the report, by (module, stage, script, function)
+_entries = {}
+# Snapshots taken at the end of the pre stage, by module
+_loading = {}
+# Estimated numbers of rows of the tables at the start of the migration
+_tables = {}
+
+
+def enabled():
+    return bool(config.get("openupgrade_profile_report"))
+
+
+def _get_rss():
+    """Return the current resident memory of the process in kB, or 0 when
+    /proc is not available"""
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+    except OSError:
+        return 0
+    return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def _snapshot():
+    """Return the time, the counters of the current thread and the resident
+    memory of the process. The query count and time are maintained by
+    odoo.sql_db.Cursor.execute when the thread has these attributes.
+    """
+    thread = threading.current_thread()
+    if not hasattr(thread, "query_count"):
+        thread.query_count = 0
+        thread.query_time = 0
+    return (
+        time.time(),
+        thread.query_count,
+        thread.query_time,
+        getattr(thread, "openupgrade_rowcount", 0),
+        getattr(thread, "openupgrade_scripts", 0),
+        _get_rss(),
+    )
+
+
+def _record(key, start, end):
+    entry = _entries.get(key)
+    if not entry:
+        entry = _entries[key] = dict.fromkeys(FIELDS, 0)
+        entry.update(zip(FIELDS[:4], key))
+    entry["calls"] += 1
+    entry["wall_time"] += end[0] - start[0]
+    entry["queries"] += end[1] - start[1]
+    entry["sql_time"] += end[2] - start[2]
+    entry["rows"] += end[3] - start[3]
+    entry["rss_kb"] = end[5]
+    entry["rss_growth_kb"] += end[5] - start[5]
+
+
+@contextmanager
+def profile(module, stage, script="", function=""):
+    """Record the costs of the enclosed code. Stages in which no migration
+    script was loaded are not recorded.
+    """
+    if not enabled():
+        yield
+        return
+    start = _snapshot()
+    try:
+        yield
+    finally:
+        end = _snapshot()
+        if script or end[4] > start[4]:
+            _record((module, stage, script, function), start, end)
+
+
+def record_tables(cr):
+    """Record the numbers of rows of the tables at the start of the migration,
+    from which estimate.py derives the costs per row of the modules
+    """
+    if enabled() and not _tables:
+        _tables.update(estimate.get_table_rows(cr))
+
+
+def start_loading(module):
+    """Called after the pre stage of a module"""
+    if enabled():
+        _loading[module] = _snapshot()
+
+
+def stop_loading(module):
+    """Called before the post stage of a module"""
+    start = _loading.pop(module, None)
+    if start:
+        _record((module, "load", "", ""), start, _snapshot())
+
+
+def instrument(mod, module, stage, script):
+    """Profile the functions defined in a migration script, except for its
+    migrate function, of which the costs are those of the stage.
+    """
+    if not enabled():
+        return
+    thread = threading.current_thread()
+    thread.openupgrade_scripts = getattr(thread, "openupgrade_scripts", 0) + 1
+    for name, func in list(vars(mod).items()):
+        if (
+            name == "migrate"
+            or not inspect.isfunction(func)
+            or func.__module__ != mod.__name__
+        ):
+            continue
+        setattr(mod, name, _profiled(func, module, stage, script))
+
+
+def _profiled(func, module, stage, script):
+    @wraps(func)
+    def wrapped_function(*args, **kwargs):
+        with profile(module, stage, script, func.__name__):
+            return func(*args, **kwargs)
+
+    return wrapped_function
+
+
+def _execute(self, *args, **kwargs):
+    """Count the rows affected by data modifying queries"""
+    res = _execute._original_method(self, *args, **kwargs)
+    status = self._obj.statusmessage
+    if status and status.startswith(("INSERT", "UPDATE", "DELETE")):
+        thread = threading.current_thread()
+        thread.openupgrade_rowcount = getattr(thread, "openupgrade_rowcount", 0) + max(
+            self._obj.rowcount, 0
+        )
+    return res
+
+
+def get_entries():
+    return list(_entries.values())
+
+
+def write_report(path=None):
+    path = path or config.get("openupgrade_profile_report")
+    if not path or not _entries:
+        return
+    entries = list(_entries.values())
+    with open(path, "w") as report:
+        if path.lower().endswith(".csv"):
+            writer = csv.DictWriter(report, FIELDS)
+            writer.writeheader()
+            writer.writerows(entries)
+        else:
+            json.dump(
+                {
+                    "date": datetime.utcnow().isoformat(),
+                    "entries": entries,
+                    "tables": _tables,
+                },
+                report,
+                indent=1,
+            )
+    stages = sorted(
+        (entry for entry in entries if not entry["function"]),
+        key=lambda entry: entry["wall_time"],
+        reverse=True,
+    )
+    _logger.info(
+        "Migration profile written to %s. Slowest stages: %s",
+        path,
+        ", ".join(
+            "%s (%s): %.1fs" % (entry["module"], entry["stage"], entry["wall_time"])
+            for entry in stages[:10]
+        ),
+    )
+
+
+def enable(path):
+    """Enable the profiler with the given report path, also when the option
+    was not set when this module was imported"""
+    config["openupgrade_profile_report"] = path
+    if not hasattr(_execute, "_original_method"):
+        _execute._original_method = Cursor.execute
+        Cursor.execute = _execute
+        atexit.register(write_report)
+
+
+if enabled():
+    enable(config["openupgrade_profile_report"])
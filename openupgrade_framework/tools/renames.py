@@ -0,0 +1,165 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Renames and merges of modules in bulk.
+
+``openupgrade.update_module_names`` runs about ten queries per renamed or
+merged module, on tables like ``ir_model_data`` that are large. This version
+applies all the renames and merges at once, with one query per step, from a
+temporary table of the old and new names. Chains must be resolved by the
+caller, like ``apriori.modules`` does, so that no new name is also an old one.
+
+The result is the one of ``openupgrade.update_module_names`` with the renames
+applied first, then the merges, in their order:
+
+* a merge into a module that is not in the database is a rename;
+* when several modules are merged into the same one, the xmlids that collide
+  are kept for the first module, and suffixed for the others, to be removed
+  by the update of the new module.
+"""
+from openupgradelib import openupgrade
+
+
+def _get_spec(cr, renamed, merged):
+    """Return (old, new, merge) tuples, in which merge is whether the new
+    module exists when the old one is merged into it
+    """
+    names = set(renamed) | set(renamed.values()) | set(merged) | set(merged.values())
+    cr.execute("SELECT name FROM ir_module_module WHERE name IN %s", (tuple(names),))
+    existing = {row[0] for row in cr.fetchall()}
+    spec = []
+    for old, new in list(renamed.items()) + list(merged.items()):
+        merge = old in merged and new in existing
+        spec.append((old, new, merge))
+        if not merge and old in existing:
+            existing.discard(old)
+            existing.add(new)
+    return spec
+
+
+def update_module_names(cr, renamed, merged):
+    """Rename and merge modules, with all the needed changes on the related
+    tables.
+
+    :param renamed: dict of the new names of the renamed modules
+    :param merged: dict of the names of the modules into which the old
+        modules are merged
+    """
+    if not renamed and not merged:
+        return
+    spec = _get_spec(cr, renamed, merged)
+    cr.execute(
+        """
+        CREATE TEMP TABLE openupgrade_module_rename AS
+        SELECT * FROM unnest(%s::varchar[], %s::varchar[], %s::boolean[])
+            WITH ORDINALITY AS spec(old, new, merge, sequence)""",
+        tuple([row[index] for row in spec] for index in range(3)),
+    )
+    # Meta entries of the merged modules are recreated by the new modules
+    for table in ("ir_model_constraint", "ir_model_relation"):
+        openupgrade.logged_query(  # pylint: disable=sql-injection
+            cr,
+            """
+            DELETE FROM {} t
+            USING ir_module_module m, openupgrade_module_rename s
+            WHERE t.module = m.id AND m.name = s.old AND s.merge
+            """.format(
+                table
+            ),
+        )
+    # Keep the state of the first merged module that is not uninstalled, if the
+    # new one is uninstalled
+    openupgrade.logged_query(
+        cr,
+        """
+        UPDATE ir_module_module m1
+        SET state = m2.state, latest_version = m2.latest_version
+        FROM (
+            SELECT DISTINCT ON (s.new) s.new, m.state, m.latest_version
+            FROM openupgrade_module_rename s
+            JOIN ir_module_module m ON m.name = s.old
+            WHERE s.merge
+            ORDER BY s.new, m.state = 'uninstalled', s.sequence
+        ) m2
+        WHERE m1.name = m2.new AND m1.state = 'uninstalled'
+        """,
+    )
+    openupgrade.logged_query(
+        cr,
+        """
+        UPDATE ir_module_module m
+        SET name = s.new
+        FROM openupgrade_module_rename s
+        WHERE m.name = s.old AND NOT s.merge
+        """,
+    )
+    openupgrade.logged_query(
+        cr,
+        """
+        DELETE FROM ir_module_module m
+        USING openupgrade_module_rename s
+        WHERE m.name = s.old AND s.merge
+        """,
+    )
+    # The xmlids of the module records themselves
+    openupgrade.logged_query(
+        cr,
+        """
+        DELETE FROM ir_model_data imd
+        USING openupgrade_module_rename s
+        WHERE imd.module = 'base' AND imd.model = 'ir.module.module'
+            AND imd.name = 'module_' || s.old AND s.merge
+        """,
+    )
+    openupgrade.logged_query(
+        cr,
+        """
+        UPDATE ir_model_data imd
+        SET name = 'module_' || s.new
+        FROM openupgrade_module_rename s
+        WHERE imd.module = 'base' AND imd.model = 'ir.module.module'
+            AND imd.name = 'module_' || s.old AND NOT s.merge
+        """,
+    )
+    # Move the xmlids, the ones that would be duplicated are renamed for the
+    # update of the new module to remove their records
+    openupgrade.logged_query(
+        cr,
+        """
+        UPDATE ir_model_data imd
+        SET module = moved.new,
+            name = CASE WHEN moved.keep THEN imd.name
+                ELSE imd.name || '_openupgrade_' || imd.id END,
+            noupdate = CASE WHEN moved.keep THEN imd.noupdate ELSE FALSE END
+        FROM (
+            SELECT imd2.id, s.new,
+                row_number() OVER (
+                    PARTITION BY s.new, imd2.name ORDER BY s.sequence) = 1
+                AND NOT EXISTS (
+                    SELECT 1 FROM ir_model_data imd3
+                    WHERE imd3.module = s.new AND imd3.name = imd2.name
+                ) AS keep
+            FROM ir_model_data imd2
+            JOIN openupgrade_module_rename s ON imd2.module = s.old
+        ) moved
+        WHERE imd.id = moved.id
+        """,
+    )
+    openupgrade.logged_query(
+        cr,
+        """
+        UPDATE ir_module_module_dependency d
+        SET name = s.new
+        FROM openupgrade_module_rename s
+        WHERE d.name = s.old
+        """,
+    )
+    openupgrade.logged_query(
+        cr,
+        """
+        UPDATE ir_translation t
+        SET module = s.new
+        FROM openupgrade_module_rename s
+        WHERE t.module = s.old
+        """,
+    )
+    cr.execute("DROP TABLE openupgrade_module_rename")
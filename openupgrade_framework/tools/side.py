@@ -0,0 +1,128 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Side connections to the database, besides the cursor of the migration.
+
+The migration scripts run their queries on the cursor of the loader, in a
+single transaction. A side cursor is a cursor on another connection of the
+connection pool of Odoo, for the queries that do not need to run in that
+transaction:
+
+* the read-only queries, like the detection of inconsistent data, can run in
+  threads while the migration cursor goes on, with ``submit``, which returns
+  a future of the rows of the query;
+* the independent work, like the chunks of a table that a script commits on
+  its own, can run on a side cursor in write mode.
+
+A side connection does not see the uncommitted work of the migration
+transaction, and waits for its locks, like the ones that ALTER TABLE holds
+until the end of the transaction. So:
+
+* the tables of a query are given to ``submit``, which runs the query on the
+  migration cursor when the migration transaction has changed or locked one
+  of them;
+* the side cursors fail after ``LOCK_TIMEOUT`` rather than waiting for the
+  locks of the migration transaction, which would wait for them in turn;
+* a side cursor in write mode is committed when its block succeeds, and rolled
+  back otherwise. Its work stays committed even when the migration transaction
+  is rolled back, so it must be idempotent, or checkpointed (see
+  checkpoint.py).
+
+The number of threads running the submitted queries is the value of the
+option ``openupgrade_side_connections``, 2 by default.
+"""
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import closing, contextmanager
+
+from odoo import sql_db
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECTIONS = 2
+# Time after which a query of a side cursor that waits for a lock fails
+LOCK_TIMEOUT = "10s"
+
+_executor = {}
+
+
+def connections():
+    """Return the number of threads running the submitted queries"""
+    return int(config.get("openupgrade_side_connections") or DEFAULT_CONNECTIONS)
+
+
+def get_pending_tables(cr):
+    """Return the tables that a side connection cannot read like the cursor:
+    the ones of which the current transaction of the cursor has uncommitted
+    changes or exclusive locks"""
+    cr.execute(
+        """
+        SELECT relname FROM pg_stat_xact_user_tables
+        WHERE n_tup_ins + n_tup_upd + n_tup_del > 0
+        UNION
+        SELECT c.relname FROM pg_locks l
+        JOIN pg_class c ON c.oid = l.relation
+        WHERE l.pid = pg_backend_pid() AND l.mode = 'AccessExclusiveLock'"""
+    )
+    return {row[0] for row in cr.fetchall()}
+
+
+@contextmanager
+def cursor(dbname, readonly=True):
+    """Open a cursor on a side connection to the database, in a repeatable
+    read transaction, read only by default. The transaction of a cursor in
+    write mode is committed when the enclosed code succeeds, and rolled back
+    otherwise::
+
+        with side.cursor(env.cr.dbname, readonly=False) as side_cr:
+            side_cr.execute("UPDATE ...")
+    """
+    with closing(sql_db.db_connect(dbname).cursor()) as cr:
+        cr.execute(  # pylint: disable=sql-injection
+            "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, {}".format(
+                "READ ONLY" if readonly else "READ WRITE"
+            )
+        )
+        cr.execute("SET LOCAL lock_timeout = %s", (LOCK_TIMEOUT,))
+        yield cr
+        # The transaction is rolled back when the cursor is closed otherwise
+        if not readonly:
+            cr.commit()
+
+
+def _fetch(dbname, query, params):
+    threading.current_thread().dbname = dbname
+    with cursor(dbname) as cr:
+        cr.execute(query, params)
+        return cr.fetchall()
+
+
+def submit(cr, query, params=None, tables=()):
+    """Run the read-only query on a side connection, and return a future of
+    its rows. The query runs on the given migration cursor, before returning,
+    when the migration transaction has changed or locked one of its tables::
+
+        orphans = side.submit(
+            env.cr,
+            "SELECT id FROM mail_tracking_value WHERE ...",
+            tables=["mail_tracking_value", "mail_message"],
+        )
+        # queries on the migration cursor
+        orphan_ids = [row[0] for row in orphans.result()]
+
+    :param tables: the tables read by the query
+    """
+    pending = set(tables) & get_pending_tables(cr)
+    if pending:
+        _logger.debug(
+            "Query run on the migration cursor, as %s changed or locked",
+            ", ".join(pending),
+        )
+        future = Future()
+        cr.execute(query, params)
+        future.set_result(cr.fetchall())
+        return future
+    if "executor" not in _executor:
+        _executor["executor"] = ThreadPoolExecutor(connections(), "openupgrade_side")
+    return _executor["executor"].submit(_fetch, cr.dbname, query, params)
@@ -0,0 +1,228 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Staged upgrades: the core modules first, the other modules afterwards.
+
+When the option ``openupgrade_core_modules`` is set to a comma separated list
+of modules, only these modules and their dependencies are upgraded or
+installed by the migration from the previous major version. The other modules
+to upgrade or to install are recorded in the table
+``openupgrade_pending_module`` and left out of the module graph, as long as
+they are pending. The database can then be
+used again, without the pending modules, while these are upgraded by a
+separate process with ``run_pending``, which is the ``pending`` tool of the
+``openupgrade`` command. The tables are dropped once no modules are pending.
+
+As the modules that depend on a pending module are pending too, the core
+modules never depend on a pending module. The columns that the pending modules
+add to the tables of the core modules stay in the database meanwhile, so such
+columns must not be required.
+
+The views, scheduled actions and menus of the pending modules would refer to
+their models and fields, which are not loaded. The active ones are deactivated
+when the modules are deferred, recorded in the table
+``openupgrade_pending_record``, and activated again once their module is
+upgraded. The record rules stay active, as the rules that the pending modules
+put on the models of the core modules restrict the access to their records.
+"""
+import logging
+from contextlib import closing
+
+from odoo import release, sql_db
+from odoo.modules.registry import Registry
+from odoo.tools import config
+
+_logger = logging.getLogger(__name__)
+
+# Pending modules that are being upgraded by run_pending
+_upgrading = set()
+# Databases migrated from a previous major version by this process
+_migrating = set()
+
+# Tables of the records of the pending modules deactivated meanwhile, by model
+DEACTIVATED_MODELS = {
+    "ir.cron": "ir_cron",
+    "ir.ui.menu": "ir_ui_menu",
+    "ir.ui.view": "ir_ui_view",
+}
+
+
+def core_modules():
+    modules = config.get("openupgrade_core_modules") or ""
+    return {name.strip() for name in modules.split(",") if name.strip()} | {"base"}
+
+
+def _ensure_table(cr):
+    cr.execute(
+        """
+        CREATE TABLE IF NOT EXISTS openupgrade_pending_module (
+            name varchar PRIMARY KEY,
+            create_date timestamp DEFAULT (now() at time zone 'UTC')
+        );
+        CREATE TABLE IF NOT EXISTS openupgrade_pending_record (
+            module varchar NOT NULL,
+            model varchar NOT NULL,
+            res_id integer NOT NULL
+        )"""
+    )
+
+
+def _deactivate_records(cr, modules):
+    """Deactivate the active records of the modules that refer to their
+    models, and record them"""
+    for model, table in DEACTIVATED_MODELS.items():
+        cr.execute(  # pylint: disable=sql-injection
+            """
+            WITH deactivated AS (
+                UPDATE {} t SET active = FALSE
+                FROM ir_model_data imd
+                WHERE imd.model = %s AND imd.res_id = t.id AND imd.module IN %s
+                    AND t.active
+                RETURNING imd.module, t.id
+            )
+            INSERT INTO openupgrade_pending_record (module, model, res_id)
+            SELECT module, %s, id FROM deactivated""".format(
+                table
+            ),
+            (model, tuple(modules), model),
+        )
+        if cr.rowcount:
+            _logger.info("%s records of %s deactivated", cr.rowcount, model)
+
+
+def _restore_records(cr, modules):
+    """Activate again the records of the modules deactivated when they were
+    deferred"""
+    for model, table in DEACTIVATED_MODELS.items():
+        cr.execute(  # pylint: disable=sql-injection
+            """
+            WITH restored AS (
+                DELETE FROM openupgrade_pending_record
+                WHERE model = %s AND module IN %s
+                RETURNING res_id
+            )
+            UPDATE {} SET active = TRUE
+            WHERE id IN (SELECT res_id FROM restored)""".format(
+                table
+            ),
+            (model, tuple(modules)),
+        )
+
+
+def defer_modules(cr):
+    """Record the modules to upgrade or to install that are not a core module
+    or a dependency of one as pending, and deactivate their records"""
+    _ensure_table(cr)
+    cr.execute(
+        """
+        WITH RECURSIVE core AS (
+            SELECT id, name FROM ir_module_module WHERE name IN %s
+            UNION
+            SELECT imm.id, imm.name
+            FROM core
+            JOIN ir_module_module_dependency imd ON imd.module_id = core.id
+            JOIN ir_module_module imm ON imm.name = imd.name
+        )
+        INSERT INTO openupgrade_pending_module (name)
+        SELECT name FROM ir_module_module
+        WHERE state IN ('to upgrade', 'to install')
+            AND name NOT IN (SELECT name FROM core)
+        ON CONFLICT DO NOTHING
+        RETURNING name""",
+        (tuple(core_modules()),),
+    )
+    deferred = sorted(name for name, in cr.fetchall())
+    if deferred:
+        _logger.info(
+            "Deferring the upgrade of %s modules: %s",
+            len(deferred),
+            ", ".join(deferred),
+        )
+        _deactivate_records(cr, deferred)
+
+
+def get_pending(cr):
+    """Return the names of the pending modules"""
+    cr.execute("SELECT to_regclass('openupgrade_pending_module')")
+    if not cr.fetchone()[0]:
+        return set()
+    cr.execute("SELECT name FROM openupgrade_pending_module")
+    return {name for name, in cr.fetchall()}
+
+
+def _is_migrating(cr):
+    """Return whether the process migrates the database from a previous major
+    version, which is decided when the modules are first added to the graph,
+    before the base module is loaded"""
+    if cr.dbname not in _migrating:
+        cr.execute("SELECT latest_version FROM ir_module_module WHERE name = 'base'")
+        row = cr.fetchone()
+        if row and row[0] and row[0] < release.major_version:
+            _migrating.add(cr.dbname)
+    return cr.dbname in _migrating
+
+
+def get_excluded(cr):
+    """Return the names of the modules to leave out of the module graph.
+    Called when modules are added to the graph. The modules are only deferred
+    by the migration, not when they are installed or updated afterwards.
+    """
+    if config.get("openupgrade_core_modules") and not _upgrading and _is_migrating(cr):
+        defer_modules(cr)
+    return get_pending(cr) - _upgrading
+
+
+def run_pending(dbname, modules=None):
+    """Upgrade the pending modules of the database, or the given ones and
+    their pending dependencies. The other modules are not reloaded while
+    this happens, so the database remains in use.
+    """
+    with closing(sql_db.db_connect(dbname).cursor()) as cr:
+        pending = get_pending(cr)
+        if modules:
+            cr.execute(
+                """
+                WITH RECURSIVE dependencies AS (
+                    SELECT id, name FROM ir_module_module WHERE name IN %s
+                    UNION
+                    SELECT imm.id, imm.name
+                    FROM dependencies
+                    JOIN ir_module_module_dependency imd
+                        ON imd.module_id = dependencies.id
+                    JOIN ir_module_module imm ON imm.name = imd.name
+                )
+                SELECT name FROM dependencies""",
+                (tuple(modules),),
+            )
+            pending &= {name for name, in cr.fetchall()}
+    if not pending:
+        _logger.info("No pending modules to upgrade")
+        return
+    _logger.info("Upgrading the pending modules %s", ", ".join(sorted(pending)))
+    _upgrading.update(pending)
+    try:
+        registry = Registry.new(dbname, update_module=True)
+    finally:
+        _upgrading.clear()
+    with registry.cursor() as cr:
+        cr.execute(
+            """DELETE FROM openupgrade_pending_module
+            WHERE name IN %s AND name IN (
+                SELECT name FROM ir_module_module WHERE state = 'installed')
+            RETURNING name""",
+            (tuple(pending),),
+        )
+        done = {name for name, in cr.fetchall()}
+        if done:
+            _restore_records(cr, done)
+        if not get_pending(cr):
+            cr.execute(
+                "DROP TABLE openupgrade_pending_module, openupgrade_pending_record"
+            )
+    if pending - done:
+        _logger.error(
+            "Some pending modules could not be upgraded: %s",
+            ", ".join(sorted(pending - done)),
+        )
+    # Make the other processes reload their registry, with these modules
+    registry.registry_invalidated = True
+    registry.signal_changes()
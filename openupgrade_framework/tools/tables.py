@@ -0,0 +1,301 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Static analysis of the tables read and written by the migration scripts.
+
+The scripts are parsed, not run. The tables of a script are found in:
+
+* the SQL queries passed to ``logged_query``, ``execute`` and
+  ``side.submit``, as literal strings, or as the format strings of
+  ``str.format`` calls, of which the placeholders are ignored. The targets of
+  UPDATE, INSERT INTO, DELETE FROM, ALTER, DROP and TRUNCATE are written, the
+  tables following FROM, JOIN and USING are read;
+* the calls of the helpers of openupgradelib and of ``bulk.insert`` listed in
+  ``HELPERS``, with literal arguments or module level constants;
+* the models of ``env["model"]``, of which the tables are considered read and
+  written, as the ORM may do both.
+
+The helper calls of which the arguments cannot be evaluated are listed as
+unresolved. Two scripts of different modules conflict when one of them writes
+a table that the other one reads or writes, except the metadata tables of
+``SHARED_TABLES`` in which each module has its own rows. The parallel execution of the
+pre-migration scripts (see parallel.py) runs the scripts of conflicting
+modules one after the other, and the command ``tables`` reports the tables
+and the conflicts of all the scripts.
+"""
+import ast
+import glob
+import os
+import re
+
+# Targets of the queries that write, and tables of the queries that read
+SQL_WRITE_RE = re.compile(
+    r"\b(?:UPDATE|INSERT\s+INTO|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?|"
+    r"(?:ALTER|DROP)\s+TABLE(?:\s+IF\s+EXISTS)?)\s+(?:ONLY\s+)?"
+    r"\"?([a-z_][a-z0-9_]*)",
+    re.IGNORECASE,
+)
+# The names followed by a dot are aliases, like in EXTRACT(year FROM so.date)
+SQL_READ_RE = re.compile(
+    r"\b(?:FROM|JOIN|USING)\s+(?:ONLY\s+)?\"?([a-z_][a-z0-9_]*)\b(?!\.)",
+    re.IGNORECASE,
+)
+# Names of common table expressions, which are not tables
+SQL_CTE_RE = re.compile(r"\b([a-z_][a-z0-9_]*)\s+AS\s*\(", re.IGNORECASE)
+# Names following FROM that are not tables, like in EXTRACT(year FROM date),
+# and abstract models
+NOT_TABLES = {"base", "select", "unnest", "generate_series", "lateral", "jsonb_each"}
+# Functions running SQL queries, of which the first string argument is analysed
+SQL_FUNCTIONS = {"logged_query", "execute", "submit"}
+
+# Tables of which each module only writes its own rows, like the xmlids, and
+# that do not make scripts conflict
+SHARED_TABLES = {
+    "ir_model",
+    "ir_model_data",
+    "ir_model_fields",
+    "ir_translation",
+}
+
+# Metadata tables written by the helpers, besides the tables of their
+# arguments, like the tables that store the names of the renamed fields and
+# models
+_FIELD_TABLES = (
+    "ir_attachment",
+    "ir_exports_line",
+    "ir_filters",
+    "ir_model_data",
+    "ir_model_fields",
+    "ir_property",
+    "ir_translation",
+    "mail_alias",
+    "mail_tracking_value",
+)
+_MODEL_TABLES = (
+    "ir_act_server",
+    "ir_exports",
+    "ir_filters",
+    "ir_model",
+    "ir_model_data",
+    "ir_model_fields",
+    "ir_property",
+    "ir_translation",
+    "mail_message_subtype",
+    "mail_template",
+    "rating_rating",
+)
+_MODULE_TABLES = (
+    "ir_module_module",
+    "ir_module_module_dependency",
+    "ir_model_data",
+    "ir_translation",
+)
+
+
+def _name(value):
+    return [value] if isinstance(value, str) else []
+
+
+def _keys(value):
+    return [key for key in value if isinstance(key, str)]
+
+
+def _items(value):
+    """Names of a list of names, or of tuples of names"""
+    names = []
+    for item in value:
+        names.extend(item if isinstance(item, (list, tuple)) else [item])
+    return [name for name in names if isinstance(name, str)]
+
+
+def _item(index):
+    def get_names(value):
+        return [item[index] for item in value if isinstance(item[index], str)]
+
+    return get_names
+
+
+# Tables written by the helpers, as (position, keyword, names of the argument,
+# tables always written), by helper name
+HELPERS = {
+    "add_fields": (1, "field_spec", _item(2), ("ir_model_fields",)),
+    "convert_field_to_html": (1, "table", _name, ()),
+    "copy_columns": (1, "column_spec", _keys, ()),
+    "date_to_datetime_tz": (1, "table", _name, ()),
+    "delete_record_translations": (None, None, None, ("ir_translation",)),
+    "delete_records_safely_by_xml_id": (None, None, None, ("ir_model_data",)),
+    # bulk.insert
+    "insert": (1, "table", _name, ()),
+    "disable_invalid_filters": (None, None, None, ("ir_filters",)),
+    "lift_constraints": (1, "table", _name, ()),
+    "load_changes": (None, None, None, ("ir_model_data",)),
+    "load_data": (None, None, None, ("ir_model_data",)),
+    "map_values": (5, "table", _name, ()),
+    "remove_tables_fks": (1, "tables", _items, ()),
+    "rename_columns": (1, "column_spec", _keys, ()),
+    "rename_fields": (1, "field_spec", _item(1), _FIELD_TABLES),
+    "rename_models": (None, None, None, _MODEL_TABLES),
+    "rename_tables": (1, "table_spec", _items, ()),
+    "rename_xmlids": (None, None, None, ("ir_model_data",)),
+    "set_xml_ids_noupdate_value": (None, None, None, ("ir_model_data",)),
+    "update_module_names": (None, None, None, _MODULE_TABLES),
+}
+
+
+def get_sql_tables(query):
+    """Return the sets of the tables only read, and of the tables written by
+    the SQL query"""
+    ctes = {name.lower() for name in SQL_CTE_RE.findall(query)}
+    writes = {name.lower() for name in SQL_WRITE_RE.findall(query)} - ctes
+    reads = {name.lower() for name in SQL_READ_RE.findall(query)} - ctes
+    return reads - writes - NOT_TABLES, writes
+
+
+def _get_constants(tree):
+    """Return the values of the module level constants of the script"""
+    constants = {}
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1:
+            target = node.targets[0]
+            if isinstance(target, ast.Name):
+                try:
+                    constants[target.id] = ast.literal_eval(node.value)
+                except ValueError:
+                    continue
+    return constants
+
+
+def _get_string(node):
+    """Return the string of a literal, of a format string or of a
+    ``str.format`` call, or None"""
+    try:
+        value = ast.literal_eval(node)
+    except ValueError:
+        value = None
+    if isinstance(value, str):
+        return value
+    if isinstance(node, ast.JoinedStr):
+        return "".join(_get_string(value) or " " for value in node.values)
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Attribute)
+        and node.func.attr == "format"
+    ):
+        return _get_string(node.func.value)
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mod):
+        return _get_string(node.left)
+    return None
+
+
+def _get_argument(call, position, keyword, constants):
+    """Return the value of an argument of the call, or raise ValueError"""
+    node = None
+    if position is not None and len(call.args) > position:
+        node = call.args[position]
+    for item in call.keywords:
+        if item.arg == keyword:
+            node = item.value
+    if node is None:
+        return None
+    if isinstance(node, ast.Name):
+        if node.id not in constants:
+            raise ValueError(node.id)
+        return constants[node.id]
+    return ast.literal_eval(node)
+
+
+def get_access(source):
+    """Return the tables read and written by the script, and the helper calls
+    of which the tables are unknown, as a dict of sorted lists with the keys
+    reads, writes and unresolved
+    """
+    tree = ast.parse(source)
+    constants = _get_constants(tree)
+    reads, writes, unresolved = set(), set(), set()
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Subscript)
+            and isinstance(node.value, ast.Name)
+            and node.value.id == "env"
+        ):
+            index = node.slice
+            # ast.Index up to Python 3.8
+            if isinstance(index, getattr(ast, "Index", ())):
+                index = index.value
+            model = _get_string(index)
+            if model and model not in NOT_TABLES:
+                reads.add(model.replace(".", "_"))
+                writes.add(model.replace(".", "_"))
+        if not isinstance(node, ast.Call):
+            continue
+        func = node.func
+        name = func.attr if isinstance(func, ast.Attribute) else getattr(func, "id", "")
+        if name in SQL_FUNCTIONS:
+            for arg in node.args:
+                query = _get_string(arg)
+                if query is not None:
+                    query_reads, query_writes = get_sql_tables(query)
+                    reads |= query_reads
+                    writes |= query_writes
+                    break
+        elif name in HELPERS:
+            position, keyword, get_names, tables = HELPERS[name]
+            writes.update(tables)
+            if get_names is None:
+                continue
+            try:
+                value = _get_argument(node, position, keyword, constants)
+                if value is not None:
+                    writes.update(get_names(value))
+            except (ValueError, TypeError, IndexError):
+                unresolved.add("%s (line %s)" % (name, node.lineno))
+    return {
+        "reads": sorted(reads - writes),
+        "writes": sorted(writes),
+        "unresolved": sorted(unresolved),
+    }
+
+
+def get_file_access(pyfile):
+    with open(pyfile) as script:
+        return get_access(script.read())
+
+
+def get_script_access(path, modules=None):
+    """Return the access of the migration scripts of the path, by
+    ``module/version/script`` name, for all the modules or the given ones
+    """
+    accesses = {}
+    pattern = os.path.join(path, "*", "14.0.*", "*.py")
+    for pyfile in sorted(glob.glob(pattern)):
+        name = "/".join(pyfile.split(os.sep)[-3:])
+        if modules and name.split("/")[0] not in modules:
+            continue
+        accesses[name] = get_file_access(pyfile)
+    return accesses
+
+
+def get_conflicts(accesses):
+    """Return the tables by which the scripts of different modules conflict,
+    by (script, script) pair.
+
+    :param accesses: dict of the access of the scripts, as returned by
+        get_access, by ``module/...`` name
+    """
+    readers = {}
+    writers = {}
+    for name, access in accesses.items():
+        for table in access["reads"]:
+            readers.setdefault(table, set()).add(name)
+        for table in access["writes"]:
+            writers.setdefault(table, set()).add(name)
+    conflicts = {}
+    for table, names in writers.items():
+        if table in SHARED_TABLES:
+            continue
+        for writer in names:
+            for other in names | readers.get(table, set()):
+                if writer.split("/")[0] == other.split("/")[0]:
+                    continue
+                pair = tuple(sorted((writer, other)))
+                conflicts.setdefault(pair, set()).add(table)
+    return {pair: sorted(tables) for pair, tables in conflicts.items()}
@@ -0,0 +1,218 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Validation of the views after the migration.
+
+During the migration, the validation of the views is disabled, as many views
+are temporarily invalid while their modules are not all upgraded yet. The
+audit validates all the active views of the migrated database at once:
+
+* the views are validated by a pool of processes, forked from the process that
+  loaded the registry, each with its own database connection;
+* the results are kept in the table ``openupgrade_view_audit``, keyed by a
+  hash of the id of the view, of its combined arch, of its model and of the
+  installed modules, so that running the audit again only validates the
+  changed views. The id is part of the key as the views that extend the same
+  root view share the combined arch, but not the error;
+* the combined arch of a view includes all the active views that extend the
+  same root view, so one invalid extension makes all of them fail. The views
+  that fail are validated again with only the views that they extend, and
+  only the ones that introduce the error, which fail while the view that they
+  extend does not, are reported;
+* the failing views are deactivated with a single write, and returned sorted
+  by id for the report.
+"""
+import hashlib
+import logging
+import multiprocessing
+import time
+from contextlib import closing
+
+from lxml import etree
+
+import odoo
+from odoo import SUPERUSER_ID, api, sql_db
+
+_logger = logging.getLogger(__name__)
+
+# Context key that makes the patches of ir.ui.view validate the views
+AUDIT_CONTEXT = "openupgrade_audit_views"
+
+# Errors by hash, and the signature of the installed modules, inherited by the
+# forked workers
+_state = {}
+
+
+def _create_table(cr):
+    cr.execute(
+        """
+        CREATE TABLE IF NOT EXISTS openupgrade_view_audit (
+            arch_hash varchar PRIMARY KEY,
+            error text,
+            create_date timestamp DEFAULT (now() AT TIME ZONE 'UTC')
+        )"""
+    )
+
+
+def _get_signature(cr):
+    cr.execute(
+        """
+        SELECT name, latest_version FROM ir_module_module
+        WHERE state = 'installed' ORDER BY name"""
+    )
+    return ",".join("%s:%s" % row for row in cr.fetchall())
+
+
+def _hash_view(view, signature):
+    arch = etree.tostring(view._get_combined_arch(), encoding="unicode")
+    return hashlib.sha1(
+        "\n".join([signature, str(view.id), view.model or "", arch]).encode()
+    ).hexdigest()
+
+
+def _check_view(view):
+    """Return the error of the validation of the view, or None"""
+    try:
+        with view.env.cr.savepoint():
+            view._check_xml()
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def _check_view_alone(view):
+    """Return the error of the validation of the view when the other views
+    that extend the same root view are inactive, or None"""
+    cr = view.env.cr
+    chain = view
+    while chain[-1].inherit_id:
+        chain |= chain[-1].inherit_id
+    view.flush()
+    cr.execute("SAVEPOINT openupgrade_view_alone")
+    try:
+        cr.execute(
+            """
+            WITH RECURSIVE tree AS (
+                SELECT id FROM ir_ui_view WHERE id = %s
+                UNION
+                SELECT v.id FROM ir_ui_view v JOIN tree ON v.inherit_id = tree.id
+            )
+            UPDATE ir_ui_view SET active = FALSE
+            WHERE id IN (SELECT id FROM tree) AND id != ALL(%s) AND active""",
+            (chain[-1].id, chain.ids),
+        )
+        view.invalidate_cache()
+        view.clear_caches()
+        return _check_view(view)
+    finally:
+        cr.execute("ROLLBACK TO SAVEPOINT openupgrade_view_alone")
+        cr.execute("RELEASE SAVEPOINT openupgrade_view_alone")
+        view.invalidate_cache()
+        view.clear_caches()
+
+
+def _get_own_error(view, alone_errors):
+    """Return the error of the view when it introduces it, or None when it
+    fails because of another view that extends the same root view.
+
+    :param alone_errors: the errors of the views validated alone, by view
+    """
+    for record in (view, view.inherit_id):
+        if record and record not in alone_errors:
+            alone_errors[record] = _check_view_alone(record)
+    if view.inherit_id and alone_errors[view.inherit_id]:
+        return None
+    return alone_errors[view]
+
+
+def _validate_views(dbname, view_ids):
+    """Validate the given views, and return (view_id, arch_hash, error) tuples,
+    of which the error is only set for the views that introduce it. Run in the
+    worker processes.
+    """
+    results = []
+    alone_errors = {}
+    registry = odoo.registry(dbname)
+    with api.Environment.manage(), closing(registry.cursor()) as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {AUDIT_CONTEXT: True})
+        for view in env["ir.ui.view"].browse(view_ids):
+            try:
+                with cr.savepoint():
+                    arch_hash = _hash_view(view, _state["signature"])
+            except Exception:
+                # The combination of the arch fails, like the validation
+                arch_hash = None
+            if arch_hash in _state["errors"]:
+                results.append((view.id, arch_hash, _state["errors"][arch_hash]))
+                continue
+            error = _check_view(view)
+            if error:
+                error = _get_own_error(view, alone_errors)
+            results.append((view.id, arch_hash, error))
+        cr.rollback()
+    return results
+
+
+def audit(dbname, workers=None):
+    """Validate the active views of the database, deactivate the invalid ones
+    and return a list of dicts describing them.
+
+    :param workers: number of worker processes, by default the number of CPUs.
+    """
+    start = time.time()
+    registry = odoo.registry(dbname)
+    with api.Environment.manage(), registry.cursor() as cr:
+        _create_table(cr)
+        cr.execute("SELECT arch_hash, error FROM openupgrade_view_audit")
+        _state["errors"] = dict(cr.fetchall())
+        _state["signature"] = _get_signature(cr)
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        view_ids = env["ir.ui.view"].search([], order="id").ids
+    workers = max(1, min(workers or multiprocessing.cpu_count(), len(view_ids)))
+    chunks = [(dbname, view_ids[index::workers]) for index in range(workers)]
+    # The forked processes must not share the connections of this one
+    sql_db.close_all()
+    with multiprocessing.get_context("fork").Pool(workers) as pool:
+        results = sorted(
+            result
+            for chunk in pool.starmap(_validate_views, chunks)
+            for result in chunk
+        )
+    cached = sum(1 for _id, arch_hash, _e in results if arch_hash in _state["errors"])
+    with api.Environment.manage(), registry.cursor() as cr:
+        new = {
+            arch_hash: error
+            for _id, arch_hash, error in results
+            if arch_hash and arch_hash not in _state["errors"]
+        }
+        if new:
+            cr.execute(
+                """
+                INSERT INTO openupgrade_view_audit (arch_hash, error)
+                SELECT * FROM unnest(%s::varchar[], %s::text[])
+                ON CONFLICT (arch_hash) DO UPDATE SET error = EXCLUDED.error""",
+                (list(new), list(new.values())),
+            )
+        errors = {view_id: error for view_id, _hash, error in results if error}
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        views = env["ir.ui.view"].browse(sorted(errors))
+        report = [
+            {
+                "id": view.id,
+                "xml_id": view.xml_id or "",
+                "name": view.name,
+                "model": view.model or "",
+                "type": view.type,
+                "custom": not view.xml_id or view.xml_id.startswith("__"),
+                "error": errors[view.id],
+            }
+            for view in views
+        ]
+        views.write({"active": False})
+    _logger.info(
+        "Validated %s views in %.1fs (%s cached), %s deactivated",
+        len(results),
+        time.time() - start,
+        cached,
+        len(report),
+    )
+    return report
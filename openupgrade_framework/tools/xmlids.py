@@ -0,0 +1,111 @@
+# Copyright Odoo Community Association (OCA)
+# License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl).
+"""Cached resolution of xmlids.
+
+During the migration, the first time an xmlid of a module is resolved on a
+cursor, all the xmlids of the module are loaded from ``ir_model_data`` with a
+single query, and kept in memory for the cursor. The cache of a cursor is
+cleared by any query of the cursor that modifies ``ir_model_data``, like the
+renames and deletions of openupgradelib or the writes of the ORM, by the
+rollbacks to a savepoint, and when its transaction is committed or rolled
+back, after which the writes of other connections are visible. Outside of the
+migration, the xmlids are resolved without cache.
+
+The resolution works with a cursor, for building SQL queries::
+
+    stage_id = xmlids.res_id(env.cr, "event.event_stage_new")
+
+and with an environment, like ``env.ref``::
+
+    partner = xmlids.ref(env, "hr.res_partner_admin_private_address")
+"""
+import weakref
+from contextlib import contextmanager
+
+from odoo.sql_db import Cursor
+
+# (model, res_id) by name, by module, by cursor
+_cache = weakref.WeakKeyDictionary()
+_caching = {}
+
+
+def invalidate(cr):
+    _cache.pop(cr, None)
+
+
+def _modifies(query):
+    """Return whether the query may modify the xmlids seen by its cursor"""
+    start = query.lstrip()[:8].upper()
+    return start == "ROLLBACK" or ("ir_model_data" in query and start[:6] != "SELECT")
+
+
+@contextmanager
+def caching():
+    """Cache the xmlids within the context, which the migration of each
+    module is run in"""
+    if _caching:
+        yield
+        return
+    original_method = Cursor.execute
+
+    def execute(self, query, *args, **kwargs):
+        if self in _cache and isinstance(query, str) and _modifies(query):
+            invalidate(self)
+        return original_method(self, query, *args, **kwargs)
+
+    Cursor.execute = execute
+    _caching["active"] = True
+    try:
+        yield
+    finally:
+        Cursor.execute = original_method
+        _caching.clear()
+        _cache.clear()
+
+
+def _get_module(cr, module):
+    modules = _cache.get(cr)
+    if modules is None:
+        modules = _cache[cr] = {}
+        cr.postcommit.add(lambda: invalidate(cr))
+        cr.postrollback.add(lambda: invalidate(cr))
+    if module not in modules:
+        cr.execute(
+            "SELECT name, model, res_id FROM ir_model_data WHERE module = %s",
+            (module,),
+        )
+        modules[module] = {
+            name: (model, res_id) for name, model, res_id in cr.fetchall()
+        }
+    return modules[module]
+
+
+def resolve(cr, xmlid):
+    """Return the model and the id of the record of the xmlid, or None"""
+    module, name = xmlid.split(".", 1)
+    if _caching:
+        return _get_module(cr, module).get(name)
+    cr.execute(
+        "SELECT model, res_id FROM ir_model_data WHERE module = %s AND name = %s",
+        (module, name),
+    )
+    return cr.fetchone()
+
+
+def res_id(cr, xmlid):
+    """Return the id of the record of the xmlid, or None"""
+    return (resolve(cr, xmlid) or (None, None))[1]
+
+
+def ref(env, xmlid, raise_if_not_found=True):
+    """Return the record of the xmlid, like env.ref"""
+    # Pending writes of the ORM would not be in the cache yet
+    env["ir.model.data"].flush()
+    model, record_id = resolve(env.cr, xmlid) or (None, None)
+    if model:
+        record = env[model].browse(record_id)
+        if record.exists():
+            return record
+    if raise_if_not_found:
+        raise ValueError("No record found for unique ID %s." % xmlid)
+    return None
@@ -104,3 +104,66 @@ renamed_models = {
 
 # only used here for upgrade_analysis
 merged_models = {}
+
+
+class RenameMap:
+    """Renamed and merged names of a kind, validated at import time.
+
+    ``closure`` maps each old name to its final name, following the chains of
+    renames and merges, ``reverse`` maps each final name to the sorted old
+    names that end up in it, and ``merged`` tells the old names of which at
+    least one step of the chain is a merge.
+    """
+
+    def __init__(self, kind, renamed, merged):
+        self.kind = kind
+        both = set(renamed) & set(merged)
+        if both:
+            raise ValueError(
+                "%s both renamed and merged: %s" % (kind, ", ".join(sorted(both)))
+            )
+        steps = dict(renamed, **merged)
+        self.closure = {}
+        self.merged = set()
+        for old in steps:
+            name, chain = old, [old]
+            while name in steps:
+                name = steps[name]
+                if name in chain:
+                    raise ValueError(
+                        "Cycle of renamed %s: %s" % (kind, " > ".join(chain + [name]))
+                    )
+                chain.append(name)
+            self.closure[old] = name
+            if any(step in merged for step in chain[:-1]):
+                self.merged.add(old)
+        self.reverse = {}
+        for old, new in sorted(self.closure.items()):
+            self.reverse.setdefault(new, []).append(old)
+        for new, olds in self.reverse.items():
+            renames = [old for old in olds if old not in self.merged]
+            if len(renames) > 1:
+                raise ValueError(
+                    "The %s %s are renamed to %s, declare all but one as merged"
+                    % (kind, ", ".join(renames), new)
+                )
+
+    def renames(self):
+        """Return the final names of the old names that are only renamed"""
+        return {old: new for old, new in self.closure.items() if old not in self.merged}
+
+    def merges(self):
+        """Return the final names of the old names that are merged"""
+        return {old: new for old, new in self.closure.items() if old in self.merged}
+
+    def get(self, name):
+        """Return the final name of the name, or the name itself"""
+        return self.closure.get(name, name)
+
+    def origins(self, name):
+        """Return the old names that end up in the name"""
+        return self.reverse.get(name, [])
+
+
+modules = RenameMap("modules", renamed_modules, merged_modules)
+models = RenameMap("models", renamed_models, merged_models)
@@ -1,25 +1,65 @@
 # Copyright 2021 ForgeFlow S.L.  <https://www.forgeflow.com>
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 import logging
+import time
 from datetime import timedelta
+from operator import itemgetter
 
 from openupgradelib import openupgrade
 
 from odoo.tools.translate import _
 
+from odoo.addons.openupgrade_framework.tools import (
+    batch,
+    bulk,
+    checkpoint,
+    noupdate,
+    side,
+)
+
 _logger = logging.getLogger(__name__)
 
+# Number of records processed at once when creating journal entries in batch
+BATCH_SIZE = 1000
+
+STATEMENT_LINE_SYNC_FIELDS = [
+    "payment_ref",
+    "amount",
+    "amount_currency",
+    "foreign_currency_id",
+    "currency_id",
+    "partner_id",
+]
+
+PAYMENT_SYNC_FIELDS = [
+    "date",
+    "amount",
+    "payment_type",
+    "partner_type",
+    "payment_reference",
+    "is_internal_transfer",
+    "currency_id",
+    "partner_id",
+    "destination_account_id",
+    "partner_bank_id",
+    "journal_id",
+]
+
 
+@checkpoint.step()
 def fill_account_journal_posted_before(env):
-    openupgrade.logged_query(
+    batch.logged_query(
         env.cr,
         """
         UPDATE account_move
         SET posted_before = TRUE
-        WHERE state = 'posted'""",
+        WHERE state = 'posted'
+            AND id BETWEEN %(first_id)s AND %(last_id)s""",
+        "account_move",
     )
 
 
+@checkpoint.step()
 def fill_code_prefix_end_field(env):
     openupgrade.logged_query(
         env.cr,
@@ -30,6 +70,7 @@ def fill_code_prefix_end_field(env):
     )
 
 
+@checkpoint.step()
 def fill_default_account_id_field(env):
     openupgrade.logged_query(
         env.cr,
@@ -47,35 +88,38 @@ def fill_default_account_id_field(env):
     )
 
 
+@checkpoint.step()
 def fill_payment_id_and_statement_line_id_fields(env):
-    openupgrade.logged_query(
+    batch.logged_query(
         env.cr,
         """
         UPDATE account_move_line aml
         SET payment_id = am.payment_id
         FROM account_move am
         WHERE am.id = aml.move_id AND am.payment_id IS NOT NULL
+            AND aml.id BETWEEN %(first_id)s AND %(last_id)s
         """,
+        "account_move_line",
     )
-    openupgrade.logged_query(
+    batch.logged_query(
         env.cr,
         """
         UPDATE account_move_line aml
         SET statement_line_id = am.statement_line_id
         FROM account_move am
         WHERE am.id = aml.move_id AND am.statement_line_id IS NOT NULL
+            AND aml.id BETWEEN %(first_id)s AND %(last_id)s
         """,
+        "account_move_line",
     )
 
 
-def create_account_reconcile_model_lines(env):
-    openupgrade.logged_query(
+def _read_reconcile_model_lines(env):
+    """Return a future of the values of the lines of the reconcile models,
+    read on a side connection while the first steps go on"""
+    return side.submit(
         env.cr,
         """
-        INSERT INTO account_reconcile_model_line (model_id, company_id,
-            sequence, account_id, journal_id, label, amount_type,
-            force_tax_included, amount, amount_string, analytic_account_id,
-            create_uid, create_date, write_uid, write_date)
         SELECT id, company_id, 10, account_id, journal_id, label,
             amount_type, force_tax_included,
             CASE WHEN amount_type = 'regex' THEN 0 ELSE amount END as amount,
@@ -106,6 +150,38 @@ def create_account_reconcile_model_lines(env):
             rule_type = 'invoice_matching' AND match_total_amount
             AND match_total_amount_param < 100.0))
         ORDER BY id""",
+        tables=["account_reconcile_model", "ir_model_data"],
+    )
+
+
+@checkpoint.step()
+def create_account_reconcile_model_lines(env, model_lines):
+    """Create the lines of the reconcile models.
+
+    :param model_lines: future of the values of the lines, see
+        _read_reconcile_model_lines, only submitted when the step is not done
+    """
+    bulk.insert(
+        env.cr,
+        "account_reconcile_model_line",
+        [
+            "model_id",
+            "company_id",
+            "sequence",
+            "account_id",
+            "journal_id",
+            "label",
+            "amount_type",
+            "force_tax_included",
+            "amount",
+            "amount_string",
+            "analytic_account_id",
+            "create_uid",
+            "create_date",
+            "write_uid",
+            "write_date",
+        ],
+        model_lines.result(),
     )
     openupgrade.logged_query(
         env.cr,
@@ -153,6 +229,7 @@ def create_account_reconcile_model_lines(env):
     )
 
 
+@checkpoint.step()
 def create_account_reconcile_model_template_lines(env):
     openupgrade.logged_query(
         env.cr,
@@ -213,6 +290,7 @@ def create_account_reconcile_model_template_lines(env):
     )
 
 
+@checkpoint.step()
 def create_account_tax_report_lines(env):
     openupgrade.logged_query(
         env.cr,
@@ -253,6 +331,7 @@ def create_account_tax_report_lines(env):
             break
 
 
+@checkpoint.step()
 def post_statements_with_unreconciled_lines(env):
     openupgrade.logged_query(
         env.cr,
@@ -266,6 +345,7 @@ def post_statements_with_unreconciled_lines(env):
     )
 
 
+@checkpoint.step()
 def pass_bank_statement_line_note_to_journal_entry_narration(env):
     openupgrade.logged_query(
         env.cr,
@@ -280,6 +360,7 @@ def pass_bank_statement_line_note_to_journal_entry_narration(env):
     )
 
 
+@checkpoint.step()
 def pass_payment_to_journal_entry_narration(env):
     openupgrade.logged_query(
         env.cr,
@@ -294,6 +375,7 @@ def pass_payment_to_journal_entry_narration(env):
     )
 
 
+@checkpoint.step()
 def fill_company_account_cash_basis_base_account_id(env):
     openupgrade.logged_query(
         env.cr,
@@ -317,6 +399,7 @@ def fill_company_account_cash_basis_base_account_id(env):
     )
 
 
+@checkpoint.step()
 def populate_account_groups(env):
     """Generate the generic account groups for each company. Later code will
     do it for manually created groups.
@@ -326,71 +409,125 @@ def populate_account_groups(env):
         company.chart_template_id.generate_account_groups(company)
 
 
+def _get_columns(rows, width):
+    """Return the lists of the values of the rows by column, for unnest. Fail
+    when a row does not have the given number of values."""
+    for row in rows:
+        if len(row) != width:
+            raise ValueError("Row %s does not have %s values" % (row, width))
+    return tuple([row[index] for row in rows] for index in range(width))
+
+
+@checkpoint.step()
 def unfold_manual_account_groups(env):
     """For manually created groups, we check if such group is used in more than
     one company. If so, we unfold it. We also assure proper company for existing one.
-    """
-
-    def _get_all_children(groups):
-        children = env["account.group"].search([("parent_id", "in", groups.ids)])
-        if children:
-            children |= _get_all_children(children)
-        return children
-
-    def _get_all_parents(groups):
-        parents = groups.mapped("parent_id")
-        if parents:
-            parents |= _get_all_parents(parents)
-        return parents
 
+    The companies of the accounts of each group and its subgroups are obtained
+    at once with a recursive query, and the copies are inserted with a single
+    query, for which their ids are reserved beforehand.
+    """
     AccountGroup = env["account.group"]
-    AccountGroup._parent_store_compute()
+    AccountGroup.flush()
+    env["account.account"].flush(["group_id", "company_id"])
     env.cr.execute(
-        """SELECT ag.id FROM account_group ag
-        LEFT JOIN ir_model_data imd
-            ON ag.id = imd.res_id AND imd.model = 'account.group'
-                AND imd.module != '__export__'
-        WHERE imd.id IS NULL"""
-    )
-    all_groups = AccountGroup.browse([x[0] for x in env.cr.fetchall()])
-    all_groups = all_groups | _get_all_parents(all_groups)
+        """
+        WITH RECURSIVE tree AS (
+            SELECT id AS ancestor_id, id AS group_id
+            FROM account_group
+            UNION ALL
+            SELECT tree.ancestor_id, ag.id
+            FROM tree
+            JOIN account_group ag ON ag.parent_id = tree.group_id
+        ), manual_groups AS (
+            SELECT ag.id FROM account_group ag
+            LEFT JOIN ir_model_data imd
+                ON ag.id = imd.res_id AND imd.model = 'account.group'
+                    AND imd.module != '__export__'
+            WHERE imd.id IS NULL
+        ), groups AS (
+            SELECT DISTINCT tree.ancestor_id AS id
+            FROM tree
+            JOIN manual_groups mg ON mg.id = tree.group_id
+        ), depths AS (
+            SELECT group_id AS id, count(*) AS depth
+            FROM tree
+            GROUP BY group_id
+        ), group_companies AS (
+            SELECT DISTINCT tree.ancestor_id AS group_id, aa.company_id
+            FROM tree
+            JOIN groups g ON g.id = tree.ancestor_id
+            JOIN account_account aa ON aa.group_id = tree.group_id
+        )
+        SELECT ag.id, ag.parent_id, ag.company_id,
+            array_agg(gc.company_id ORDER BY rc.sequence, rc.name, rc.id)
+        FROM group_companies gc
+        JOIN account_group ag ON ag.id = gc.group_id
+        JOIN depths d ON d.id = ag.id
+        JOIN res_company rc ON rc.id = gc.company_id
+        GROUP BY ag.id, d.depth
+        ORDER BY d.depth, ag.id"""
+    )
+    rows = env.cr.fetchall()
+    new_ids = iter(
+        bulk.reserve_ids(
+            env.cr,
+            "account_group",
+            sum(len(company_ids) - 1 for _id, _parent, _company, company_ids in rows),
+        )
+    )
     relation_dict = {}
-    for group in all_groups.sorted(key="parent_path"):
-        subgroups = group | _get_all_children(group)
-        accounts = env["account.account"].search([("group_id", "in", subgroups.ids)])
-        companies = accounts.mapped("company_id").sorted()
-        for i, company in enumerate(companies):
-            if company not in relation_dict:
-                relation_dict[company] = {}
+    company_updates = []
+    copies = []
+    # Parents come before their children
+    for group_id, parent_id, group_company_id, company_ids in rows:
+        for i, company_id in enumerate(company_ids):
             if i == 0:
-                if group.company_id != company:
-                    group.company_id = company.id
-                relation_dict[company][group] = group
+                if group_company_id != company_id:
+                    company_updates.append((group_id, company_id))
+                relation_dict[(group_id, company_id)] = group_id
                 continue
-            # Done by SQL for avoiding ORM derived problems
-            env.cr.execute(
-                """INSERT INTO account_group (parent_id, parent_path, name,
-                code_prefix_start, code_prefix_end, company_id,
-                create_uid, write_uid, create_date, write_date)
-            SELECT {parent_id}, parent_path, name, code_prefix_start,
-                code_prefix_end, {company_id}, create_uid,
-                write_uid, create_date, write_date
-            FROM account_group
-            WHERE id = {id}
-            RETURNING id
-            """.format(
-                    id=group.id,
-                    company_id=company.id,
-                    parent_id=group.parent_id
-                    and relation_dict[company][group.parent_id].id
-                    or "NULL",
+            new_id = next(new_ids)
+            copies.append(
+                (
+                    new_id,
+                    group_id,
+                    parent_id and relation_dict[(parent_id, company_id)],
+                    company_id,
                 )
             )
-            new_group = AccountGroup.browse(env.cr.fetchone())
-            relation_dict[company][group] = new_group
+            relation_dict[(group_id, company_id)] = new_id
+    if company_updates:
+        openupgrade.logged_query(
+            env.cr,
+            """
+            UPDATE account_group ag
+            SET company_id = data.company_id
+            FROM unnest(%s::int[], %s::int[]) AS data(id, company_id)
+            WHERE ag.id = data.id""",
+            _get_columns(company_updates, 2),
+        )
+    if copies:
+        # Done by SQL for avoiding ORM derived problems
+        openupgrade.logged_query(
+            env.cr,
+            """
+            INSERT INTO account_group (id, parent_id, parent_path, name,
+                code_prefix_start, code_prefix_end, company_id,
+                create_uid, write_uid, create_date, write_date)
+            SELECT data.id, data.parent_id, ag.parent_path, ag.name,
+                ag.code_prefix_start, ag.code_prefix_end, data.company_id,
+                ag.create_uid, ag.write_uid, ag.create_date, ag.write_date
+            FROM unnest(%s::int[], %s::int[], %s::int[], %s::int[])
+                AS data(id, group_id, parent_id, company_id)
+            JOIN account_group ag ON ag.id = data.group_id""",
+            _get_columns(copies, 4),
+        )
+    AccountGroup.invalidate_cache()
     AccountGroup._parent_store_compute()
 
 
+@checkpoint.step()
 def fill_company_account_journal_suspense_account_id(env):
     companies = env["res.company"].search([("chart_template_id", "!=", False)])
     for company in companies:
@@ -407,84 +544,151 @@ def fill_company_account_journal_suspense_account_id(env):
     journals._compute_suspense_account_id()
 
 
-def fill_statement_lines_with_no_move(env):
-    stl_dates = {}
-    stl_dates_by_company = {}
-    company_dates = {}
-    env.cr.execute(
-        """
-        SELECT id, %s, company_id
-        FROM account_bank_statement_line
-        WHERE move_id IS NULL"""
-        % (openupgrade.get_legacy_name("date"),)
-    )
-    for stl_id, stl_date, stl_company in env.cr.fetchall():
-        stl_dates[stl_id] = stl_date
-        if stl_company in stl_dates_by_company:
-            stl_dates_by_company[stl_company] = min(
-                stl_date, stl_dates_by_company[stl_company]
-            )
-        else:
-            stl_dates_by_company[stl_company] = stl_date
-    if stl_dates_by_company:
+def _set_temporal_lock_dates(env, dates_by_company, progress):
+    """Move the lock dates of the companies before the oldest date of the
+    journal entries to create, to avoid _check_fiscalyear_lock_date.
+
+    The original lock dates are kept in the progress state, so that they
+    can still be restored when resuming an interrupted run.
+    """
+    company_dates = {
+        int(rc_id): dates for rc_id, dates in progress.get("lock_dates", {}).items()
+    }
+    if dates_by_company:
         env.cr.execute(
             """
             SELECT id, period_lock_date, fiscalyear_lock_date
             FROM res_company
-            WHERE id in (%s)"""
-            % (", ".join([str(x) for x in stl_dates_by_company]),)
+            WHERE id in %s""",
+            (tuple(dates_by_company),),
         )
         for rc_id, rc_period_date, rc_fy_date in env.cr.fetchall():
-            company_dates[rc_id] = [rc_period_date, rc_fy_date]
-            temporal_date = (stl_dates_by_company[rc_id] - timedelta(days=1)).strftime(
-                "%Y-%m-%d"
-            )
-            # use temporal_date to avoid _check_fiscalyear_lock_date
+            company_dates.setdefault(rc_id, [rc_period_date, rc_fy_date])
+            temporal_date = dates_by_company[rc_id] - timedelta(days=1)
             env.cr.execute(
                 """
                 UPDATE res_company
-                SET period_lock_date = TO_DATE(%s, 'YYYY-MM-DD'),
-                    fiscalyear_lock_date = TO_DATE(%s, 'YYYY-MM-DD')
+                SET period_lock_date = %s, fiscalyear_lock_date = %s
                 WHERE id = %s""",
                 (temporal_date, temporal_date, rc_id),
             )
         env["res.company"].invalidate_cache(
-            ["period_lock_date", "fiscalyear_lock_date"], list(company_dates.keys())
-        )
-    st_lines = env["account.bank.statement.line"].browse(list(stl_dates.keys()))
-    for st_line in st_lines.with_context(check_move_validity=False):
-        move = env["account.move"].create(
-            {
-                "name": "/",
-                "date": stl_dates[st_line.id],
-                "statement_line_id": st_line.id,
-                "move_type": "entry",
-                "journal_id": st_line.statement_id.journal_id.id,
-                "company_id": st_line.statement_id.company_id.id,
-                "currency_id": st_line.statement_id.journal_id.currency_id.id
-                or st_line.statement_id.company_id.currency_id.id,
-            }
+            ["period_lock_date", "fiscalyear_lock_date"], list(company_dates)
         )
-        st_line.move_id = move
-        deprecated_accounts = env["account.account"].search(
-            [("deprecated", "=", True), ("company_id", "=", st_line.company_id.id)]
+    progress["lock_dates"] = company_dates
+    return company_dates
+
+
+def _restore_lock_dates(env, company_dates):
+    for rc_id, (period_lock_date, fiscalyear_lock_date) in company_dates.items():
+        env.cr.execute(
+            """
+            UPDATE res_company
+            SET period_lock_date = %s, fiscalyear_lock_date = %s
+            WHERE id = %s""",
+            (period_lock_date, fiscalyear_lock_date, rc_id),
         )
-        deprecated_accounts.deprecated = False
+    env["res.company"].invalidate_cache(
+        ["period_lock_date", "fiscalyear_lock_date"], list(company_dates)
+    )
+
+
+def _undeprecate_accounts(env, company_ids, progress):
+    """Undeprecate the accounts of the companies once for the whole step.
+    Return the accounts to deprecate again afterwards.
+    """
+    accounts = env["account.account"].search(
+        [("deprecated", "=", True), ("company_id", "in", list(company_ids))]
+    )
+    accounts.deprecated = False
+    account_ids = set(progress.get("deprecated_account_ids", [])) | set(accounts.ids)
+    progress["deprecated_account_ids"] = sorted(account_ids)
+    return env["account.account"].browse(progress["deprecated_account_ids"])
+
+
+def _process_in_batches(env, step, rows, process_batch, process_record):
+    """Process rows in batches of BATCH_SIZE.
+
+    Each batch is passed to process_batch in a savepoint. It returns the rows
+    that it can't handle, which are passed one by one to process_record. The
+    same happens for all the rows of a batch that failed.
+
+    After each batch, the ORM cache is emptied to keep memory usage flat and
+    the batch is recorded as a checkpoint, so that an interrupted run resumes
+    after the last committed batch.
+
+    :param rows: list of tuples whose first element is the record id.
+    """
+    total = len(rows)
+    done = 0
+    for chunk in checkpoint.chunks(
+        env.cr, "account", step, rows, size=BATCH_SIZE, key=itemgetter(0)
+    ):
+        start = time.time()
+        env["base"].flush()
         try:
-            st_line._synchronize_to_moves(
-                [
-                    "payment_ref",
-                    "amount",
-                    "amount_currency",
-                    "foreign_currency_id",
-                    "currency_id",
-                    "partner_id",
-                ]
-            )
+            with env.cr.savepoint():
+                remaining = process_batch(env, chunk)
+                env["base"].flush()
         except Exception as e:
-            _logger.error("Failed for statement line with id %s: %s", st_line.id, e)
-            raise
-        deprecated_accounts.deprecated = True
+            env.clear()
+            _logger.warning(
+                "%s: batch of records %s to %s failed, falling back to record "
+                "per record processing: %s",
+                step,
+                chunk[0][0],
+                chunk[-1][0],
+                e,
+            )
+            remaining = chunk
+        for row in remaining:
+            process_record(env, row)
+        env["base"].flush()
+        env["base"].invalidate_cache()
+        done += len(chunk)
+        _logger.info(
+            "%s: %s/%s records processed (%.1f records/s)",
+            step,
+            done,
+            total,
+            len(chunk) / max(time.time() - start, 1e-6),
+        )
+
+
+def _fill_statement_line_move(env, row):
+    """Create and fill the journal entry of a single statement line through the
+    ORM. Used as fallback for the lines that the batched method can't handle.
+    """
+    st_line = (
+        env["account.bank.statement.line"]
+        .browse(row[0])
+        .with_context(check_move_validity=False)
+    )
+    move = env["account.move"].create(
+        {
+            "name": "/",
+            "date": row[1],
+            "statement_line_id": st_line.id,
+            "move_type": "entry",
+            "journal_id": st_line.statement_id.journal_id.id,
+            "company_id": st_line.statement_id.company_id.id,
+            "currency_id": st_line.statement_id.journal_id.currency_id.id
+            or st_line.statement_id.company_id.currency_id.id,
+        }
+    )
+    st_line.move_id = move
+    try:
+        st_line._synchronize_to_moves(STATEMENT_LINE_SYNC_FIELDS)
+    except Exception as e:
+        _logger.error("Failed for statement line with id %s: %s", st_line.id, e)
+        raise
+    _write_statement_line_move_lines(st_line)
+
+
+def _write_statement_line_move_lines(st_lines):
+    """Write the journal items of the journal entries of the statement lines,
+    the same way for the batches and for the lines processed one by one"""
+    for st_line in st_lines:
         to_write = {
             "line_ids": [
                 (0, 0, line_vals)
@@ -496,31 +700,88 @@ def fill_statement_lines_with_no_move(env):
         st_line.move_id.with_context(skip_account_move_synchronization=True).write(
             to_write
         )
-    # restore lock dates
-    for rc_id in company_dates:
-        env.cr.execute(
-            """
-            UPDATE res_company
-            SET period_lock_date = {}, fiscalyear_lock_date = {}
-            WHERE id = {}""".format(
-                "TO_DATE('"
-                + company_dates[rc_id][0].strftime("%Y-%m-%d")
-                + "', 'YYYY-MM-DD')"
-                if company_dates[rc_id][0]
-                else "NULL",
-                "TO_DATE('"
-                + company_dates[rc_id][1].strftime("%Y-%m-%d")
-                + "', 'YYYY-MM-DD')"
-                if company_dates[rc_id][1]
-                else "NULL",
-                rc_id,
-            ),
+
+
+def _fill_statement_lines_moves_batch(env, rows):
+    """Create the journal entries of a batch of statement lines at once, and
+    synchronize them with the lines at once. Their journal items are written
+    like the ones of the lines processed one by one.
+
+    :param rows: list of tuples (statement line id, date, journal id,
+        company id, currency id, statement line company id).
+    :return: the rows of the lines without journal, left to the ORM method.
+    """
+    to_create = [row for row in rows if row[2]]
+    if not to_create:
+        return rows
+    moves = (
+        env["account.move"]
+        .with_context(check_move_validity=False)
+        .create(
+            [
+                {
+                    "name": "/",
+                    "date": date,
+                    "statement_line_id": stl_id,
+                    "move_type": "entry",
+                    "journal_id": journal_id,
+                    "company_id": company_id,
+                    "currency_id": currency_id,
+                }
+                for stl_id, date, journal_id, company_id, currency_id, _c in to_create
+            ]
         )
-    env["res.company"].invalidate_cache(
-        ["period_lock_date", "fiscalyear_lock_date"], list(company_dates.keys())
     )
+    for move in moves:
+        move.statement_line_id.move_id = move
+    st_lines = moves.statement_line_id.with_context(check_move_validity=False)
+    st_lines._synchronize_to_moves(STATEMENT_LINE_SYNC_FIELDS)
+    _write_statement_line_move_lines(st_lines)
+    return [row for row in rows if not row[2]]
 
 
+@checkpoint.step()
+def fill_statement_lines_with_no_move(env):
+    step = "fill_statement_lines_with_no_move"
+    progress = checkpoint.get_state(env.cr, "account", step) or {}
+    # Gather in one query the values needed for creating the journal entries
+    env.cr.execute(
+        """
+        SELECT stl.id, stl.%s, abs.journal_id, abs.company_id,
+            COALESCE(aj.currency_id, rc.currency_id), stl.company_id
+        FROM account_bank_statement_line stl
+        LEFT JOIN account_bank_statement abs ON abs.id = stl.statement_id
+        LEFT JOIN account_journal aj ON aj.id = abs.journal_id
+        LEFT JOIN res_company rc ON rc.id = abs.company_id
+        WHERE stl.move_id IS NULL
+        ORDER BY stl.id"""
+        % (openupgrade.get_legacy_name("date"),)
+    )
+    rows = env.cr.fetchall()
+    stl_dates_by_company = {}
+    for row in rows:
+        stl_date, stl_company = row[1], row[5]
+        if stl_company in stl_dates_by_company:
+            stl_dates_by_company[stl_company] = min(
+                stl_date, stl_dates_by_company[stl_company]
+            )
+        else:
+            stl_dates_by_company[stl_company] = stl_date
+    company_dates = _set_temporal_lock_dates(env, stl_dates_by_company, progress)
+    deprecated_accounts = _undeprecate_accounts(env, stl_dates_by_company, progress)
+    checkpoint.set_state(env.cr, "account", step, progress)
+    _process_in_batches(
+        env,
+        step,
+        rows,
+        _fill_statement_lines_moves_batch,
+        _fill_statement_line_move,
+    )
+    deprecated_accounts.deprecated = True
+    _restore_lock_dates(env, company_dates)
+
+
+@checkpoint.step()
 def fill_account_journal_payment_credit_debit_account_id(env):
     journals = (
         env["account.journal"]
@@ -569,100 +830,38 @@ def fill_account_journal_payment_credit_debit_account_id(env):
         )
 
 
-def fill_account_payment_with_no_move(env):
-    p_data = {}
-    p_dates_by_company = {}
-    company_dates = {}
-    env.cr.execute(
-        """
-        SELECT ap.id, ap.%s, ap.%s, ap.%s, aj.company_id
-        FROM account_payment ap
-        JOIN account_journal aj ON ap.journal_id = aj.id
-        WHERE ap.move_id IS NULL
-        """
-        % (
-            openupgrade.get_legacy_name("journal_id"),
-            openupgrade.get_legacy_name("name"),
-            openupgrade.get_legacy_name("payment_date"),
-        )
+def _fill_account_payment_move(env, row):
+    """Create and fill the journal entry of a single payment through the ORM.
+    Used as fallback for the payments that the batched method can't handle.
+    """
+    payment = (
+        env["account.payment"].browse(row[0]).with_context(check_move_validity=False)
     )
-    for p_id, p_journal_id, p_name, p_payment_date, p_company in env.cr.fetchall():
-        p_data[p_id] = {
-            "journal_id": p_journal_id,
-            "name": p_name,
-            "payment_date": p_payment_date,
+    journal = env["account.journal"].browse(row[2])
+    move = env["account.move"].create(
+        {
+            "name": "/",
+            "date": row[1],
+            "payment_id": payment.id,
+            "move_type": "entry",
+            "journal_id": journal.id,
+            "company_id": journal.company_id.id,
+            "currency_id": journal.currency_id.id or journal.company_id.currency_id.id,
         }
-        if p_company in p_dates_by_company:
-            p_dates_by_company[p_company] = min(
-                p_payment_date, p_dates_by_company[p_company]
-            )
-        else:
-            p_dates_by_company[p_company] = p_payment_date
-    if p_dates_by_company:
-        env.cr.execute(
-            """
-            SELECT id, period_lock_date, fiscalyear_lock_date
-            FROM res_company
-            WHERE id in (%s)"""
-            % (", ".join([str(x) for x in p_dates_by_company]),)
-        )
-        for rc_id, rc_period_date, rc_fy_date in env.cr.fetchall():
-            company_dates[rc_id] = [rc_period_date, rc_fy_date]
-            temporal_date = (p_dates_by_company[rc_id] - timedelta(days=1)).strftime(
-                "%Y-%m-%d"
-            )
-            # use temporal_date to avoid _check_fiscalyear_lock_date
-            env.cr.execute(
-                """
-                UPDATE res_company
-                SET period_lock_date = TO_DATE(%s, 'YYYY-MM-DD'),
-                    fiscalyear_lock_date = TO_DATE(%s, 'YYYY-MM-DD')
-                WHERE id = %s""",
-                (temporal_date, temporal_date, rc_id),
-            )
-        env["res.company"].invalidate_cache(
-            ["period_lock_date", "fiscalyear_lock_date"], list(company_dates.keys())
-        )
-    payments = env["account.payment"].browse(list(p_data.keys()))
-    for payment in payments.with_context(check_move_validity=False):
-        journal = env["account.journal"].browse(p_data[payment.id]["journal_id"])
-        move = env["account.move"].create(
-            {
-                "name": "/",
-                "date": p_data[payment.id]["payment_date"],
-                "payment_id": payment.id,
-                "move_type": "entry",
-                "journal_id": journal.id,
-                "company_id": journal.company_id.id,
-                "currency_id": journal.currency_id.id
-                or journal.company_id.currency_id.id,
-            }
-        )
-        payment.move_id = move
-        deprecated_accounts = env["account.account"].search(
-            [("deprecated", "=", True), ("company_id", "=", payment.company_id.id)]
-        )
-        deprecated_accounts.deprecated = False
-        try:
-            payment._synchronize_to_moves(
-                [
-                    "date",
-                    "amount",
-                    "payment_type",
-                    "partner_type",
-                    "payment_reference",
-                    "is_internal_transfer",
-                    "currency_id",
-                    "partner_id",
-                    "destination_account_id",
-                    "partner_bank_id",
-                    "journal_id",
-                ]
-            )
-        except Exception as e:
-            _logger.error("Failed for payment with id %s: %s", payment.id, e)
-            raise
-        deprecated_accounts.deprecated = True
+    )
+    payment.move_id = move
+    try:
+        payment._synchronize_to_moves(PAYMENT_SYNC_FIELDS)
+    except Exception as e:
+        _logger.error("Failed for payment with id %s: %s", payment.id, e)
+        raise
+    _write_payment_move_lines(payment)
+
+
+def _write_payment_move_lines(payments):
+    """Write the journal items of the journal entries of the payments, the
+    same way for the batches and for the payments processed one by one"""
+    for payment in payments:
         to_write = {
             "line_ids": [
                 (0, 0, line_vals)
@@ -674,31 +873,92 @@ def fill_account_payment_with_no_move(env):
         payment.move_id.with_context(skip_account_move_synchronization=True).write(
             to_write
         )
-    # restore lock dates
-    for rc_id in company_dates:
-        env.cr.execute(
-            """
-            UPDATE res_company
-            SET period_lock_date = {}, fiscalyear_lock_date = {}
-            WHERE id = {}""".format(
-                "TO_DATE('"
-                + company_dates[rc_id][0].strftime("%Y-%m-%d")
-                + "', 'YYYY-MM-DD')"
-                if company_dates[rc_id][0]
-                else "NULL",
-                "TO_DATE('"
-                + company_dates[rc_id][1].strftime("%Y-%m-%d")
-                + "', 'YYYY-MM-DD')"
-                if company_dates[rc_id][1]
-                else "NULL",
-                rc_id,
-            ),
+
+
+def _fill_account_payments_moves_batch(env, rows):
+    """Create the journal entries of a batch of payments at once, and
+    synchronize them with the payments at once. Their journal items are
+    written like the ones of the payments processed one by one.
+
+    :param rows: list of tuples (payment id, date, journal id, company id,
+        currency id, payment company id).
+    :return: the rows of the payments without journal, left to the ORM method.
+    """
+    to_create = [row for row in rows if row[2]]
+    if not to_create:
+        return rows
+    moves = (
+        env["account.move"]
+        .with_context(check_move_validity=False)
+        .create(
+            [
+                {
+                    "name": "/",
+                    "date": date,
+                    "payment_id": payment_id,
+                    "move_type": "entry",
+                    "journal_id": journal_id,
+                    "company_id": company_id,
+                    "currency_id": currency_id,
+                }
+                for payment_id, date, journal_id, company_id, currency_id, _c in (
+                    to_create
+                )
+            ]
         )
-    env["res.company"].invalidate_cache(
-        ["period_lock_date", "fiscalyear_lock_date"], list(company_dates.keys())
     )
+    for move in moves:
+        move.payment_id.move_id = move
+    payments = moves.payment_id.with_context(check_move_validity=False)
+    payments._synchronize_to_moves(PAYMENT_SYNC_FIELDS)
+    _write_payment_move_lines(payments)
+    return [row for row in rows if not row[2]]
+
+
+@checkpoint.step()
+def fill_account_payment_with_no_move(env):
+    step = "fill_account_payment_with_no_move"
+    progress = checkpoint.get_state(env.cr, "account", step) or {}
+    env.cr.execute(
+        """
+        SELECT ap.id, ap.{payment_date}, ap.{journal_id}, lj.company_id,
+            COALESCE(lj.currency_id, rc.currency_id), aj.company_id
+        FROM account_payment ap
+        JOIN account_journal aj ON ap.journal_id = aj.id
+        LEFT JOIN account_journal lj ON lj.id = ap.{journal_id}
+        LEFT JOIN res_company rc ON rc.id = lj.company_id
+        WHERE ap.move_id IS NULL
+        ORDER BY ap.id
+        """.format(
+            journal_id=openupgrade.get_legacy_name("journal_id"),
+            payment_date=openupgrade.get_legacy_name("payment_date"),
+        )
+    )
+    rows = env.cr.fetchall()
+    p_dates_by_company = {}
+    for row in rows:
+        p_payment_date, p_company = row[1], row[5]
+        if p_company in p_dates_by_company:
+            p_dates_by_company[p_company] = min(
+                p_payment_date, p_dates_by_company[p_company]
+            )
+        else:
+            p_dates_by_company[p_company] = p_payment_date
+    company_dates = _set_temporal_lock_dates(env, p_dates_by_company, progress)
+    deprecated_accounts = _undeprecate_accounts(env, p_dates_by_company, progress)
+    checkpoint.set_state(env.cr, "account", step, progress)
+    _process_in_batches(
+        env,
+        step,
+        rows,
+        _fill_account_payments_moves_batch,
+        _fill_account_payment_move,
+    )
+    deprecated_accounts.deprecated = True
+    _restore_lock_dates(env, company_dates)
 
 
+@checkpoint.step()
 def try_delete_noupdate_records(env):
     openupgrade.delete_records_safely_by_xml_id(
         env,
@@ -712,8 +972,9 @@ def try_delete_noupdate_records(env):
     )
 
 
+@checkpoint.step()
 def fill_account_move_line_amounts(env):
-    openupgrade.logged_query(
+    batch.logged_query(
         env.cr,
         """
         UPDATE account_move_line aml
@@ -723,28 +984,37 @@ def fill_account_move_line_amounts(env):
         WHERE aml.currency_id = rc.currency_id AND
             aml.move_id = am.id AND
             aml.debit + aml.credit > 0 AND (
-                aml.amount_currency = 0 OR aml.amount_currency IS NULL)""",
+                aml.amount_currency = 0 OR aml.amount_currency IS NULL)
+            AND aml.id BETWEEN %(first_id)s AND %(last_id)s""",
+        "account_move_line",
     )
 
 
+@checkpoint.step()
 def fill_account_move_line_date(env):
-    openupgrade.logged_query(
+    batch.logged_query(
         env.cr,
         """
         UPDATE account_move_line aml
         SET date = COALESCE(am.date, aml.create_date::date)
         FROM account_move am
-        WHERE aml.move_id = am.id AND aml.date IS NULL""",
+        WHERE aml.move_id = am.id AND aml.date IS NULL
+            AND aml.id BETWEEN %(first_id)s AND %(last_id)s""",
+        "account_move_line",
     )
 
 
 @openupgrade.migrate()
 def migrate(env, version):
+    # Read while the first steps go on, unless the step using them is done
+    reconcile_model_lines = None
+    if not checkpoint.is_step_done(env.cr, create_account_reconcile_model_lines):
+        reconcile_model_lines = _read_reconcile_model_lines(env)
     fill_account_journal_posted_before(env)
     fill_code_prefix_end_field(env)
     fill_default_account_id_field(env)
     fill_payment_id_and_statement_line_id_fields(env)
-    create_account_reconcile_model_lines(env)
+    create_account_reconcile_model_lines(env, reconcile_model_lines)
     create_account_reconcile_model_template_lines(env)
     create_account_tax_report_lines(env)
     post_statements_with_unreconciled_lines(env)
@@ -753,7 +1023,7 @@ def migrate(env, version):
     fill_company_account_cash_basis_base_account_id(env)
     fill_account_move_line_amounts(env)
     fill_account_move_line_date(env)
-    openupgrade.load_data(env.cr, "account", "14.0.1.1/noupdate_changes.xml")
+    noupdate.load_changes(env, "account", "14.0.1.1/noupdate_changes.xml")
     try_delete_noupdate_records(env)
     populate_account_groups(env)
     unfold_manual_account_groups(env)
@@ -2,6 +2,20 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import indexes
+
+# Helper indexes for matching the payments and statement lines with their
+# moves. The moves are matched on one of these columns and on the company of
+# the payment or statement, and the OR of the matches on the communication of
+# the payments combines the three indexes. The payments are matched on their
+# communication only, their company being the one of their journal.
+MOVE_MATCHING_INDEXES = [
+    ("account_move", "name, company_id"),
+    ("account_move", "ref, company_id"),
+    ("account_move", "payment_reference, company_id"),
+    ("account_payment", "communication"),
+]
+
 
 def rename_fields(env):
     openupgrade.rename_fields(
@@ -419,8 +433,9 @@ def migrate(env, version):
     rename_fields(env)
     m2m_tables_account_journal_renamed(env)
     remove_constrains_reconcile_models(env)
-    add_move_id_field_account_payment(env)
-    add_move_id_field_account_bank_statement_line(env)
+    with indexes.temporary(env.cr, *MOVE_MATCHING_INDEXES):
+        add_move_id_field_account_payment(env)
+        add_move_id_field_account_bank_statement_line(env)
     add_edi_state_field_account_move(env)
     fill_empty_partner_type_account_payment(env)
     fill_account_move_line_currency_id(env)
@@ -1,8 +1,10 @@
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import noupdate
+
 
 @openupgrade.migrate()
 def migrate(env, version):
-    openupgrade.load_data(
-        env.cr, "account_check_printing", "14.0.1.0/noupdate_changes.xml"
+    noupdate.load_changes(
+        env, "account_check_printing", "14.0.1.0/noupdate_changes.xml"
     )
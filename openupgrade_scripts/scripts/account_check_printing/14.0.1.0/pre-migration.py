@@ -1,5 +1,7 @@
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import indexes
+
 
 def add_preferred_payment_method_id_field_account_move(env):
     if not openupgrade.column_exists(
@@ -12,18 +14,21 @@ def add_preferred_payment_method_id_field_account_move(env):
             ADD COLUMN preferred_payment_method_id integer
             """,
         )
-        openupgrade.logged_query(
-            env.cr,
-            """
-            UPDATE account_move am
-            SET preferred_payment_method_id = CAST(
-                SPLIT_PART(ip.value_reference, ',', 2) AS int)
-            FROM ir_property ip
-            WHERE ip.company_id = am.company_id AND
-                ip.res_id = CONCAT('res.partner,', am.partner_id) AND
-                ip.name = 'property_payment_method_id'
-            """,
-        )
+        with indexes.temporary(
+            env.cr, ("ir_property", "res_id", "name = 'property_payment_method_id'")
+        ):
+            openupgrade.logged_query(
+                env.cr,
+                """
+                UPDATE account_move am
+                SET preferred_payment_method_id = CAST(
+                    SPLIT_PART(ip.value_reference, ',', 2) AS int)
+                FROM ir_property ip
+                WHERE ip.company_id = am.company_id AND
+                    ip.res_id = CONCAT('res.partner,', am.partner_id) AND
+                    ip.name = 'property_payment_method_id'
+                """,
+            )
 
 
 def fill_res_company_account_check_printing_layout(env):
@@ -2,7 +2,9 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import noupdate
+
 
 @openupgrade.migrate()
 def migrate(env, version):
-    openupgrade.load_data(env.cr, "auth_oauth", "14.0.1.0/noupdate_changes.xml")
+    noupdate.load_changes(env, "auth_oauth", "14.0.1.0/noupdate_changes.xml")
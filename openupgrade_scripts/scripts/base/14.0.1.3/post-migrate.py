@@ -3,6 +3,8 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import noupdate
+
 
 def fix_module_category_parent_id(env):
     # due to renames, we need to correct the parent_id
@@ -48,4 +50,4 @@ def fix_module_category_parent_id(env):
 def migrate(env, version):
     fix_module_category_parent_id(env)
     # Load noupdate changes
-    openupgrade.load_data(env.cr, "base", "14.0.1.3/noupdate_changes.xml")
+    noupdate.load_changes(env, "base", "14.0.1.3/noupdate_changes.xml")
@@ -3,23 +3,30 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 import logging
 
+import psycopg2
 from openupgradelib import openupgrade
 
 from odoo import tools
 
+from odoo.addons.openupgrade_framework.tools import renames
+
 _logger = logging.getLogger(__name__)
 
 try:
-    from odoo.addons.openupgrade_scripts.apriori import merged_modules, renamed_modules
+    from odoo.addons.openupgrade_scripts.apriori import modules
 except ImportError:
-    renamed_modules = {}
-    merged_modules = {}
+    modules = None
     _logger.warning(
         "You are using openupgrade_framework without having"
         " openupgrade_scripts module available."
         " The upgrade process will not work properly."
     )
 
+# Unique index created by ir.property in Odoo 14.0
+IR_PROPERTY_UNIQUE_INDEX = """
+    CREATE UNIQUE INDEX IF NOT EXISTS ir_property_unique_index
+    ON ir_property (fields_id, COALESCE(company_id, 0), COALESCE(res_id, ''))"""
+
 module_category_xmlid_renames = [
     # Module category renames were not detected by the analyze. These records
     # are created on the fly when initializing a new database in
@@ -70,21 +77,51 @@ module_category_xmlid_renames = [
 
 
 def deduplicate_ir_properties(cr):
-    # delete duplicates in ir_property due to new constrain
-    # see https://github.com/odoo/odoo/commit/e85faf398659a5beb0b1570a06af64dcf78dc1c8
-    openupgrade.logged_query(
-        cr,
+    """Delete the duplicates in ir_property due to new constraint, see
+    https://github.com/odoo/odoo/commit/e85faf398659a5beb0b1570a06af64dcf78dc1c8
+
+    The unique index of the constraint is created first: when there are no
+    duplicates, that is the only scan of the table, and Odoo does not create
+    the index again. Otherwise, the duplicates are deleted per field, keeping
+    the most recent property, before creating the index.
+    """
+    try:
+        with cr.savepoint():
+            cr.execute(IR_PROPERTY_UNIQUE_INDEX, log_exceptions=False)
+        return
+    except psycopg2.IntegrityError:
+        _logger.info("Deleting the duplicated properties")
+    cr.execute(
         """
-        DELETE FROM ir_property
-        WHERE id IN (
-            SELECT id
-            FROM (
-                SELECT id, row_number() over (
-                    partition BY fields_id, company_id, res_id ORDER BY id DESC) AS rnum
-                FROM ir_property
-            ) t
-            WHERE t.rnum > 1)""",
+        SELECT ip.fields_id, imf.model || '.' || imf.name,
+            count(*) - count(DISTINCT (
+                COALESCE(ip.company_id, 0), COALESCE(ip.res_id, ''))) AS duplicates
+        FROM ir_property ip
+        JOIN ir_model_fields imf ON imf.id = ip.fields_id
+        GROUP BY ip.fields_id, imf.model, imf.name
+        ORDER BY ip.fields_id"""
     )
+    for fields_id, field, duplicates in cr.fetchall():
+        if not duplicates:
+            continue
+        openupgrade.logged_query(
+            cr,
+            """
+            DELETE FROM ir_property
+            WHERE id IN (
+                SELECT id
+                FROM (
+                    SELECT id, row_number() over (
+                        PARTITION BY COALESCE(company_id, 0), COALESCE(res_id, '')
+                        ORDER BY id DESC) AS rnum
+                    FROM ir_property
+                    WHERE fields_id = %s
+                ) t
+                WHERE t.rnum > 1)""",
+            (fields_id,),
+        )
+        _logger.info("%s duplicated properties of %s deleted", cr.rowcount, field)
+    cr.execute(IR_PROPERTY_UNIQUE_INDEX)
 
 
 @openupgrade.migrate(use_env=False)
@@ -123,8 +160,8 @@ def migrate(cr, version):
     """
     )
     # Perform module renames and merges
-    openupgrade.update_module_names(cr, renamed_modules.items())
-    openupgrade.update_module_names(cr, merged_modules.items(), merge_modules=True)
+    if modules:
+        renames.update_module_names(cr, modules.renames(), modules.merges())
     # Migrate partners from Fil to Tagalog
     # See https://github.com/odoo/odoo/commit/194ed76c5cc9
     openupgrade.logged_query(
@@ -3,6 +3,8 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import delta
+
 
 def fill_base_automation_ir_model_fields_rel(env):
     openupgrade.logged_query(
@@ -14,7 +16,7 @@ def fill_base_automation_ir_model_fields_rel(env):
             ) AS field, ias.model_id
             FROM base_automation ba
             JOIN ir_act_server ias ON ba.action_server_id = ias.id
-            WHERE ba.on_change_fields is not null
+            WHERE ba.on_change_fields is not null AND {}
         )
         INSERT INTO base_automation_onchange_fields_rel
             (base_automation_id, ir_model_fields_id)
@@ -22,10 +24,14 @@ def fill_base_automation_ir_model_fields_rel(env):
         FROM ir_model_fields AS imf
         JOIN q1 ON imf.name = q1.field
         WHERE imf.model_id = q1.model_id
-        """,
+        ON CONFLICT DO NOTHING
+        """.format(  # pylint: disable=sql-injection
+            delta.where("base_automation", "ba")
+        ),
     )
 
 
+@delta.replayable
 @openupgrade.migrate()
 def migrate(env, version):
     fill_base_automation_ir_model_fields_rel(env)
@@ -2,7 +2,10 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import parallel
 
+
+@parallel.safe
 @openupgrade.migrate()
 def migrate(env, version):
     openupgrade.rename_xmlids(
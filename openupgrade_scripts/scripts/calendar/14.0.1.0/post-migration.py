@@ -3,7 +3,13 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import checkpoint, noupdate
 
+# Number of recurrences whose occurrences are generated at once
+RECURRENCE_CHUNK_SIZE = 200
+
+
+@checkpoint.step()
 def update_follow_recurrence_field(env):
     openupgrade.logged_query(
         env.cr,
@@ -15,6 +21,7 @@ def update_follow_recurrence_field(env):
     )
 
 
+@checkpoint.step()
 def map_calendar_event_byday(env):
     openupgrade.map_values(
         env.cr,
@@ -25,6 +32,7 @@ def map_calendar_event_byday(env):
     )
 
 
+@checkpoint.step()
 def fill_calendar_recurrence_table(env):
     openupgrade.logged_query(
         env.cr,
@@ -60,13 +68,23 @@ def fill_calendar_recurrence_table(env):
     )
 
 
+@checkpoint.step()
 @openupgrade.logging()
 def create_recurrent_events(env):
     """In v14, now all occurrences of recurrent events are created as real records, not
     virtual ones, so we need to regenerate them for all the existing ones.
     """
     recs = env["calendar.recurrence"].search([("base_event_id", "!=", False)])
-    recs._apply_recurrence()
+    for chunk in checkpoint.chunks(
+        env.cr,
+        "calendar",
+        "create_recurrent_events",
+        recs.ids,
+        size=RECURRENCE_CHUNK_SIZE,
+    ):
+        env["calendar.recurrence"].browse(chunk)._apply_recurrence()
+        env["base"].flush()
+        env["base"].invalidate_cache()
 
 
 @openupgrade.migrate()
@@ -75,7 +93,7 @@ def migrate(env, version):
     map_calendar_event_byday(env)
     fill_calendar_recurrence_table(env)
     create_recurrent_events(env)
-    openupgrade.load_data(env.cr, "calendar", "14.0.1.0/noupdate_changes.xml")
+    noupdate.load_changes(env, "calendar", "14.0.1.0/noupdate_changes.xml")
     openupgrade.delete_record_translations(
         env.cr,
         "calendar",
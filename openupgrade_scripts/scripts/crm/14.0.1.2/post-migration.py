@@ -2,10 +2,12 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import noupdate
+
 
 @openupgrade.migrate()
 def migrate(env, version):
-    openupgrade.load_data(env.cr, "crm", "14.0.1.2/noupdate_changes.xml")
+    noupdate.load_changes(env, "crm", "14.0.1.2/noupdate_changes.xml")
     openupgrade.delete_records_safely_by_xml_id(
         env, ["crm.crm_pls_rebuild_threshold_param"]
     )
@@ -2,7 +2,9 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import noupdate
+
 
 @openupgrade.migrate()
 def migrate(env, version):
-    openupgrade.load_data(env.cr, "digest", "14.0.1.1/noupdate_changes.xml")
+    noupdate.load_changes(env, "digest", "14.0.1.1/noupdate_changes.xml")
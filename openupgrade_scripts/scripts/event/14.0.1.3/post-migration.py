@@ -3,25 +3,34 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import empty, noupdate, xmlids
 
-def map_event_event_states_to_stages(env):
-    def _map_state_to_stage(state, stage_xmlid):
-        query = """
-            UPDATE event_event event SET stage_id = imd.res_id
-            FROM ir_model_data imd
-            WHERE imd.module = 'event' AND imd.name = %s AND event.state = %s"""
-        openupgrade.logged_query(env.cr, query, (stage_xmlid, state))
 
-    _map_state_to_stage("draft", "event_stage_new")
-    _map_state_to_stage("done", "event_stage_done")
-    _map_state_to_stage("cancel", "event_stage_cancelled")
-    _map_state_to_stage("confirm", "event_stage_announced")
+@empty.skip("event_event")
+def map_event_event_states_to_stages(env):
+    state_stages = [
+        ("draft", "event_stage_new"),
+        ("done", "event_stage_done"),
+        ("cancel", "event_stage_cancelled"),
+        ("confirm", "event_stage_announced"),
+    ]
+    openupgrade.logged_query(
+        env.cr,
+        """
+        UPDATE event_event event SET stage_id = data.stage_id
+        FROM unnest(%s::varchar[], %s::int[]) AS data(state, stage_id)
+        WHERE event.state = data.state AND data.stage_id IS NOT NULL""",
+        (
+            [state for state, stage in state_stages],
+            [xmlids.res_id(env.cr, "event." + stage) for state, stage in state_stages],
+        ),
+    )
 
 
 @openupgrade.migrate()
 def migrate(env, version):
     map_event_event_states_to_stages(env)
-    openupgrade.load_data(env.cr, "event", "14.0.1.3/noupdate_changes.xml")
+    noupdate.load_changes(env, "event", "14.0.1.3/noupdate_changes.xml")
     openupgrade.delete_records_safely_by_xml_id(
         env,
         [
@@ -2,6 +2,8 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import empty
+
 _field_renames = [("event.type", "event_type", "default_registration_max", "seats_max")]
 
 _field_renames_event_sale = [
@@ -40,6 +42,7 @@ def rename_event_event_seats(env):
     )
 
 
+@empty.skip("event_event")
 def fast_fill_kanban_state(env):
     openupgrade.logged_query(
         env.cr,
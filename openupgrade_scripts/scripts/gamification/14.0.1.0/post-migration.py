@@ -2,6 +2,8 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import noupdate
+
 
 def create_karma_trackings(env):
     openupgrade.logged_query(
@@ -19,7 +21,7 @@ def create_karma_trackings(env):
 @openupgrade.migrate()
 def migrate(env, version):
     create_karma_trackings(env)
-    openupgrade.load_data(env.cr, "gamification", "14.0.1.0/noupdate_changes.xml")
+    noupdate.load_changes(env, "gamification", "14.0.1.0/noupdate_changes.xml")
     openupgrade.delete_record_translations(
         env.cr,
         "gamification",
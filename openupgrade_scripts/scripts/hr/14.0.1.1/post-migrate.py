@@ -2,6 +2,8 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import noupdate
+
 
 def fill_hr_employee_company_id(env):
     openupgrade.logged_query(
@@ -34,7 +36,7 @@ def update_new_private_admin_partner(env):
 def migrate(env, version):
     fill_hr_employee_company_id(env)
     update_new_private_admin_partner(env)
-    openupgrade.load_data(env.cr, "hr", "14.0.1.1/noupdate_changes.xml")
+    noupdate.load_changes(env, "hr", "14.0.1.1/noupdate_changes.xml")
     openupgrade.delete_record_translations(
         env.cr, "hr", ["mail_template_data_unknown_employee_email_address"]
     )
@@ -2,8 +2,10 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import noupdate
+
 
 @openupgrade.migrate()
 def migrate(env, version):
     # Load noupdate changes
-    openupgrade.load_data(env.cr, "hr_contract", "14.0.1.0/noupdate_changes.xml")
+    noupdate.load_changes(env, "hr_contract", "14.0.1.0/noupdate_changes.xml")
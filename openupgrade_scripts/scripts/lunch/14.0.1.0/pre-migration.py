@@ -2,7 +2,10 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import empty, parallel
 
+
+@empty.skip("lunch_supplier")
 def fast_fill_lunch_supplier_company_id(env):
     openupgrade.logged_query(
         env.cr,
@@ -20,6 +23,7 @@ def fast_fill_lunch_supplier_company_id(env):
     )
 
 
+@parallel.safe
 @openupgrade.migrate()
 def migrate(env, version):
     fast_fill_lunch_supplier_company_id(env)
@@ -1,42 +1,92 @@
 # Copyright 2021 ForgeFlow S.L.  <https://www.forgeflow.com>
 # Copyright 2021 Tecnativa - Pedro M. Baeza
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
+import logging
+
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import batch
+
+_logger = logging.getLogger(__name__)
+
 
 def fill_mail_tracking_value_field(env):
     """Now the field is a hard many2one reference, so we need to traverse the
     ir.model.fields record and fill it.
 
     As the column is required, we do it on pre, and we need also to remove those
-    records whose field reference doesn't exist anymore.
+    records whose field reference doesn't exist anymore. They are moved to the
+    table openupgrade_orphan_mail_tracking_value, for the history to be kept.
+
+    The column may exist when resuming a run of which the ranges were committed.
     """
-    openupgrade.logged_query(env.cr, "ALTER TABLE mail_tracking_value ADD field int4")
+    if not openupgrade.column_exists(env.cr, "mail_tracking_value", "field"):
+        openupgrade.logged_query(
+            env.cr, "ALTER TABLE mail_tracking_value ADD field int4"
+        )
+    # Lookup of the fields by model and name, much smaller than ir_model_fields
     openupgrade.logged_query(
+        env.cr,
+        """
+        CREATE TEMP TABLE openupgrade_tracking_field AS
+        SELECT model, name, id FROM ir_model_fields""",
+    )
+    env.cr.execute(
+        """
+        CREATE UNIQUE INDEX ON openupgrade_tracking_field (model, name);
+        ANALYZE openupgrade_tracking_field"""
+    )
+    batch.logged_query(
         env.cr,
         """
         UPDATE mail_tracking_value mtv
-        SET field = imf.id
-        FROM ir_model_fields imf
-        JOIN mail_message mm ON imf.model = mm.model
-        WHERE imf.name = mtv.{} AND mtv.mail_message_id = mm.id
+        SET field = f.id
+        FROM mail_message mm
+        JOIN openupgrade_tracking_field f ON f.model = mm.model
+        WHERE mtv.mail_message_id = mm.id AND f.name = mtv.{}
+            AND mtv.id BETWEEN %(first_id)s AND %(last_id)s
         """.format(
             openupgrade.get_legacy_name("field")
         ),
+        "mail_tracking_value",
+    )
+    env.cr.execute("DROP TABLE openupgrade_tracking_field")
+    openupgrade.logged_query(
+        env.cr,
+        """
+        CREATE TABLE IF NOT EXISTS openupgrade_orphan_mail_tracking_value AS
+        SELECT * FROM mail_tracking_value WITH NO DATA""",
     )
     openupgrade.logged_query(
-        env.cr, "DELETE FROM mail_tracking_value WHERE field IS NULL"
+        env.cr,
+        """
+        WITH orphans AS (
+            DELETE FROM mail_tracking_value WHERE field IS NULL RETURNING *
+        )
+        INSERT INTO openupgrade_orphan_mail_tracking_value SELECT * FROM orphans""",
     )
+    if env.cr.rowcount:
+        _logger.warning(
+            "%s tracking values of fields that no longer exist were moved to the "
+            "table openupgrade_orphan_mail_tracking_value",
+            env.cr.rowcount,
+        )
 
 
 @openupgrade.migrate()
 def migrate(env, version):
+    # The renames are done already when resuming a run of which the ranges of
+    # fill_mail_tracking_value_field were committed
     openupgrade.rename_models(
         env.cr, [("email_template.preview", "mail.template.preview")]
     )
-    openupgrade.rename_tables(
-        env.cr, [("email_template_preview", "mail_template_preview")]
-    )
+    if openupgrade.table_exists(env.cr, "email_template_preview"):
+        openupgrade.rename_tables(
+            env.cr, [("email_template_preview", "mail_template_preview")]
+        )
     openupgrade.set_xml_ids_noupdate_value(env, "mail", ["mail_channel_rule"], True)
-    openupgrade.rename_columns(env.cr, {"mail_tracking_value": [("field", None)]})
+    if not openupgrade.column_exists(
+        env.cr, "mail_tracking_value", openupgrade.get_legacy_name("field")
+    ):
+        openupgrade.rename_columns(env.cr, {"mail_tracking_value": [("field", None)]})
     fill_mail_tracking_value_field(env)
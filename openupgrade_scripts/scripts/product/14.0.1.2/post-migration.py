@@ -2,6 +2,8 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import noupdate
+
 
 def date_to_datetime_fields(env):
     openupgrade.date_to_datetime_tz(
@@ -23,4 +25,4 @@ def date_to_datetime_fields(env):
 @openupgrade.migrate()
 def migrate(env, version):
     date_to_datetime_fields(env)
-    openupgrade.load_data(env.cr, "product", "14.0.1.2/noupdate_changes.xml")
+    noupdate.load_changes(env, "product", "14.0.1.2/noupdate_changes.xml")
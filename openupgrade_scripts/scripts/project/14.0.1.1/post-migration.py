@@ -3,6 +3,8 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import noupdate
+
 
 def map_project_project_rating_status(env):
     openupgrade.map_values(
@@ -69,7 +71,7 @@ def _fill_res_users_m2m_tables(env):
 def migrate(env, version):
     map_project_project_rating_status(env)
     _fill_res_users_m2m_tables(env)
-    openupgrade.load_data(env.cr, "project", "14.0.1.1/noupdate_changes.xml")
+    noupdate.load_changes(env, "project", "14.0.1.1/noupdate_changes.xml")
     openupgrade.delete_records_safely_by_xml_id(
         env,
         [
@@ -3,6 +3,8 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import parallel
+
 
 def update_rating_value(env):
     # range changed from 0-10 to 0-5
@@ -15,6 +17,7 @@ def update_rating_value(env):
     )
 
 
+@parallel.safe
 @openupgrade.migrate()
 def migrate(env, version):
     openupgrade.rename_xmlids(
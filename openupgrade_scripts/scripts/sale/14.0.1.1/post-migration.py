@@ -2,10 +2,12 @@
 # License AGPL-3.0 or later (http://www.gnu.org/licenses/agpl.html).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import noupdate
+
 
 @openupgrade.migrate()
 def migrate(env, version):
-    openupgrade.load_data(env.cr, "sale", "14.0.1.1/noupdate_changes.xml")
+    noupdate.load_changes(env, "sale", "14.0.1.1/noupdate_changes.xml")
     openupgrade.delete_record_translations(
         env.cr,
         "sale",
@@ -2,6 +2,8 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import delta, noupdate
+
 
 def fill_bill_type(env):
     openupgrade.logged_query(
@@ -9,7 +11,10 @@ def fill_bill_type(env):
         """
         UPDATE project_project
         SET bill_type = 'customer_project'
-        WHERE sale_order_id IS NOT NULL""",
+        WHERE sale_order_id IS NOT NULL
+            AND {}""".format(  # pylint: disable=sql-injection
+            delta.where("project_project")
+        ),
     )
 
 
@@ -22,7 +27,10 @@ def _fill_project_timesheet_product(env):
         env.cr,
         """UPDATE project_project pp
         SET timesheet_product_id = %s
-        WHERE pp.pricing_type IS NOT NULL AND pp.allow_timesheets""",
+        WHERE pp.pricing_type IS NOT NULL AND pp.allow_timesheets
+            AND {}""".format(  # pylint: disable=sql-injection
+            delta.where("project_project", "pp")
+        ),
         (product.id,),
     )
 
@@ -33,13 +41,17 @@ def fill_allow_billable(env):
         """
         UPDATE project_project
         SET allow_billable = TRUE
-        WHERE pricing_type IS NOT NULL""",
+        WHERE pricing_type IS NOT NULL
+            AND {}""".format(  # pylint: disable=sql-injection
+            delta.where("project_project")
+        ),
     )
 
 
+@delta.replayable
 @openupgrade.migrate()
 def migrate(env, version):
     fill_bill_type(env)
     _fill_project_timesheet_product(env)
     fill_allow_billable(env)
-    openupgrade.load_data(env.cr, "sale_timesheet", "14.0.1.0/noupdate_changes.xml")
+    noupdate.load_changes(env, "sale_timesheet", "14.0.1.0/noupdate_changes.xml")
@@ -4,6 +4,8 @@
 # License AGPL-3.0 or later (https://www.gnu.org/licenses/agpl).
 from openupgradelib import openupgrade
 
+from odoo.addons.openupgrade_framework.tools import delta
+
 _column_copies = {
     "project_project": [("billable_type", None, None)],
 }
@@ -13,27 +15,32 @@ _field_renames = [
 
 
 def map_pricing_type(env):
+    """Map the values from the copy of billable_type, which is also filled in
+    the rows copied by the delta migration"""
     openupgrade.logged_query(
         env.cr,
         """
         UPDATE project_project
-        SET pricing_type = 'fixed_rate'
-        WHERE pricing_type = 'task_rate'""",
-    )
-    openupgrade.logged_query(
-        env.cr,
-        """
-        UPDATE project_project
-        SET pricing_type = NULL
-        WHERE pricing_type = 'no'""",
+        SET pricing_type = CASE {billable_type}
+            WHEN 'task_rate' THEN 'fixed_rate'
+            WHEN 'no' THEN NULL
+            ELSE {billable_type} END
+        WHERE {where}""".format(  # pylint: disable=sql-injection
+            billable_type=openupgrade.get_legacy_name("billable_type"),
+            where=delta.where("project_project"),
+        ),
     )
 
 
+@delta.replayable
 @openupgrade.migrate()
 def migrate(env, version):
-    openupgrade.copy_columns(env.cr, _column_copies)
-    openupgrade.rename_fields(env, _field_renames)
+    # The columns are renamed and created already when replaying
+    if openupgrade.column_exists(env.cr, "project_project", "billable_type"):
+        openupgrade.copy_columns(env.cr, _column_copies)
+        openupgrade.rename_fields(env, _field_renames)
     map_pricing_type(env)
-    openupgrade.logged_query(
-        env.cr, "ALTER TABLE project_project ADD timesheet_product_id int4"
-    )
+    if not openupgrade.column_exists(env.cr, "project_project", "timesheet_product_id"):
+        openupgrade.logged_query(
+            env.cr, "ALTER TABLE project_project ADD timesheet_product_id int4"
+        )